@@ -0,0 +1,239 @@
+"""
+Bulk catalog import from CSV or NDJSON feeds
+
+Rows are validated against SweetCreate and written in chunks: each chunk
+looks up existing sweets by their natural key (name, category) with one
+query, then updates the matches with an executemany UPDATE and inserts
+the rest with a multi-row INSERT. Bad rows are reported individually and
+never abort the rest of the batch.
+"""
+import csv
+import io
+import json
+import tempfile
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.inventory_stats import StatsDelta, SweetState
+from app.stock_slots import fill_slots
+from app.models import Sweet
+from app.schemas import SweetCreate, ImportResponse, ImportRowError
+from app.search import get_search_backend
+from app.stock_feed import stage_change, stage_reset
+
+SUPPORTED_FORMATS = ("csv", "ndjson")
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+CONTENT_TYPE_FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+def format_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    """Map a request Content-Type header to an import format"""
+    if not content_type:
+        return None
+    return CONTENT_TYPE_FORMATS.get(content_type.split(";")[0].strip().lower())
+
+
+async def spool_body(chunks: AsyncIterator[bytes]) -> TextIO:
+    """
+    Buffer an uploaded feed without holding it all in memory
+    
+    Bodies larger than SPOOL_MAX_MEMORY spill to a temporary file.
+    
+    Returns:
+        Text stream over the body, positioned at the start
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    async for chunk in chunks:
+        spool.write(chunk)
+    spool.seek(0)
+    return io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+
+
+def read_rows(stream: TextIO, fmt: str) -> Iterator[Tuple[int, object]]:
+    """
+    Parse a feed one record at a time
+    
+    Args:
+        stream: Text stream positioned at the start of the feed
+        fmt: Either "csv" or "ndjson"
+    
+    Yields:
+        (row number, parsed dict) or (row number, error message)
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row_number, record in enumerate(reader, start=1):
+            # Empty CSV cells mean "not provided", not an empty string
+            yield row_number, {key: value for key, value in record.items() if key and value not in ("", None)}
+        return
+    
+    row_number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row_number, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield row_number, "Expected a JSON object"
+            continue
+        yield row_number, record
+
+
+def _validation_message(error: ValidationError) -> str:
+    """Flatten a ValidationError into one readable line"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+class SweetImporter:
+    """
+    Accumulates validated rows and upserts them chunk by chunk
+    
+    Each chunk is committed on its own, so memory stays bounded by the
+    chunk size and a database error only fails the rows of that chunk.
+    """
+    
+    def __init__(self, db: Session, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: List[ImportRowError] = []
+        self._pending: List[Tuple[int, SweetCreate]] = []
+    
+    def add(self, row_number: int, record: object):
+        """Validate one parsed record and queue it for the next chunk"""
+        self.processed += 1
+        
+        if isinstance(record, str):
+            self._fail(row_number, record)
+            return
+        
+        try:
+            sweet = SweetCreate.model_validate(record)
+        except ValidationError as e:
+            self._fail(row_number, _validation_message(e))
+            return
+        
+        self._pending.append((row_number, sweet))
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+    
+    def add_all(self, rows: Iterable[Tuple[int, object]]) -> "SweetImporter":
+        """Feed every parsed record through the importer"""
+        for row_number, record in rows:
+            self.add(row_number, record)
+        return self
+    
+    def flush(self):
+        """Upsert and commit the queued chunk"""
+        if not self._pending:
+            return
+        
+        chunk, self._pending = self._pending, []
+        try:
+            created, updated = self._upsert(chunk)
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            message = f"Database error: {e.__class__.__name__}"
+            for row_number, _ in chunk:
+                self._fail(row_number, message)
+            return
+        
+        self.created += created
+        self.updated += updated
+    
+    def finish(self) -> ImportResponse:
+        """Flush the last chunk and return the import report"""
+        self.flush()
+        if self.created or self.updated:
+            get_search_backend(self.db).invalidate()
+        return ImportResponse(
+            processed=self.processed,
+            created=self.created,
+            updated=self.updated,
+            failed=self.failed,
+            errors=self.errors
+        )
+    
+    def _fail(self, row_number: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(ImportRowError(row=row_number, error=message))
+    
+    def _upsert(self, chunk: List[Tuple[int, SweetCreate]]) -> Tuple[int, int]:
+        # Later rows win when a feed repeats the same sweet within a chunk
+        by_key: Dict[Tuple[str, str], dict] = {}
+        for _, sweet in chunk:
+            by_key[(sweet.name, sweet.category)] = sweet.model_dump()
+        
+        existing: Dict[Tuple[str, str], Tuple[int, SweetState]] = {}
+        # name IN (...) seeks ix_sweets_name_category; a (name, category)
+        # row-value IN list is a full table scan on SQLite
+        rows = self.db.execute(
+            select(
+                Sweet.id, Sweet.name, Sweet.category, Sweet.price, Sweet.quantity, Sweet.is_active, Sweet.stock_slots
+            )
+            .where(Sweet.name.in_({name for name, _ in by_key}))
+            .order_by(Sweet.id.desc())
+        )
+        for sweet_id, name, category, price, quantity, is_active, stock_slots in rows:
+            # Keep the oldest sweet when the catalog already holds duplicates
+            if (name, category) in by_key:
+                existing[(name, category)] = (
+                    sweet_id, SweetState(category, price, quantity, is_active, stock_slots)
+                )
+        
+        updates = []
+        inserts = []
+        resharded = []
+        stats = StatsDelta()
+        for key, values in by_key.items():
+            after = SweetState(values["category"], values["price"], values["quantity"], True)
+            if key in existing:
+                sweet_id, before = existing[key]
+                updates.append({"id": sweet_id, "is_active": True, **values})
+                stats.add(before, after._replace(stock_slots=before.stock_slots))
+                if before.stock_slots:
+                    # Hot sweets take the imported quantity in their slots
+                    resharded.append((sweet_id, before.stock_slots, values["quantity"]))
+            else:
+                inserts.append(values)
+                stats.add(None, after)
+        
+        if updates:
+            self.db.execute(update(Sweet), updates)
+            for values in updates:
+                stage_change(self.db, {
+                    "id": values["id"], "quantity": values["quantity"], "price": values["price"], "is_active": True
+                })
+        if inserts:
+            self.db.execute(insert(Sweet), inserts)
+            # Stream clients only merge sweets they hold: refetch for new ones
+            stage_reset(self.db)
+        for sweet_id, slots, quantity in resharded:
+            fill_slots(self.db, sweet_id, slots, quantity)
+        stats.apply(self.db)
+        
+        # Rows repeated within the chunk count as updates of the first one
+        return len(inserts), len(chunk) - len(inserts)
@@ -0,0 +1,72 @@
+"""
+Bounded in-process caches
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a time-to-live
+    
+    A cache created with maxsize or ttl of 0 is disabled: lookups always
+    miss and nothing is stored.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry and mark it as recently used"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Store an entry, evicting the least recently used one when full
+        
+        Args:
+            ttl: Lifetime for this entry, capped at the cache TTL
+        """
+        if not self.enabled:
+            return
+        
+        lifetime = self.ttl if ttl is None else min(ttl, self.ttl)
+        if lifetime <= 0:
+            return
+        
+        with self._lock:
+            self._data[key] = (time.monotonic() + lifetime, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def pop(self, key: Hashable):
+        """Remove an entry if present"""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,330 @@
+"""
+Catalog version and conditional GET support for catalog reads
+
+Every committed write to the sweets table bumps the catalog version.
+Catalog reads send it as a strong ETag, so a client that repeats a read
+with If-None-Match gets 304 Not Modified before the route builds a
+query.
+
+Where the version lives is pluggable. The shared backend keeps it in a
+small memory-mapped file that every worker process on the host maps, so
+a write on one uvicorn worker changes the tag all of them send and no
+worker answers 304 for a catalog another worker has changed. The local
+backend is a plain per-process counter for single-worker runs. Both
+carry a random epoch, and reading the version is O(1) with no system
+call. The shared file outlives the processes, so the application starts
+a new epoch at startup: tags from before a restart, during which the
+database may have changed without bumping the counter, never match.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import secrets
+import struct
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from itertools import chain
+from typing import Optional
+from fastapi import Request, Response, status
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+from app.config import settings
+from app.models import CategoryStats, StockSlot, Sweet
+
+try:
+    import fcntl
+except ImportError:  # Windows: no shared backend
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+VERSION_BACKENDS = ("shared", "local")
+
+# Clients may keep catalog responses but must revalidate before reuse
+CATALOG_CACHE_CONTROL = "private, no-cache"
+
+
+class VersionBackend(ABC):
+    """
+    Where a version counter lives, and the interface every backend implements
+    
+    read() runs on every catalog read and must stay O(1); increment()
+    runs once per committed write.
+    """
+    name = ""
+    
+    @property
+    @abstractmethod
+    def epoch(self) -> str:
+        """Random token that differs between counters and deployments"""
+    
+    @abstractmethod
+    def read(self) -> int:
+        """Current value of the counter"""
+    
+    @abstractmethod
+    def increment(self) -> int:
+        """Add one to the counter and return the new value"""
+    
+    @abstractmethod
+    def new_epoch(self):
+        """Replace the epoch with a fresh random one"""
+
+
+class LocalVersionBackend(VersionBackend):
+    """Counter in this process only; other workers never see its changes"""
+    name = "local"
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._epoch = secrets.token_hex(4)
+        self._counter = 0
+    
+    @property
+    def epoch(self) -> str:
+        return self._epoch
+    
+    def read(self) -> int:
+        return self._counter
+    
+    def increment(self) -> int:
+        with self._lock:
+            self._counter += 1
+            return self._counter
+    
+    def new_epoch(self):
+        self._epoch = secrets.token_hex(4)
+
+
+# File layout: 8 random epoch bytes, then the counter
+_EPOCH = struct.Struct("8s")
+_COUNTER = struct.Struct("<Q")
+_FILE_SIZE = _EPOCH.size + _COUNTER.size
+
+
+class SharedMemoryVersionBackend(VersionBackend):
+    """
+    Counter in a memory-mapped file shared by every process on the host
+    
+    Increments take an exclusive flock on the file; reads just load the
+    mapped bytes. The file is opened on first use in each process, so
+    workers forked after import do not share one lock.
+    
+    Args:
+        path: Version file, created with a fresh epoch if missing
+    """
+    name = "shared"
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._forget)
+    
+    @property
+    def epoch(self) -> str:
+        return _EPOCH.unpack_from(self._mapping())[0].hex()
+    
+    def read(self) -> int:
+        mapping = self._mapping()
+        # Writers do not stop readers: take a value only once two loads
+        # agree, so a load torn by a concurrent increment is never used
+        counter = _COUNTER.unpack_from(mapping, _EPOCH.size)[0]
+        while True:
+            again = _COUNTER.unpack_from(mapping, _EPOCH.size)[0]
+            if again == counter:
+                return counter
+            counter = again
+    
+    def increment(self) -> int:
+        mapping = self._mapping()
+        # flock only excludes other processes; the lock covers this one's threads
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                counter = _COUNTER.unpack_from(mapping, _EPOCH.size)[0] + 1
+                _COUNTER.pack_into(mapping, _EPOCH.size, counter)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return counter
+    
+    def new_epoch(self):
+        mapping = self._mapping()
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                _EPOCH.pack_into(mapping, 0, secrets.token_bytes(_EPOCH.size))
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+    
+    def _mapping(self) -> mmap.mmap:
+        mapping = self._map
+        if mapping is None:
+            with self._lock:
+                if self._map is None:
+                    self._open()
+                mapping = self._map
+        return mapping
+    
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size < _FILE_SIZE:
+                    os.pwrite(fd, _EPOCH.pack(secrets.token_bytes(_EPOCH.size)) + _COUNTER.pack(0), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(fd, _FILE_SIZE)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+    
+    def _forget(self):
+        # The child inherited the parent's file description; open its own
+        self._lock = threading.Lock()
+        self._fd = None
+        self._map = None
+
+
+def version_path(name: str) -> str:
+    """Version file for a counter, one per database so deployments never share"""
+    digest = hashlib.sha1(settings.DATABASE_URL.encode()).hexdigest()[:12]
+    directory = settings.CATALOG_VERSION_DIR or tempfile.gettempdir()
+    return os.path.join(directory, f"sweetshop-{name}-{digest}.version")
+
+
+def create_version_backend(name: str) -> VersionBackend:
+    """
+    Build the CATALOG_VERSION_BACKEND backend for a counter
+    
+    Falls back to a local counter, with a warning, where the shared
+    backend cannot work (no flock, unwritable directory).
+    
+    Args:
+        name: Counter name, part of the shared version file name
+    """
+    choice = settings.CATALOG_VERSION_BACKEND
+    if choice == "local":
+        return LocalVersionBackend()
+    if choice != "shared":
+        logger.warning("Unknown catalog version backend %r, using local", choice)
+        return LocalVersionBackend()
+    if fcntl is None:
+        logger.warning("Shared catalog version needs flock, using local; run a single worker")
+        return LocalVersionBackend()
+    
+    path = version_path(name)
+    directory = os.path.dirname(path)
+    if not os.access(directory, os.W_OK):
+        logger.warning("Cannot write catalog version file in %s, using local; run a single worker", directory)
+        return LocalVersionBackend()
+    return SharedMemoryVersionBackend(path)
+
+
+class CatalogVersion:
+    """Monotonic write counter for the sweets catalog"""
+    
+    def __init__(self, backend: Optional[VersionBackend] = None):
+        self.backend = backend or LocalVersionBackend()
+    
+    @property
+    def current(self) -> str:
+        return f"{self.backend.epoch}-{self.backend.read()}"
+    
+    def bump(self) -> int:
+        """
+        Mark the catalog as changed
+        
+        ORM writes bump automatically on commit; call this after changing
+        sweets through raw SQL.
+        
+        Returns:
+            The new counter value
+        """
+        return self.backend.increment()
+    
+    def new_epoch(self):
+        """
+        Invalidate every tag issued so far, in every worker
+        
+        Called at startup: the shared counter survives restarts, but
+        the catalog may have changed while no worker was counting.
+        """
+        self.backend.new_epoch()
+    
+    def etag(self) -> str:
+        return f'"{self.current}"'
+
+
+catalog_version = CatalogVersion(create_version_backend("catalog"))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Apply the weak comparison RFC 9110 prescribes for If-None-Match"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def check_not_modified(request: Request, response: Response) -> Optional[Response]:
+    """
+    Tag a catalog read with the current version
+    
+    Read the version before querying: a write that lands mid-query then
+    leaves the response tagged with the older version, which only costs
+    the client one extra full response.
+    
+    Args:
+        request: Incoming request, checked for If-None-Match
+        response: Outgoing response that receives ETag and Cache-Control
+    
+    Returns:
+        A 304 response when the client's copy is current, otherwise None
+    """
+    headers = {"ETag": catalog_version.etag(), "Cache-Control": CATALOG_CACHE_CONTROL}
+    
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    response.headers.update(headers)
+    return None
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_sweets(session: Session, flush_context):
+    if any(isinstance(obj, Sweet) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info["catalog_changed"] = True
+
+
+# Hot sweets' stock lives in their slot rows (app.stock_slots); the
+# ledger writer applies batched inventory statistics after the purchases
+_CATALOG_MAPPERS = (Sweet.__mapper__, StockSlot.__mapper__, CategoryStats.__mapper__)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_sweet_statements(orm_execute_state: ORMExecuteState):
+    # Bulk and conditional UPDATE/INSERT statements bypass the flush
+    if orm_execute_state.is_select or orm_execute_state.bind_mapper not in _CATALOG_MAPPERS:
+        return
+    if orm_execute_state.is_update or orm_execute_state.is_insert or orm_execute_state.is_delete:
+        orm_execute_state.session.info["catalog_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session: Session):
+    if session.info.pop("catalog_changed", False):
+        catalog_version.bump()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_changes(session: Session, previous_transaction):
+    session.info.pop("catalog_changed", None)
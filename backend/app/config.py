@@ -16,11 +16,70 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
     
+    # Connection pool, per engine and worker process (recycle -1 disables)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    # Pre-ping strategy: always, idle (only after DB_POOL_PRE_PING_IDLE_SECONDS) or never
+    DB_POOL_PRE_PING: str = "idle"
+    DB_POOL_PRE_PING_IDLE_SECONDS: float = 30.0
+    # Connections opened at startup, capped at DB_POOL_SIZE
+    DB_POOL_WARMUP: int = 5
+    # Create missing tables at startup; disable where migrations own the schema
+    DB_CREATE_SCHEMA: bool = True
+    # Outside production: runs of one statement per request logged as a likely N+1
+    DB_QUERY_REPEAT_THRESHOLD: int = 10
+    
     # JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Authenticated-user cache (0 disables)
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 10000
+    
+    # Verified-token cache, entries live until the token expires (0 disables)
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    
+    # Inventory ledger: queued (batched by a background writer) or sync
+    # (written in the purchase/restock transaction)
+    LEDGER_MODE: str = "queued"
+    LEDGER_QUEUE_SIZE: int = 10000
+    LEDGER_BATCH_SIZE: int = 500
+    LEDGER_FLUSH_SECONDS: float = 0.5
+    
+    # Stock reservations: default and longest hold, and holds reclaimed per expiry sweep
+    RESERVATION_TTL_SECONDS: int = 600
+    RESERVATION_MAX_TTL_SECONDS: int = 3600
+    RESERVATION_EXPIRY_BATCH: int = 500
+    
+    # Stock change stream: pending sweets per subscriber before a reset,
+    # least time between events, and idle time before a keepalive
+    STOCK_FEED_BUFFER: int = 1000
+    STOCK_FEED_COALESCE_SECONDS: float = 0.25
+    STOCK_FEED_KEEPALIVE_SECONDS: float = 15.0
+    
+    # Delta sync: changes younger than this are sent again on the next
+    # sync, covering slow commits and coarse timestamps
+    SYNC_SETTLE_SECONDS: float = 5.0
+    # Least time between the updated_at stamps hot sweets' purchases write
+    HOT_SYNC_SECONDS: float = 1.0
+    
+    # Worker threads: sync routes/DB work, and bcrypt hashing on its own limit
+    THREADPOOL_SIZE: int = 40
+    PASSWORD_HASH_WORKERS: int = 4
+    
+    # Search backend: auto, like, fts5, trigram or ngram
+    SEARCH_BACKEND: str = "auto"
+    
+    # Catalog version behind ETags and the ngram search index: shared
+    # across the host's worker processes or local to each; version files
+    # go to CATALOG_VERSION_DIR (empty for the system temp directory)
+    CATALOG_VERSION_BACKEND: str = "shared"
+    CATALOG_VERSION_DIR: str = ""
+    
     # Admin
     ADMIN_EMAIL: str = "admin@sweetshop.com"
     ADMIN_PASSWORD: str = "Admin123!"
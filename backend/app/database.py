@@ -1,32 +1,207 @@
 """
 Database configuration and session management
+
+DATABASE_URL selects the mode. A sync driver (postgresql://, sqlite://)
+gives every request a regular Session whose work runs on the thread pool.
+An async driver (postgresql+asyncpg://, sqlite+aiosqlite://) gives every
+request an AsyncSession instead, so one worker can keep many queries in
+flight without being capped by the thread pool. Schema management and
+CLI scripts always use the sync engine.
+
+Importing this module does not touch the database. Engines and session
+factories are built on first use through get_engine() and friends; the
+module attributes engine, SessionLocal, async_engine and
+AsyncSessionLocal resolve to them lazily for scripts that import them.
 """
+import threading
+from typing import Any, Callable, Optional, TypeVar, Union
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.config import settings
+from app.pool import install_pre_ping, pool_options
+
+T = TypeVar("T")
+
+# Async drivers and the sync drivers used alongside them
+ASYNC_DRIVERS = {
+    "asyncpg": "psycopg2",
+    "aiosqlite": "pysqlite",
+    "aiomysql": "pymysql",
+    "asyncmy": "pymysql",
+}
+
+DBSession = Union[Session, AsyncSession]
+
+
+def is_async_url(url: str) -> bool:
+    """Check whether a database URL names an async driver"""
+    return make_url(url).get_driver_name() in ASYNC_DRIVERS
+
+
+def sync_database_url(url: str) -> str:
+    """Swap an async driver for its sync counterpart"""
+    parsed = make_url(url)
+    driver = parsed.get_driver_name()
+    if driver not in ASYNC_DRIVERS:
+        return url
+    sync_url = parsed.set(drivername=f"{parsed.get_backend_name()}+{ASYNC_DRIVERS[driver]}")
+    return sync_url.render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE = is_async_url(settings.DATABASE_URL)
+
+
+class _Lazy:
+    """Build a value on the first call only, also under concurrent first calls"""
+    
+    _lock = threading.RLock()
+    
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._value = None
+        self.built = False
+        self.__doc__ = factory.__doc__
+    
+    def __call__(self):
+        if not self.built:
+            with self._lock:
+                if not self.built:
+                    self._value = self._factory()
+                    self.built = True
+        return self._value
+
+
+def _create_engine() -> Engine:
+    """Sync engine for DATABASE_URL, created on first use"""
+    sync_engine = create_engine(
+        sync_database_url(settings.DATABASE_URL),
+        echo=settings.ENVIRONMENT == "development",
+        **pool_options(settings.DATABASE_URL)
+    )
+    install_pre_ping(sync_engine)
+    return sync_engine
+
+
+def _create_session_factory() -> sessionmaker:
+    """Session factory bound to get_engine()"""
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+def _create_async_engine() -> Optional[AsyncEngine]:
+    """AsyncEngine for DATABASE_URL in async mode, otherwise None"""
+    if not ASYNC_DATABASE:
+        return None
+    engine = create_async_engine(
+        settings.DATABASE_URL,
+        echo=settings.ENVIRONMENT == "development",
+        **pool_options(settings.DATABASE_URL, is_async=True)
+    )
+    install_pre_ping(engine.sync_engine)
+    return engine
+
+
+def _create_async_session_factory() -> Optional[async_sessionmaker]:
+    """AsyncSession factory bound to get_async_engine(), or None in sync mode"""
+    if not ASYNC_DATABASE:
+        return None
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=settings.ENVIRONMENT == "development"
-)
+get_engine = _Lazy(_create_engine)
+get_session_factory = _Lazy(_create_session_factory)
+get_async_engine = _Lazy(_create_async_engine)
+get_async_session_factory = _Lazy(_create_async_session_factory)
+
+# Module attributes that used to be built at import time
+_LAZY_ATTRIBUTES = {
+    "engine": get_engine,
+    "SessionLocal": get_session_factory,
+    "async_engine": get_async_engine,
+    "AsyncSessionLocal": get_async_session_factory,
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def serving_engine() -> Engine:
+    """Engine whose pool serves requests (the AsyncEngine's in async mode)"""
+    return get_async_engine().sync_engine if ASYNC_DATABASE else get_engine()
+
+
+async def dispose_engines():
+    """Close pooled connections of every engine built so far"""
+    if get_async_engine.built and get_async_engine() is not None:
+        await get_async_engine().dispose()
+    if get_engine.built:
+        await run_in_threadpool(get_engine().dispose)
 
-# Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create Base class for models
 Base = declarative_base()
 
 
-def get_db():
+def get_sync_db():
     """
     Dependency function to get database session
     Yields a database session and ensures it's closed after use
     """
-    db = SessionLocal()
+    db = get_session_factory()()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Dependency function to get an async database session
+    Yields an AsyncSession and ensures it's closed after use
+    """
+    async with get_async_session_factory()() as db:
+        yield db
+
+
+# Request-scoped session dependency for the configured mode
+get_db = get_async_db if ASYNC_DATABASE else get_sync_db
+
+
+async def run_db(db: DBSession, fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run session work without blocking the event loop on database I/O
+    
+    ``fn`` receives a sync Session as its first argument. With an
+    AsyncSession it runs through run_sync: on the event loop thread,
+    which it only yields while the async driver waits for the database,
+    so ``fn`` must do little else (see run_blocking_db). With a sync
+    Session it runs on the thread pool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+async def run_blocking_db(db: DBSession, fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run CPU-heavy session work, such as parsing a feed, on the thread pool
+    
+    With a sync Session this is run_db. With an AsyncSession, ``fn`` gets
+    a Session of its own from the sync engine instead, so the event loop
+    keeps serving other requests; that session is closed afterwards, so
+    ``fn`` commits its own work.
+    """
+    if not isinstance(db, AsyncSession):
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+    
+    def run() -> T:
+        with get_session_factory()() as session:
+            return fn(session, *args, **kwargs)
+    
+    return await run_in_threadpool(run)
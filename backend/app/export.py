@@ -0,0 +1,97 @@
+"""
+Streaming full-catalog export as NDJSON or CSV
+
+Active sweets are read through a server-side cursor in chunks of
+chunk_size rows and each chunk is encoded and sent as soon as it is
+fetched, so memory stays flat whatever the catalog size and the first
+bytes leave before the query has finished. Exports use the same columns
+as SweetResponse and can be fed back to /api/sweets/import.
+"""
+import csv
+import io
+from typing import AsyncIterator, Iterator, Sequence, Union
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models import Sweet
+from app.serialization import SWEET_COLUMNS, SWEET_FIELDS, encode_sweet_lines
+from app.stock_slots import with_live_stock
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def export_statement(chunk_size: int) -> Select:
+    """Active sweets in ID order, fetched chunk_size rows at a time"""
+    return (
+        select(*SWEET_COLUMNS)
+        .where(Sweet.is_active == True)
+        .order_by(Sweet.id)
+        .execution_options(yield_per=chunk_size)
+    )
+
+
+def _encode_csv(rows: Sequence) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        ["" if value is None else value.isoformat() if hasattr(value, "isoformat") else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue().encode("utf-8")
+
+
+def _encode_chunk(rows: Sequence, fmt: str) -> bytes:
+    return encode_sweet_lines(rows) if fmt == "ndjson" else _encode_csv(rows)
+
+
+def _header(fmt: str) -> bytes:
+    return _encode_csv([SWEET_FIELDS]) if fmt == "csv" else b""
+
+
+def iter_export(db: Session, fmt: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Stream the catalog from a sync session
+    
+    FastAPI closes dependency sessions before a streaming body is sent. A
+    closed Session checks out a fresh connection on first use, so the
+    generator closes it again once the export ends or the client leaves.
+    """
+    try:
+        header = _header(fmt)
+        if header:
+            yield header
+        result = db.execute(export_statement(chunk_size))
+        for rows in result.partitions():
+            yield _encode_chunk(with_live_stock(db, rows), fmt)
+    finally:
+        db.close()
+
+
+async def aiter_export(db: AsyncSession, fmt: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Stream the catalog from an AsyncSession; see iter_export"""
+    try:
+        header = _header(fmt)
+        if header:
+            yield header
+        result = await db.stream(export_statement(chunk_size))
+        async for rows in result.partitions():
+            rows = await db.run_sync(with_live_stock, rows)
+            yield _encode_chunk(rows, fmt)
+    finally:
+        await db.close()
+
+
+def stream_export(
+    db: Union[Session, AsyncSession],
+    fmt: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Union[Iterator[bytes], AsyncIterator[bytes]]:
+    """Pick the export generator for the session type"""
+    if isinstance(db, AsyncSession):
+        return aiter_export(db, fmt, chunk_size)
+    # Starlette iterates sync generators on the thread pool
+    return iter_export(db, fmt, chunk_size)
@@ -0,0 +1,202 @@
+"""
+Inventory operations shared by the stock-changing routes
+"""
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import Update, update
+from sqlalchemy.orm import Session
+from app.inventory_stats import SweetState, record_change, sweet_state
+from app.ledger import ledger
+from app.metrics import PURCHASE_REJECTIONS
+from app.models import Sweet
+from app.stock_feed import stage_change, stock_change
+from app.stock_slots import add_to_slots, decrement_hot_stock, live_quantity, show_live_quantity, stamp_hot_sweet
+
+
+def decrement_stock(db: Session, sweet_id: int, quantity: int) -> Optional[Sweet]:
+    """
+    Atomically take units out of an active sweet's stock
+    
+    Issues a single conditional UPDATE, so two buyers racing for the same
+    sweet can never oversell it: the row only changes when it is active and
+    still holds enough stock. On backends with RETURNING the updated row
+    comes back in the same round trip; elsewhere it is re-read inside the
+    same transaction. The change to the inventory statistics goes to the
+    ledger, which batches it off this transaction in the queued mode, and
+    the new stock is staged for the stock feed.
+    
+    Sweets in hot mode never match that UPDATE; their units are taken
+    from the stock slots instead, without writing the sweet's row.
+    
+    Args:
+        db: Database session (the caller owns the commit)
+        sweet_id: Sweet to take stock from
+        quantity: Number of units to take
+    
+    Returns:
+        Updated Sweet object, or None if the sweet is missing, inactive
+        or does not hold enough stock
+    """
+    stmt = (
+        update(Sweet)
+        .where(
+            Sweet.id == sweet_id,
+            Sweet.is_active == True,
+            Sweet.stock_slots == 0,
+            Sweet.quantity >= quantity
+        )
+        .values(quantity=Sweet.quantity - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    
+    sweet = _update_row(db, stmt, sweet_id)
+    
+    if sweet is None:
+        # Only pays for the lookup when the fast path missed
+        sweet = decrement_hot_stock(db, sweet_id, quantity)
+        if sweet is not None:
+            stage_change(db, stock_change(sweet))
+        return sweet
+    
+    after = sweet_state(sweet)
+    ledger.record_stats(db, after._replace(quantity=after.quantity + quantity), after)
+    stage_change(db, stock_change(sweet))
+    return sweet
+
+
+def increment_stock(
+    db: Session, sweet_id: int, quantity: int, reactivate: bool = False
+) -> Optional[Tuple[Sweet, SweetState]]:
+    """
+    Atomically put units into a sweet's stock
+    
+    The counterpart of decrement_stock, for restocks and for units that
+    were taken but not sold, such as released or expired reservations.
+    It adds to the row in a single UPDATE, so it never overwrites a
+    concurrent purchase. A hot sweet gets the units in its slots.
+    
+    Args:
+        db: Database session (the caller owns the commit)
+        sweet_id: Sweet to add stock to
+        quantity: Number of units to add
+        reactivate: Also make the sweet active again (restocks);
+            otherwise is_active is left alone
+    
+    Returns:
+        (sweet, before): the updated Sweet and its state before the
+        units were added, or None if the sweet does not exist
+    """
+    stmt = (
+        update(Sweet)
+        .where(Sweet.id == sweet_id, Sweet.stock_slots == 0)
+        .values(quantity=Sweet.quantity + quantity)
+        .execution_options(synchronize_session=False)
+    )
+    
+    if not reactivate:
+        sweet = _update_row(db, stmt, sweet_id)
+        was_active = sweet is not None and sweet.is_active
+    else:
+        # Active sweets first: the row that matches tells what the sweet
+        # was before, which RETURNING alone cannot
+        for was_active in (True, False):
+            sweet = _update_row(db, stmt.where(Sweet.is_active == was_active).values(is_active=True), sweet_id)
+            if sweet is not None:
+                break
+    
+    if sweet is None:
+        return _increment_hot_stock(db, sweet_id, quantity, reactivate)
+    
+    after = sweet_state(sweet)
+    before = after._replace(quantity=after.quantity - quantity, is_active=was_active)
+    ledger.record_stats(db, before, after)
+    stage_change(db, stock_change(sweet))
+    return sweet, before
+
+
+def _increment_hot_stock(
+    db: Session, sweet_id: int, quantity: int, reactivate: bool
+) -> Optional[Tuple[Sweet, SweetState]]:
+    hot = lock_sweet(db, sweet_id) if reactivate else db.get(Sweet, sweet_id)
+    if hot is None or not hot.stock_slots:
+        return None
+    
+    before = sweet_state(hot)
+    add_to_slots(db, sweet_id, hot.stock_slots, quantity)
+    if reactivate:
+        # The row takes the new slot total, as set_stock_slots leaves it
+        hot.quantity = live_quantity(db, sweet_id)
+        hot.is_active = True
+        record_change(db, before, sweet_state(hot))
+    else:
+        stamp_hot_sweet(db, sweet_id)
+        show_live_quantity(db, hot)
+    stage_change(db, stock_change(hot))
+    return hot, before
+
+
+def lock_sweet(db: Session, sweet_id: int) -> Optional[Sweet]:
+    """
+    Load a sweet and keep its row from changing until db commits
+    
+    Routes that read a sweet before writing it back (admin updates,
+    deletes, hot restocks) load it here, so a purchase committed in
+    between can neither be overwritten nor counted twice by the
+    inventory statistics. SQLite ignores FOR UPDATE, so there a no-op
+    UPDATE takes the database's write lock and reads the row.
+    
+    Returns:
+        The Sweet, freshly read, or None if it does not exist
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        stmt = (
+            update(Sweet)
+            .where(Sweet.id == sweet_id)
+            .values(id=Sweet.id)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        return _update_row(db, stmt, sweet_id)
+    return db.query(Sweet).filter(Sweet.id == sweet_id).with_for_update().populate_existing().first()
+
+
+def _update_row(db: Session, stmt: Update, sweet_id: int) -> Optional[Sweet]:
+    # One round trip with RETURNING; elsewhere re-read in the same transaction
+    if db.get_bind().dialect.update_returning:
+        return db.scalars(stmt.returning(Sweet)).one_or_none()
+    if db.execute(stmt).rowcount == 1:
+        return db.get(Sweet, sweet_id, populate_existing=True)
+    return None
+
+
+def purchase_error(db: Session, sweet_id: int, quantity: int) -> HTTPException:
+    """
+    Explain why a conditional stock decrement matched no row
+    
+    Only runs on the failure path, so successful purchases never pay for
+    the extra read.
+    
+    Returns:
+        HTTPException describing the failure
+    """
+    sweet = db.query(Sweet).filter(Sweet.id == sweet_id, Sweet.is_active == True).first()
+    
+    if not sweet:
+        PURCHASE_REJECTIONS.labels("not_found").inc()
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Sweet with ID {sweet_id} not found"
+        )
+    
+    show_live_quantity(db, sweet)
+    if not sweet.is_in_stock():
+        PURCHASE_REJECTIONS.labels("out_of_stock").inc()
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Sweet '{sweet.name}' is out of stock"
+        )
+    
+    PURCHASE_REJECTIONS.labels("insufficient_stock").inc()
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Insufficient stock. Available: {sweet.quantity}, Requested: {quantity}"
+    )
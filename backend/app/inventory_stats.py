@@ -0,0 +1,216 @@
+"""
+Incrementally maintained inventory statistics
+
+The category_stats table holds running counters per category for the
+active catalog: products, in stock, out of stock, low stock, units and
+stock value. Every route that changes a sweet passes its state before
+and after the change to record_change, which applies the difference
+with one upsert per touched category in the same transaction, so
+reading the statistics never scans the sweets table. Purchases and
+returned stock go through the inventory ledger instead (app.ledger):
+in the queued mode their differences are summed per category and
+applied by the ledger writer with each batch, so concurrent buyers in
+one category never wait on its counter row. The statistics then trail
+those purchases by up to LEDGER_FLUSH_SECONDS.
+
+recompute_stats rebuilds the counters from the sweets table after
+writes that bypassed the routes; the application runs it at startup
+when the counters are empty but the catalog is not.
+
+Hot sweets (app.stock_slots) are counted with the quantity of their
+last admin write, since their purchases only touch the slot rows;
+read_stats swaps in their live slot totals.
+"""
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.models import SWEET_HOT, CategoryStats, StockSlot, Sweet
+
+# Sweets with 1..LOW_STOCK_THRESHOLD units count as low stock
+LOW_STOCK_THRESHOLD = 10
+
+COUNTERS = ("products", "in_stock", "out_of_stock", "low_stock", "units", "stock_value", "hot_products")
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+class SweetState(NamedTuple):
+    """The columns of a sweet that its statistics depend on"""
+    category: str
+    price: float
+    quantity: int
+    is_active: bool
+    stock_slots: int = 0
+
+
+def sweet_state(sweet: Sweet) -> SweetState:
+    return SweetState(sweet.category, sweet.price, sweet.quantity, sweet.is_active, sweet.stock_slots or 0)
+
+
+def _contribution(state: SweetState) -> tuple:
+    quantity = state.quantity
+    return (
+        1,
+        int(quantity > 0),
+        int(quantity == 0),
+        int(0 < quantity <= LOW_STOCK_THRESHOLD),
+        quantity,
+        quantity * state.price,
+        int(state.stock_slots > 0),
+    )
+
+
+class StatsDelta:
+    """Counter changes per category, accumulated over several sweets"""
+    
+    def __init__(self):
+        self._deltas: Dict[str, List[float]] = defaultdict(lambda: [0] * len(COUNTERS))
+    
+    def add(self, before: Optional[SweetState], after: Optional[SweetState]) -> "StatsDelta":
+        """
+        Account for one sweet changing from before to after
+        
+        Args:
+            before: State before the change, None for a new sweet
+            after: State after the change, None if the row is gone
+        """
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None or not state.is_active:
+                continue
+            totals = self._deltas[state.category]
+            for index, value in enumerate(_contribution(state)):
+                totals[index] += sign * value
+        return self
+    
+    def merge(self, other: "StatsDelta") -> "StatsDelta":
+        """Add the changes accumulated in another delta"""
+        for category, totals in other._deltas.items():
+            mine = self._deltas[category]
+            for index, value in enumerate(totals):
+                mine[index] += value
+        return self
+    
+    def __bool__(self) -> bool:
+        return any(any(totals) for totals in self._deltas.values())
+    
+    def items(self):
+        """(category, {counter: change}) pairs accumulated so far"""
+        return ((category, dict(zip(COUNTERS, totals))) for category, totals in self._deltas.items())
+    
+    def apply(self, db: Session):
+        """Add the accumulated changes to category_stats (the caller commits)"""
+        for category, delta in self.items():
+            if any(delta.values()):
+                _add_to_category(db, category, delta)
+        self._deltas.clear()
+
+
+def record_change(db: Session, before: Optional[SweetState], after: Optional[SweetState]):
+    """Apply one sweet's change to the statistics in the current transaction"""
+    StatsDelta().add(before, after).apply(db)
+
+
+def _add_to_category(db: Session, category: str, delta: Dict[str, Any]):
+    columns = CategoryStats.__table__.c
+    upsert = _UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    
+    if upsert is not None:
+        stmt = upsert(CategoryStats).values(category=category, **delta)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[columns.category],
+            set_={name: columns[name] + stmt.excluded[name] for name in COUNTERS}
+        ))
+        return
+    
+    result = db.execute(
+        update(CategoryStats)
+        .where(columns.category == category)
+        .values({name: columns[name] + value for name, value in delta.items()})
+    )
+    if result.rowcount == 0:
+        db.execute(insert(CategoryStats).values(category=category, **delta))
+
+
+def recompute_stats(db: Session):
+    """Rebuild every counter from the sweets table (the caller commits)"""
+    quantity = Sweet.quantity
+    db.execute(delete(CategoryStats))
+    db.execute(
+        insert(CategoryStats).from_select(
+            ["category", *COUNTERS],
+            select(
+                Sweet.category,
+                func.count(),
+                func.sum(case((quantity > 0, 1), else_=0)),
+                func.sum(case((quantity == 0, 1), else_=0)),
+                func.sum(case(((quantity > 0) & (quantity <= LOW_STOCK_THRESHOLD), 1), else_=0)),
+                func.sum(quantity),
+                func.sum(quantity * Sweet.price),
+                func.sum(case((Sweet.stock_slots > 0, 1), else_=0)),
+            )
+            .where(Sweet.is_active == True)
+            .group_by(Sweet.category)
+        )
+    )
+
+
+def backfill_stats(db: Session) -> bool:
+    """
+    Recompute the counters if they are empty but active sweets exist
+    
+    Covers databases filled around the routes, e.g. by seed scripts.
+    
+    Returns:
+        True if the counters were rebuilt (the caller commits)
+    """
+    if db.scalar(select(CategoryStats.category).limit(1)) is not None:
+        return False
+    if db.scalar(select(Sweet.id).where(Sweet.is_active == True).limit(1)) is None:
+        return False
+    recompute_stats(db)
+    return True
+
+
+def read_stats(db: Session) -> Dict[str, Any]:
+    """
+    Catalog totals and per-category counters
+    
+    Returns:
+        Dictionary matching InventoryStatsResponse
+    """
+    rows = (
+        db.query(CategoryStats)
+        .filter(CategoryStats.products > 0)
+        .order_by(CategoryStats.category)
+        .all()
+    )
+    categories = [{"category": row.category, **{name: getattr(row, name) for name in COUNTERS}} for row in rows]
+    
+    if any(category["hot_products"] for category in categories):
+        by_name = {category["category"]: category for category in categories}
+        for name, delta in _live_hot_stock(db).items():
+            for counter, change in delta.items():
+                by_name[name][counter] += change
+    
+    for category in categories:
+        category["stock_value"] = round(category["stock_value"], 2)
+    totals = {name: sum(category[name] for category in categories) for name in COUNTERS}
+    totals["stock_value"] = round(totals["stock_value"], 2)
+    
+    return {**totals, "low_stock_threshold": LOW_STOCK_THRESHOLD, "categories": categories}
+
+
+def _live_hot_stock(db: Session) -> StatsDelta:
+    # Counters recorded hot sweets at their last admin write
+    rows = db.execute(
+        select(Sweet.category, Sweet.price, Sweet.quantity, Sweet.stock_slots, func.sum(StockSlot.quantity))
+        .join(StockSlot, StockSlot.sweet_id == Sweet.id)
+        .where(SWEET_HOT, Sweet.is_active == True)
+        .group_by(Sweet.id, Sweet.category, Sweet.price, Sweet.quantity, Sweet.stock_slots)
+    )
+    delta = StatsDelta()
+    for category, price, recorded, slots, live in rows:
+        delta.add(SweetState(category, price, recorded, True, slots), SweetState(category, price, live, True, slots))
+    return delta
@@ -0,0 +1,316 @@
+"""
+Append-only inventory ledger
+
+Every purchase and restock adds a row to inventory_movements: the
+sweet, the user, the signed change in stock, the stock left and when it
+happened. LEDGER_MODE picks how the rows reach the table:
+
+- queued (default): record() keeps the rows on the session until its
+  transaction commits, then hands them to a bounded in-process queue. A
+  background thread inserts them in batches of up to LEDGER_BATCH_SIZE
+  rows, at least every LEDGER_FLUSH_SECONDS, with one commit per batch,
+  so a purchase pays for neither an extra statement nor an extra
+  commit. Rows of rolled back transactions are dropped with them. A
+  clean shutdown writes what is still queued; a killed worker loses it.
+- sync: record() inserts the rows in the caller's transaction, so stock
+  and ledger commit or roll back together, for strict auditing.
+
+While the queue is full, record() takes the sync path instead, so a
+burst costs one more INSERT per transaction rather than a blocked
+request or a lost entry.
+
+Purchases and returned stock hand their inventory statistics changes
+to record_stats(), which follows the same mode: queued changes are
+summed per category over a batch and applied in the batch's commit, so
+the per-category counter rows are written once per batch instead of
+once per purchase.
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import event, insert, tuple_
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import get_session_factory
+from app.inventory_stats import StatsDelta, SweetState, record_change
+from app.metrics import LEDGER_BATCHES, LEDGER_MOVEMENTS, LEDGER_WRITE_FAILURES
+from app.models import InventoryMovement, MovementKind, Sweet
+
+logger = logging.getLogger(__name__)
+
+LEDGER_MODES = ("queued", "sync")
+
+# Session.info key for rows and statistics changes waiting for their
+# transaction to commit
+_PENDING = "ledger_pending"
+
+# Queue markers: write the rows gathered so far, or write them and exit
+_FLUSH = object()
+_STOP = object()
+
+
+def movement(sweet: Sweet, kind: MovementKind, change: int, user_id: Optional[int]) -> Dict:
+    """
+    Ledger row for a sweet whose stock just changed
+    
+    Args:
+        sweet: Sweet holding its new quantity
+        kind: Purchase or restock
+        change: Units added to stock, negative for purchases
+        user_id: User who made the change
+    """
+    return {
+        "sweet_id": sweet.id,
+        "user_id": user_id,
+        "kind": kind,
+        "quantity": change,
+        "quantity_after": sweet.quantity,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+class InventoryLedger:
+    """
+    Writes ledger rows in the caller's transaction or through a batching writer thread
+    
+    Args:
+        mode: "queued" or "sync"
+        queue_size: Committed transactions waiting for the writer before
+            record() falls back to the sync path
+        batch_size: Rows the writer gathers before inserting
+        flush_seconds: Longest a queued row waits for its batch to fill
+        session_factory: Builds the writer's sessions; the application's
+            sync session factory by default
+        background: Start the writer thread on first use; without it,
+            queued rows wait for flush()
+    """
+    
+    def __init__(
+        self,
+        mode: str = "queued",
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_seconds: float = 0.5,
+        session_factory: Optional[Callable[[], Session]] = None,
+        background: bool = True
+    ):
+        if mode not in LEDGER_MODES:
+            raise ValueError(f"Unknown ledger mode {mode!r}, expected one of {', '.join(LEDGER_MODES)}")
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.session_factory = session_factory
+        self.background = background
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def record(self, db: Session, rows: List[Dict]):
+        """
+        Add ledger rows for stock changes made in db's transaction
+        
+        Call before the caller commits. Queued rows are handed to the
+        writer by the session's after_commit event.
+        """
+        if self.mode == "sync" or self._queue.full():
+            db.execute(insert(InventoryMovement), rows)
+            LEDGER_MOVEMENTS.labels("sync" if self.mode == "sync" else "overflow").inc(len(rows))
+            return
+        self._pending(db)[0].extend(rows)
+    
+    def record_stats(self, db: Session, before: Optional[SweetState], after: Optional[SweetState]):
+        """
+        Add one sweet's change to the inventory statistics
+        
+        Call before the caller commits. In the sync mode, or while the
+        queue is full, the change is applied in db's transaction.
+        """
+        if self.mode == "sync" or self._queue.full():
+            record_change(db, before, after)
+            return
+        self._pending(db)[1].add(before, after)
+    
+    def flush(self):
+        """Write every queued row and statistics change before returning"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_FLUSH)
+            self._queue.join()
+            return
+        rows, stats = self._drain()
+        if rows or stats:
+            self._write(rows, stats)
+    
+    def close(self):
+        """Write queued rows and stop the writer thread (at shutdown)"""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+        self._thread = None
+        self.flush()
+    
+    def clear(self):
+        """Drop queued rows without writing them"""
+        self._drain()
+    
+    def _pending(self, db: Session) -> Tuple[List[Dict], StatsDelta]:
+        pending = db.info.setdefault(_PENDING, {})
+        if self not in pending:
+            pending[self] = ([], StatsDelta())
+        return pending[self]
+    
+    def _committed(self, rows: List[Dict], stats: StatsDelta):
+        if not (rows or stats):
+            return
+        self._start_writer()
+        try:
+            self._queue.put_nowait((rows, stats))
+        except queue.Full:
+            # Another transaction took the last slot after record() checked
+            self._write(rows, stats)
+            LEDGER_MOVEMENTS.labels("overflow").inc(len(rows))
+            return
+        LEDGER_MOVEMENTS.labels("queued").inc(len(rows))
+    
+    def _start_writer(self):
+        if not self.background or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="inventory-ledger", daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        running = True
+        while running:
+            batch: List[Dict] = []
+            stats = StatsDelta()
+            taken = 0
+            deadline = None
+            
+            # Block for the first rows, then gather more until the batch
+            # is full, flush_seconds have passed or a marker arrives
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is _STOP:
+                    running = False
+                    break
+                if item is _FLUSH:
+                    break
+                batch.extend(item[0])
+                stats.merge(item[1])
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+            
+            if batch or stats:
+                self._write(batch, stats)
+            for _ in range(taken):
+                self._queue.task_done()
+    
+    def _drain(self) -> Tuple[List[Dict], StatsDelta]:
+        rows, stats = [], StatsDelta()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return rows, stats
+            if isinstance(item, tuple):
+                rows.extend(item[0])
+                stats.merge(item[1])
+            self._queue.task_done()
+    
+    def _write(self, rows: List[Dict], stats: StatsDelta):
+        db = (self.session_factory or get_session_factory())()
+        try:
+            if rows:
+                db.execute(insert(InventoryMovement), rows)
+            stats.apply(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            LEDGER_WRITE_FAILURES.inc()
+            # Lost statistics changes are repaired by POST /api/sweets/stats/recompute
+            logger.exception("Failed to write %d inventory ledger entries and statistics: %r", len(rows), rows)
+        else:
+            if rows:
+                LEDGER_BATCHES.observe(len(rows))
+        finally:
+            db.close()
+
+
+ledger = InventoryLedger(
+    mode=settings.LEDGER_MODE,
+    queue_size=settings.LEDGER_QUEUE_SIZE,
+    batch_size=settings.LEDGER_BATCH_SIZE,
+    flush_seconds=settings.LEDGER_FLUSH_SECONDS
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _queue_committed_rows(session: Session):
+    for pending_ledger, (rows, stats) in session.info.pop(_PENDING, {}).items():
+        pending_ledger._committed(rows, stats)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_rows(session: Session, previous_transaction):
+    session.info.pop(_PENDING, None)
+
+
+def _utc(value: datetime) -> datetime:
+    # Stored times are UTC; a time without an offset is taken as UTC too
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def query_movements(
+    db: Session,
+    sweet_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    limit: int = 100
+) -> List[InventoryMovement]:
+    """
+    Ledger entries in (created_at, id) order
+    
+    Args:
+        db: Database session
+        sweet_id: Only entries for this sweet
+        since: Entries at or after this time
+        until: Entries before this time
+        after: (created_at, id) of the last entry already seen
+        limit: Maximum number of entries
+    
+    Returns:
+        List of InventoryMovement objects
+    """
+    created_at = InventoryMovement.created_at
+    query = db.query(InventoryMovement)
+    
+    if sweet_id is not None:
+        query = query.filter(InventoryMovement.sweet_id == sweet_id)
+    
+    if since is not None:
+        query = query.filter(created_at >= _utc(since))
+    
+    if until is not None:
+        query = query.filter(created_at < _utc(until))
+    
+    if after is not None:
+        # Keyset seek on the (created_at, id) index order
+        at, last_id = after
+        query = query.filter(tuple_(created_at, InventoryMovement.id) > tuple_(_utc(at), last_id))
+    
+    return query.order_by(created_at, InventoryMovement.id).limit(limit).all()
@@ -1,14 +1,95 @@
 """
 Sweet Shop Management System - Main Application Module
 """
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+import anyio
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from app.catalog import catalog_version
 from app.config import settings
-from app.database import engine, Base
-from app.routes import auth, sweets
+from app.database import ASYNC_DATABASE, Base, dispose_engines, get_async_engine, get_engine, get_session_factory
+from app.inventory_stats import backfill_stats
+from app.ledger import ledger
+from app.reservations import reservation_expiry
+from app.metrics import MetricsMiddleware, mark_worker_stopped, metrics_response
+from app.query_stats import QUERY_COUNT_HEADER, QUERY_TIME_HEADER, QueryStatsMiddleware
+from app.pool import warm_up, warm_up_async
+from app.routes import admin, auth, sweets
+from app.pagination import NEXT_CURSOR_HEADER, SYNC_CURSOR_HEADER
+
+logger = logging.getLogger(__name__)
+
+
+def create_schema():
+    """Create missing tables and search indexes (development and tests)"""
+    Base.metadata.create_all(bind=get_engine())
+
+
+async def warm_up_pool(connections: int):
+    """Open pooled connections; a failure is logged, not fatal"""
+    try:
+        if ASYNC_DATABASE:
+            await warm_up_async(get_async_engine(), connections)
+        else:
+            await run_in_threadpool(warm_up, get_engine(), connections)
+    except Exception:
+        logger.warning("Connection pool warm-up failed", exc_info=True)
+
+
+def backfill_inventory_stats():
+    """Build the statistics of a catalog filled around the API; a failure is logged, not fatal"""
+    try:
+        with get_session_factory()() as db:
+            if backfill_stats(db):
+                db.commit()
+                logger.info("Inventory statistics were empty; rebuilt them from the sweets table")
+    except Exception:
+        logger.warning("Could not backfill inventory statistics", exc_info=True)
+
+
+def start_reservation_expiry():
+    """Schedule the sweep of existing holds; a failure is logged, not fatal"""
+    try:
+        reservation_expiry.start()
+    except Exception:
+        logger.warning("Could not schedule reservation expiry", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown"""
+    # Size the thread pool that runs sync routes and dependencies
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    
+    # Deployments manage the schema with `alembic upgrade head` instead
+    if settings.DB_CREATE_SCHEMA:
+        await run_in_threadpool(create_schema)
+    
+    # Warm the pool in the background so health checks answer at once;
+    # requests that arrive first just open their own connection
+    warming = asyncio.create_task(warm_up_pool(min(settings.DB_POOL_WARMUP, settings.DB_POOL_SIZE)))
+    
+    # Seed scripts and manual SQL write sweets without the counters
+    await run_in_threadpool(backfill_inventory_stats)
+    # ...or the catalog version, whose shared file outlives this process
+    catalog_version.new_epoch()
+    
+    # Pick up reservations that expire while this worker runs but were
+    # made before it started
+    await run_in_threadpool(start_reservation_expiry)
+    
+    yield
+    
+    await warming
+    await run_in_threadpool(reservation_expiry.close)
+    # Write ledger entries still queued before the pool closes
+    await run_in_threadpool(ledger.close)
+    await dispose_engines()
+    mark_worker_stopped()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -16,7 +97,8 @@ app = FastAPI(
     description="API for managing a sweet shop with inventory and user authentication",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -26,11 +108,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, SYNC_CURSOR_HEADER, QUERY_COUNT_HEADER, QUERY_TIME_HEADER],
+)
+
+# Starlette makes the last-added middleware the outermost: metrics run
+# inside QueryStatsMiddleware, so they read the statements it collects,
+# and both wrap CORS, so preflights are measured too
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(
+    QueryStatsMiddleware,
+    expose_headers=settings.ENVIRONMENT != "production",
+    repeat_threshold=settings.DB_QUERY_REPEAT_THRESHOLD
 )
 
 # Register routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(sweets.router, prefix="/api/sweets", tags=["Sweets"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 
 @app.get("/")
@@ -47,3 +141,9 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics in the text exposition format"""
+    return metrics_response()
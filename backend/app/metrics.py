@@ -0,0 +1,182 @@
+"""
+Prometheus metrics for the API
+
+MetricsMiddleware records request counts, latency histograms, requests
+in flight and SQL statements and time per request, labelled by route template so
+/api/sweets/1 and /api/sweets/2 share one series. Password hashing and
+inventory changes record their own metrics. Everything is served in the
+text exposition format at /metrics.
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory shared by all of them before starting the server. Every worker
+then writes its samples there and /metrics aggregates all workers,
+whichever one answers the scrape. Clear the directory between runs.
+"""
+import os
+import time
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from app.query_stats import current_query_stats
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# Label for requests that matched no route, so unknown paths cannot
+# create unbounded series
+UNMATCHED_ROUTE = "unmatched"
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by method, route template and status code",
+    ["method", "route", "status"],
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last response byte",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being served",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time a request spent executing SQL statements",
+    ["method", "route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements",
+    "SQL statements a request executed",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_seconds",
+    "CPU-bound bcrypt time by operation (hash or verify)",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5),
+)
+PURCHASES = Counter("inventory_purchases_total", "Committed purchase lines, including checkout lines")
+UNITS_SOLD = Counter("inventory_units_sold_total", "Units taken out of stock by purchases")
+RESTOCKS = Counter("inventory_restocks_total", "Committed restocks")
+UNITS_RESTOCKED = Counter("inventory_units_restocked_total", "Units added to stock by restocks")
+PURCHASE_REJECTIONS = Counter(
+    "inventory_purchase_rejections_total",
+    "Purchases refused, by reason (not_found, out_of_stock or insufficient_stock)",
+    ["reason"],
+)
+LEDGER_MOVEMENTS = Counter(
+    "inventory_ledger_movements_total",
+    "Ledger entries recorded, by path (queued, sync, or overflow when the queue was full)",
+    ["path"],
+)
+LEDGER_BATCHES = Histogram(
+    "inventory_ledger_batch_rows",
+    "Ledger entries per background batch insert",
+    buckets=(1, 5, 10, 50, 100, 250, 500, 1000, 5000),
+)
+LEDGER_WRITE_FAILURES = Counter(
+    "inventory_ledger_write_failures_total",
+    "Background ledger batches that failed to insert (entries are logged)",
+)
+
+RESERVATIONS = Counter(
+    "inventory_reservations_total",
+    "Stock reservations by outcome (held, confirmed, released or expired)",
+    ["outcome"],
+)
+
+STOCK_FEED_SUBSCRIBERS = Gauge(
+    "stock_feed_subscribers",
+    "Open stock change streams",
+    multiprocess_mode="livesum",
+)
+STOCK_FEED_CHANGES = Counter(
+    "stock_feed_changes_total",
+    "Sweet changes published to the stock change streams",
+)
+STOCK_FEED_RESETS = Counter(
+    "stock_feed_resets_total",
+    "Stream subscribers told to refetch after their buffer overflowed",
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording HTTP metrics, also for streamed bodies
+    
+    Runs inside QueryStatsMiddleware, which collects the SQL statements.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        status_code = 500
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", UNMATCHED_ROUTE)
+            REQUESTS.labels(method, route_path, str(status_code)).inc()
+            REQUEST_SECONDS.labels(method, route_path).observe(elapsed)
+            stats = current_query_stats()
+            if stats is not None:
+                REQUEST_DB_SECONDS.labels(method, route_path).observe(stats.seconds)
+                REQUEST_DB_STATEMENTS.labels(method, route_path).observe(stats.count)
+
+
+def record_purchase(quantity: int):
+    PURCHASES.inc()
+    UNITS_SOLD.inc(quantity)
+
+
+def record_restock(quantity: int):
+    RESTOCKS.inc()
+    UNITS_RESTOCKED.inc(quantity)
+
+
+def metrics_response() -> Response:
+    """All metrics in the text exposition format, across workers in multiprocess mode"""
+    registry = REGISTRY
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_worker_stopped():
+    """Drop this worker's live gauges from the multiprocess aggregate"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,18 +1,39 @@
 """
 Database models for Sweet Shop Management System
 """
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Enum as SQLEnum
+from sqlalchemy import (
+    Column, Integer, String, Float, Boolean, DateTime, Enum as SQLEnum, ForeignKey, Index, and_, exists, literal_column, or_
+)
 from sqlalchemy.sql import func
+from datetime import datetime, timezone
 from app.database import Base
 import enum
 
 
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class UserRole(str, enum.Enum):
     """User role enumeration"""
     ADMIN = "admin"
     USER = "user"
 
 
+class MovementKind(str, enum.Enum):
+    """Inventory ledger entry type"""
+    PURCHASE = "purchase"
+    RESTOCK = "restock"
+
+
+class ReservationStatus(str, enum.Enum):
+    """Stock reservation lifecycle: held until confirmed, released or expired"""
+    HELD = "held"
+    CONFIRMED = "confirmed"
+    RELEASED = "released"
+    EXPIRED = "expired"
+
+
 class User(Base):
     """User model for authentication and authorization"""
     __tablename__ = "users"
@@ -35,15 +56,49 @@ class Sweet(Base):
     __tablename__ = "sweets"
     
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False, index=True)
+    name = Column(String, nullable=False)
     category = Column(String, nullable=False, index=True)
     price = Column(Float, nullable=False)
     quantity = Column(Integer, nullable=False, default=0)
     description = Column(String, nullable=True)
     image_url = Column(String, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
+    # Hot mode: stock kept in this many sweet_stock_slots rows (app.stock_slots), 0 for none
+    stock_slots = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Set on insert too, so GET /api/sweets/changes sees new sweets. Taken
+    # from the application clock: SQLite's CURRENT_TIMESTAMP has no
+    # fractional seconds and would not compare with stored cursor values
+    updated_at = Column(DateTime(timezone=True), default=utc_now, onupdate=utc_now)
+    
+    # Indexes shaped after the catalog queries (migration 0002). The
+    # partial ones hold only the rows those queries can return, so they
+    # stay small and a boolean column never leads an index.
+    __table_args__ = (
+        # Import upserts look sweets up by natural key, name first
+        Index("ix_sweets_name_category", name, category),
+        # Listing active sweets in ID order, incl. cursor pages
+        Index("ix_sweets_active", id, sqlite_where=is_active == True, postgresql_where=is_active == True),
+        # Listing and searching in-stock sweets, by ID or by price range
+        Index(
+            "ix_sweets_in_stock", id,
+            sqlite_where=and_(is_active == True, quantity > 0),
+            postgresql_where=and_(is_active == True, quantity > 0)
+        ),
+        Index(
+            "ix_sweets_in_stock_price", price,
+            sqlite_where=and_(is_active == True, quantity > 0),
+            postgresql_where=and_(is_active == True, quantity > 0)
+        ),
+        # Delta sync reads sweets in (updated_at, id) order (migration 0008)
+        Index("ix_sweets_updated", updated_at, id),
+        # Finding the few sweets in hot mode (migration 0006)
+        Index(
+            "ix_sweets_hot", id,
+            sqlite_where=stock_slots > literal_column("0"),
+            postgresql_where=stock_slots > literal_column("0")
+        ),
+    )
     
     def __repr__(self):
         return f"<Sweet(id={self.id}, name='{self.name}', quantity={self.quantity})>"
@@ -55,3 +110,87 @@ class Sweet(Base):
     def can_purchase(self, quantity: int) -> bool:
         """Check if purchase quantity is valid"""
         return self.is_in_stock() and self.quantity >= quantity > 0
+
+
+class StockSlot(Base):
+    """One counter holding part of a hot sweet's stock (app.stock_slots)"""
+    __tablename__ = "sweet_stock_slots"
+    
+    sweet_id = Column(Integer, ForeignKey("sweets.id"), primary_key=True)
+    slot = Column(Integer, primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+
+
+# "quantity > 0" with the zero inlined: planners can only match a query
+# to the partial in-stock indexes when the predicate is a literal. Hot
+# sweets keep their quantity column at the last admin write, so they
+# also need a slot with units left.
+SWEET_IN_STOCK = and_(
+    Sweet.quantity > literal_column("0"),
+    or_(
+        Sweet.stock_slots == literal_column("0"),
+        exists().where(StockSlot.sweet_id == Sweet.id, StockSlot.quantity > literal_column("0"))
+    )
+)
+
+# Sweets in hot mode, matched to ix_sweets_hot
+SWEET_HOT = Sweet.stock_slots > literal_column("0")
+
+
+class CategoryStats(Base):
+    """Running inventory counters for the active sweets of one category (app.inventory_stats)"""
+    __tablename__ = "category_stats"
+    
+    category = Column(String, primary_key=True)
+    products = Column(Integer, nullable=False, default=0)
+    in_stock = Column(Integer, nullable=False, default=0)
+    out_of_stock = Column(Integer, nullable=False, default=0)
+    low_stock = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    stock_value = Column(Float, nullable=False, default=0.0)
+    hot_products = Column(Integer, nullable=False, default=0)
+
+
+class InventoryMovement(Base):
+    """Append-only ledger entry for one stock change (app.ledger)"""
+    __tablename__ = "inventory_movements"
+    
+    id = Column(Integer, primary_key=True)
+    sweet_id = Column(Integer, ForeignKey("sweets.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    kind = Column(SQLEnum(MovementKind), nullable=False)
+    # Signed change: negative for purchases
+    quantity = Column(Integer, nullable=False)
+    quantity_after = Column(Integer, nullable=False)
+    # Set when the change is made, not when a batch reaches the table
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    
+    # Both ledger queries read in (created_at, id) order (migration 0005)
+    __table_args__ = (
+        Index("ix_inventory_movements_sweet_created", sweet_id, created_at, id),
+        Index("ix_inventory_movements_created", created_at, id),
+    )
+    
+    def __repr__(self):
+        return f"<InventoryMovement(id={self.id}, sweet_id={self.sweet_id}, kind='{self.kind}', quantity={self.quantity})>"
+
+
+class StockReservation(Base):
+    """Units taken out of stock while a checkout's payment runs (app.reservations)"""
+    __tablename__ = "stock_reservations"
+    
+    id = Column(Integer, primary_key=True)
+    sweet_id = Column(Integer, ForeignKey("sweets.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    status = Column(SQLEnum(ReservationStatus), default=ReservationStatus.HELD, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # The expiry sweep reads held reservations in expires_at order (migration 0007)
+    __table_args__ = (
+        Index("ix_stock_reservations_status_expires", status, expires_at),
+    )
+    
+    def __repr__(self):
+        return f"<StockReservation(id={self.id}, sweet_id={self.sweet_id}, quantity={self.quantity}, status='{self.status}')>"
@@ -0,0 +1,74 @@
+"""
+Opaque cursors for keyset pagination
+
+A cursor records the sort key of the last row a client has seen, so the
+next page starts with an index seek instead of scanning and discarding
+every earlier row the way OFFSET does.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Tuple
+from fastapi import HTTPException, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Where a delta sync should resume; always sent, unlike NEXT_CURSOR_HEADER
+SYNC_CURSOR_HEADER = "X-Sync-Cursor"
+
+
+def _encode(payload: dict) -> str:
+    data = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> dict:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    payload = json.loads(base64.urlsafe_b64decode(padded))
+    if not isinstance(payload, dict) or not isinstance(payload.get("id"), int):
+        raise ValueError(payload)
+    return payload
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid pagination cursor"
+    )
+
+
+def encode_cursor(last_id: int) -> str:
+    """Encode the last seen sweet ID as an opaque, URL-safe cursor"""
+    return _encode({"id": last_id})
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decode a cursor produced by encode_cursor
+    
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    try:
+        return _decode(cursor)["id"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise _invalid_cursor()
+
+
+def encode_time_cursor(at: datetime, last_id: int) -> str:
+    """Encode the timestamp and ID of the last seen row, for lists ordered by both"""
+    return _encode({"at": at.isoformat(), "id": last_id})
+
+
+def decode_time_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_time_cursor
+    
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    try:
+        payload = _decode(cursor)
+        return datetime.fromisoformat(payload["at"]), payload["id"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise _invalid_cursor()
@@ -0,0 +1,215 @@
+"""
+Connection pool configuration and metrics
+
+Pool size, overflow, timeout and recycle come from the DB_POOL_* settings.
+Pre-ping is applied by strategy: "always" pings on every checkout, "idle"
+only pings connections that sat in the pool longer than
+DB_POOL_PRE_PING_IDLE_SECONDS, and "never" skips it. Every pooled engine
+counts checkouts, time spent waiting for a connection, timeouts and
+pings, so pools can be sized per worker from /api/admin/pool.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.config import settings
+
+PRE_PING_STRATEGIES = ("always", "idle", "never")
+
+
+class PoolStats:
+    """Thread-safe counters for one pool"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.pings = 0
+        self.ping_failures = 0
+    
+    def record_checkout(self, waited: float, timed_out: bool):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+    
+    def record_ping(self, ok: bool):
+        with self._lock:
+            self.pings += 1
+            if not ok:
+                self.ping_failures += 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+                "pings": self.pings,
+                "ping_failures": self.ping_failures,
+            }
+
+
+class _InstrumentedPoolMixin:
+    """Time every connection request, including ones that time out"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_checkout(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record_checkout(time.perf_counter() - started, timed_out=False)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    """QueuePool that records checkout waits and timeouts"""
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout waits and timeouts"""
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def pool_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """
+    Engine keyword arguments for the configured pool
+    
+    In-memory SQLite keeps SQLAlchemy's single-connection pool, which has
+    no size to configure.
+    
+    Args:
+        url: Database URL the engine is created with
+        is_async: Whether the engine is an AsyncEngine
+    
+    Returns:
+        Keyword arguments for create_engine / create_async_engine
+    """
+    if settings.DB_POOL_PRE_PING not in PRE_PING_STRATEGIES:
+        raise ValueError(
+            f"DB_POOL_PRE_PING must be one of {', '.join(PRE_PING_STRATEGIES)}, "
+            f"got {settings.DB_POOL_PRE_PING!r}"
+        )
+    
+    if _is_memory_sqlite(url):
+        return {}
+    
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+
+def install_pre_ping(engine: Engine):
+    """
+    Ping connections on checkout according to DB_POOL_PRE_PING
+    
+    A failed ping raises DisconnectionError, which makes the pool discard
+    the connection and hand out a fresh one.
+    """
+    strategy = settings.DB_POOL_PRE_PING
+    if strategy == "never":
+        return
+    
+    idle_threshold = settings.DB_POOL_PRE_PING_IDLE_SECONDS if strategy == "idle" else 0.0
+    
+    @event.listens_for(engine, "checkin")
+    def _mark_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+    
+    @event.listens_for(engine, "checkout")
+    def _ping_on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_threshold:
+            # Brand-new connections were just proven by connecting
+            return
+        
+        stats = getattr(engine.pool, "stats", None)
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception as error:
+            if stats is not None:
+                stats.record_ping(ok=False)
+            raise exc.DisconnectionError() from error
+        if stats is not None:
+            stats.record_ping(ok=True)
+
+
+def warm_up(engine: Engine, connections: int):
+    """Open connections up front so the first requests skip connecting"""
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(engine.connect())
+    finally:
+        for connection in opened:
+            connection.close()
+
+
+async def warm_up_async(engine: AsyncEngine, connections: int):
+    """Async counterpart of warm_up"""
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(await engine.connect())
+    finally:
+        for connection in opened:
+            await connection.close()
+
+
+def pool_status(engine: Engine) -> Dict[str, Any]:
+    """
+    Report an engine's pool occupancy and counters for this worker
+    
+    Args:
+        engine: Engine whose pool to inspect (use AsyncEngine.sync_engine)
+    
+    Returns:
+        Dictionary matching PoolStatusResponse
+    """
+    pool = engine.pool
+    status = {
+        "pid": os.getpid(),
+        "pool_class": type(pool).__name__,
+        "pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+        )
+    
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(stats.snapshot())
+    
+    return status
@@ -0,0 +1,124 @@
+"""
+Per-request SQL statement counting
+
+SQLAlchemy cursor events add every statement and its execution time to
+the QueryStats of the request that ran it. QueryStatsMiddleware opens
+one per request; outside production it also reports them in the
+X-DB-Query-Count and X-DB-Time-Ms response headers and logs statements
+that ran often enough in one request to suggest an N+1 query pattern.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+QUERY_TIME_HEADER = "X-DB-Time-Ms"
+
+
+class QueryStats:
+    """Statements run and seconds spent executing them"""
+    
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+    
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+    
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements that ran at least threshold times, most frequent first"""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """QueryStats of the running request, if one is being tracked"""
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Record the statements run in this context
+    
+    Worker threads started with run_in_threadpool and tasks started from
+    the block copy the context, so their statements count too.
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    started = getattr(context, "query_started", None)
+    if stats is not None and started is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+class QueryStatsMiddleware:
+    """
+    Pure ASGI middleware tracking the statements each request runs
+    
+    Args:
+        app: Wrapped ASGI application
+        expose_headers: Add the query count and time headers, and warn
+            about repeated statements
+        repeat_threshold: Runs of one statement in a request that count
+            as a likely N+1 pattern
+    """
+    
+    def __init__(self, app, expose_headers: bool = False, repeat_threshold: int = 10):
+        self.app = app
+        self.expose_headers = expose_headers
+        self.repeat_threshold = repeat_threshold
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        with track_queries() as stats:
+            if not self.expose_headers:
+                await self.app(scope, receive, send)
+                return
+            
+            async def send_with_stats(message):
+                if message["type"] == "http.response.start":
+                    # Streamed bodies only count what ran before the first chunk
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (QUERY_COUNT_HEADER.lower().encode(), str(stats.count).encode()),
+                        (QUERY_TIME_HEADER.lower().encode(), f"{stats.seconds * 1000:.2f}".encode()),
+                    ]
+                await send(message)
+            
+            await self.app(scope, receive, send_with_stats)
+            
+            for statement, count in stats.repeated(self.repeat_threshold):
+                logger.warning(
+                    "Possible N+1 query: %s %s ran one statement %d times: %s",
+                    scope["method"], scope["path"], count, statement
+                )
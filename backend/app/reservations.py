@@ -0,0 +1,297 @@
+"""
+Time-limited stock reservations for checkout
+
+Reserving takes units out of stock like a purchase and records a held
+reservation with an expiry time, so a shopper keeps the stock while
+payment runs. Confirming turns the hold into a purchase (the ledger
+entry is written then); releasing puts the units back. Both are a
+single conditional UPDATE on the reservation, so a hold is confirmed,
+released or expired exactly once however the calls race.
+
+Expired holds are returned to stock in bulk by ReservationExpiry: each
+worker keeps the expiry times of the holds it created in a min-heap,
+sleeps until the earliest one and then sweeps every due hold through
+the (status, expires_at) index, RESERVATION_EXPIRY_BATCH at a time. No
+request scans for expired holds.
+"""
+import heapq
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import get_session_factory
+from app.inventory import increment_stock
+from app.metrics import RESERVATIONS
+from app.models import ReservationStatus, StockReservation
+
+logger = logging.getLogger(__name__)
+
+_HELD = StockReservation.status == ReservationStatus.HELD
+
+
+def _utc(value: datetime) -> datetime:
+    # Stored times are UTC; SQLite hands them back without an offset
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def hold_expiry(ttl_seconds: Optional[int] = None) -> datetime:
+    """Expiry time for a hold made now, capped at RESERVATION_MAX_TTL_SECONDS"""
+    ttl = min(ttl_seconds or settings.RESERVATION_TTL_SECONDS, settings.RESERVATION_MAX_TTL_SECONDS)
+    return datetime.now(timezone.utc) + timedelta(seconds=ttl)
+
+
+def close_reservation(
+    db: Session,
+    reservation_id: int,
+    user_id: int,
+    outcome: ReservationStatus
+) -> Optional[StockReservation]:
+    """
+    Move a user's unexpired hold to its final status
+    
+    Releasing also puts the units back into stock.
+    
+    Args:
+        db: Database session (the caller owns the commit)
+        reservation_id: Reservation to close
+        user_id: User who made the reservation
+        outcome: CONFIRMED or RELEASED
+    
+    Returns:
+        The reservation, or None if it is not this user's or is no
+        longer held
+    """
+    stmt = (
+        update(StockReservation)
+        .where(
+            StockReservation.id == reservation_id,
+            StockReservation.user_id == user_id,
+            _HELD,
+            StockReservation.expires_at > datetime.now(timezone.utc)
+        )
+        .values(status=outcome)
+        .execution_options(synchronize_session=False)
+    )
+    
+    if db.get_bind().dialect.update_returning:
+        reservation = db.scalars(stmt.returning(StockReservation)).one_or_none()
+    elif db.execute(stmt).rowcount == 1:
+        reservation = db.get(StockReservation, reservation_id, populate_existing=True)
+    else:
+        reservation = None
+    
+    if reservation is not None and outcome == ReservationStatus.RELEASED:
+        increment_stock(db, reservation.sweet_id, reservation.quantity)
+    return reservation
+
+
+def reservation_error(db: Session, reservation_id: int, user_id: int) -> HTTPException:
+    """
+    Explain why a reservation could not be closed
+    
+    Returns:
+        HTTPException describing the failure
+    """
+    reservation = db.get(StockReservation, reservation_id)
+    
+    if reservation is None or reservation.user_id != user_id:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Reservation with ID {reservation_id} not found"
+        )
+    
+    if reservation.status in (ReservationStatus.HELD, ReservationStatus.EXPIRED):
+        return HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"Reservation {reservation_id} has expired"
+        )
+    
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Reservation {reservation_id} is already {reservation.status.value}"
+    )
+
+
+def expire_reservations(db: Session, now: datetime, limit: int = 500) -> int:
+    """
+    Return up to limit holds that expired by now to stock
+    
+    Marks them expired in one statement, oldest first, then adds the
+    units back per sweet in sweet ID order.
+    
+    Args:
+        db: Database session (the caller owns the commit)
+        now: Expire holds with expires_at at or before this time
+        limit: Most holds to expire
+    
+    Returns:
+        Number of holds expired
+    """
+    due = (_HELD, StockReservation.expires_at <= now)
+    oldest = select(StockReservation.id).where(*due).order_by(StockReservation.expires_at).limit(limit)
+    expire = (
+        update(StockReservation)
+        .values(status=ReservationStatus.EXPIRED)
+        .execution_options(synchronize_session=False)
+    )
+    
+    if db.get_bind().dialect.update_returning:
+        expired = db.execute(
+            expire.where(StockReservation.id.in_(oldest.scalar_subquery()), *due)
+            .returning(StockReservation.sweet_id, StockReservation.quantity)
+        ).all()
+    else:
+        rows = db.execute(
+            select(StockReservation.id, StockReservation.sweet_id, StockReservation.quantity)
+            .where(*due)
+            .order_by(StockReservation.expires_at)
+            .limit(limit)
+            .with_for_update()
+        ).all()
+        db.execute(expire.where(StockReservation.id.in_([row.id for row in rows])))
+        expired = [(row.sweet_id, row.quantity) for row in rows]
+    
+    quantities: Dict[int, int] = defaultdict(int)
+    for sweet_id, quantity in expired:
+        quantities[sweet_id] += quantity
+    for sweet_id in sorted(quantities):
+        increment_stock(db, sweet_id, quantities[sweet_id])
+    return len(expired)
+
+
+def next_expiry(db: Session) -> Optional[datetime]:
+    """Expiry time of the earliest held reservation (one index lookup)"""
+    earliest = db.scalar(select(func.min(StockReservation.expires_at)).where(_HELD))
+    return None if earliest is None else _utc(earliest)
+
+
+class ReservationExpiry:
+    """
+    Sweeps expired holds when the earliest expiry time on a min-heap comes due
+    
+    Args:
+        batch_size: Holds expired per transaction
+        session_factory: Builds the sweeper's sessions; the application's
+            sync session factory by default
+        background: Start the sweeper thread on first use; without it,
+            due holds wait for run_due()
+    """
+    
+    def __init__(
+        self,
+        batch_size: int = 500,
+        session_factory: Optional[Callable[[], Session]] = None,
+        background: bool = True
+    ):
+        self.batch_size = batch_size
+        self.session_factory = session_factory
+        self.background = background
+        self._heap: List[Tuple[datetime, int]] = []
+        self._wakeup = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+    
+    def schedule(self, expires_at: datetime, reservation_id: int = 0):
+        """Sweep once expires_at has passed (call after the hold commits)"""
+        entry = (_utc(expires_at), reservation_id)
+        with self._wakeup:
+            heapq.heappush(self._heap, entry)
+            # Only a new earliest time shortens the sweeper's sleep
+            if self._heap[0] == entry:
+                self._wakeup.notify()
+        self._start_sweeper()
+    
+    def start(self):
+        """Schedule holds left by earlier runs or other workers (at startup)"""
+        with self._session() as db:
+            earliest = next_expiry(db)
+        if earliest is not None:
+            self.schedule(earliest)
+    
+    def run_due(self, now: Optional[datetime] = None) -> int:
+        """
+        Expire every hold due by now if a scheduled time has passed
+        
+        Returns:
+            Number of holds expired
+        """
+        now = now or datetime.now(timezone.utc)
+        with self._wakeup:
+            if not self._heap or self._heap[0][0] > now:
+                return 0
+            while self._heap and self._heap[0][0] <= now:
+                heapq.heappop(self._heap)
+        
+        expired = 0
+        with self._session() as db:
+            while True:
+                swept = expire_reservations(db, now, self.batch_size)
+                db.commit()
+                expired += swept
+                if swept < self.batch_size:
+                    break
+            # Holds this worker did not schedule, e.g. from a stopped worker
+            earliest = next_expiry(db)
+        
+        if expired:
+            RESERVATIONS.labels("expired").inc(expired)
+        if earliest is not None:
+            self.schedule(earliest)
+        return expired
+    
+    def close(self):
+        """Stop the sweeper thread (at shutdown); holds stay in the table"""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            with self._wakeup:
+                self._stopping = True
+                self._wakeup.notify()
+            thread.join()
+        self._thread = None
+        self._stopping = False
+    
+    def clear(self):
+        """Forget scheduled expiry times"""
+        with self._wakeup:
+            self._heap.clear()
+    
+    def _session(self) -> Session:
+        return (self.session_factory or get_session_factory())()
+    
+    def _start_sweeper(self):
+        if not self.background or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._wakeup:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="reservation-expiry", daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._stopping:
+                    if self._heap:
+                        timeout = (self._heap[0][0] - datetime.now(timezone.utc)).total_seconds()
+                        if timeout <= 0:
+                            break
+                    else:
+                        timeout = None
+                    self._wakeup.wait(timeout)
+                if self._stopping:
+                    return
+            try:
+                self.run_due()
+            except Exception:
+                logger.exception("Reservation expiry sweep failed")
+                # Retry later rather than spin on a failing database
+                self.schedule(datetime.now(timezone.utc) + timedelta(seconds=5))
+
+
+reservation_expiry = ReservationExpiry(batch_size=settings.RESERVATION_EXPIRY_BATCH)
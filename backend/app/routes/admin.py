@@ -0,0 +1,26 @@
+"""
+Operational routes for administrators
+"""
+from fastapi import APIRouter, Depends
+from app.database import serving_engine
+from app.models import User
+from app.pool import pool_status
+from app.schemas import PoolStatusResponse
+from app.security import get_current_admin_user
+
+router = APIRouter()
+
+
+@router.get("/pool", response_model=PoolStatusResponse)
+async def get_pool_status(current_user: User = Depends(get_current_admin_user)):
+    """
+    Connection pool metrics for the worker serving this request (Admin only)
+    
+    - **checked_out** / **overflow**: Connections in use now, and how many exceed the pool size
+    - **wait_seconds_***: Time requests spent waiting for a connection
+    - **timeouts**: Requests that gave up after DB_POOL_TIMEOUT
+    
+    Counters are per worker process; compare `pid` across calls when
+    running several workers.
+    """
+    return pool_status(serving_engine())
@@ -5,12 +5,12 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from app.database import get_db
+from app.database import DBSession, get_db, run_db
 from app.models import User, UserRole
 from app.schemas import UserRegister, UserLogin, Token, UserResponse
 from app.security import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
     create_access_token,
     get_current_user
 )
@@ -18,9 +18,25 @@ from app.config import settings
 
 router = APIRouter()
 
+# Auth routes stay async so bcrypt can wait on its own limiter; their
+# database calls go through run_db like the sweets routes.
+
+
+def _find_user_by_email(db: Session, email: str):
+    """Look up a user by email (blocking)"""
+    return db.query(User).filter(User.email == email).first()
+
+
+def _save_user(db: Session, user: User) -> User:
+    """Insert a user and reload its generated columns (blocking)"""
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register(user_data: UserRegister, db: DBSession = Depends(get_db)):
     """
     Register a new user
     
@@ -29,7 +45,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     - **name**: User's full name
     """
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await run_db(db, _find_user_by_email, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -37,7 +53,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
     new_user = User(
         email=user_data.email,
@@ -46,17 +62,13 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
         role=UserRole.USER  # Default role
     )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
-    return new_user
+    return await run_db(db, _save_user, new_user)
 
 
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_db)
 ):
     """
     Login with email and password to get JWT token
@@ -67,9 +79,9 @@ async def login(
     Returns JWT access token for authentication
     """
     # Find user by email
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = await run_db(db, _find_user_by_email, form_data.username)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -1,30 +1,69 @@
 """
 Sweet management and inventory routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
-from app.models import User, Sweet
+from datetime import datetime, timedelta, timezone
+from app.config import settings
+from app.database import DBSession, get_db, run_blocking_db, run_db
+from app.models import SWEET_IN_STOCK, MovementKind, ReservationStatus, StockReservation, User, Sweet
 from app.schemas import (
     SweetCreate,
     SweetUpdate,
     SweetResponse,
     PurchaseRequest,
     RestockRequest,
-    InventoryResponse
+    ReserveRequest,
+    ReservationResponse,
+    StockSlotsRequest,
+    InventoryResponse,
+    CheckoutRequest,
+    CheckoutResponse,
+    ImportResponse,
+    InventoryStatsResponse,
+    InventoryMovementResponse
 )
-from app.security import get_current_user, get_current_admin_user
+from app.security import get_current_user, get_current_admin_user, optional_oauth2_scheme
+from app.inventory import decrement_stock, increment_stock, lock_sweet, purchase_error
+from app.inventory_stats import read_stats, recompute_stats, record_change, sweet_state
+from app.ledger import ledger, movement, query_movements
+from app.reservations import close_reservation, hold_expiry, reservation_error, reservation_expiry
+from app.stock_slots import fill_slots, live_quantity, show_live_quantity, with_live_stock
+from app.metrics import RESERVATIONS, record_purchase, record_restock
+from app.pagination import (
+    NEXT_CURSOR_HEADER,
+    SYNC_CURSOR_HEADER,
+    decode_cursor,
+    decode_time_cursor,
+    encode_cursor,
+    encode_time_cursor
+)
+from app.search import get_search_backend
+from app.bulk_import import SweetImporter, format_from_content_type, read_rows, spool_body
+from app.catalog import check_not_modified
+from app.export import EXPORT_MEDIA_TYPES, stream_export
+from app.stock_feed import stage_change, stage_reset, stock_change, stock_feed, stream_changes
+from app.serialization import SWEET_COLUMNS, sweets_response
 
 router = APIRouter()
 
+# Handlers are async and hand their session work to run_db: on the thread
+# pool with a sync engine, on the async driver with an async engine. The
+# blocking bodies live in the underscore helpers below each route. Work
+# that is heavy on CPU rather than I/O goes to run_blocking_db, which
+# keeps it on the thread pool in both modes.
+
 
 # ========== Sweet CRUD Operations ==========
 
 @router.post("", response_model=SweetResponse, status_code=status.HTTP_201_CREATED)
 async def create_sweet(
     sweet_data: SweetCreate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -37,42 +76,152 @@ async def create_sweet(
     - **description**: Optional description
     - **image_url**: Optional image URL
     """
-    new_sweet = Sweet(**sweet_data.dict())
+    return await run_db(db, _create_sweet, sweet_data)
+
+
+def _create_sweet(db: Session, sweet_data: SweetCreate) -> Sweet:
+    new_sweet = Sweet(**sweet_data.model_dump())
     
     db.add(new_sweet)
+    # Flush first so column defaults are filled in
+    db.flush()
+    record_change(db, None, sweet_state(new_sweet))
+    # Stream clients only merge sweets they hold: refetch for a new one
+    stage_reset(db)
     db.commit()
     db.refresh(new_sweet)
+    get_search_backend(db).index_sweet(new_sweet)
     
     return new_sweet
 
 
+@router.post("/import", response_model=ImportResponse)
+async def bulk_import_sweets(
+    request: Request,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    chunk_size: int = Query(1000, ge=1, le=10000)
+):
+    """
+    Bulk create or update sweets from a CSV or NDJSON feed (Admin only)
+    
+    - **format**: `csv` or `ndjson`; defaults to the request Content-Type
+    - **chunk_size**: Rows validated and written per database round trip
+    
+    Rows are matched to existing sweets by name and category. Invalid rows
+    are reported in `errors` and do not stop the rest of the import.
+    """
+    fmt = format or format_from_content_type(request.headers.get("content-type"))
+    
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send text/csv or application/x-ndjson, or pass ?format="
+        )
+    
+    feed = await spool_body(request.stream())
+    try:
+        # Parsing and validating the feed is CPU work: off the event loop
+        return await run_blocking_db(
+            db, lambda session: SweetImporter(session, chunk_size).add_all(read_rows(feed, fmt)).finish()
+        )
+    finally:
+        feed.close()
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_sweets(
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user),
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    chunk_size: int = Query(1000, ge=1, le=10000)
+):
+    """
+    Stream every active sweet as NDJSON or CSV (Admin only)
+    
+    - **format**: `ndjson` (default) or `csv`
+    - **chunk_size**: Rows fetched from the database cursor per chunk
+    
+    Sweets are sent in ID order while they are read, so memory stays flat
+    however large the catalog is. The output can be re-imported through
+    `POST /api/sweets/import`.
+    """
+    return StreamingResponse(
+        stream_export(db, format, chunk_size),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="sweets.{format}"'}
+    )
+
+
 @router.get("", response_model=List[SweetResponse])
 async def get_all_sweets(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: DBSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    in_stock_only: bool = Query(False)
+    in_stock_only: bool = Query(False),
+    cursor: Optional[str] = Query(None)
 ):
     """
     Get all sweets
     
-    - **skip**: Number of records to skip (pagination)
+    - **skip**: Number of records to skip (pagination, ignored with `cursor`)
     - **limit**: Maximum number of records to return
     - **in_stock_only**: Filter to show only sweets in stock
+    - **cursor**: Opaque cursor from the `X-Next-Cursor` header of the previous page
+    
+    Sweets are returned in ID order. When more sweets follow, the
+    `X-Next-Cursor` response header holds the cursor for the next page.
+    Responses carry an ETag; repeat the request with If-None-Match to get
+    304 Not Modified while the catalog is unchanged.
     """
+    not_modified = check_not_modified(request, response)
+    if not_modified is not None:
+        return not_modified
+    
+    after_id = decode_cursor(cursor) if cursor is not None else None
+    # Fetch one extra row to learn whether another page exists
+    sweets = await run_db(db, _list_sweets, skip, limit + 1, in_stock_only, after_id)
+    
+    if len(sweets) > limit:
+        sweets = sweets[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sweets[-1].id)
+    
+    return sweets_response(sweets, response.headers)
+
+
+def _list_sweets(
+    db: Session,
+    skip: int,
+    limit: int,
+    in_stock_only: bool,
+    after_id: Optional[int]
+) -> List[Row]:
     query = db.query(Sweet).filter(Sweet.is_active == True)
     
     if in_stock_only:
-        query = query.filter(Sweet.quantity > 0)
+        query = query.filter(SWEET_IN_STOCK)
+    
+    query = query.order_by(Sweet.id)
     
-    sweets = query.offset(skip).limit(limit).all()
-    return sweets
+    if after_id is not None:
+        # Keyset pagination: seek past the last seen ID instead of skipping rows
+        query = query.filter(Sweet.id > after_id)
+    else:
+        query = query.offset(skip)
+    
+    # Plain column rows: no ORM identity map, encoded straight to JSON
+    return with_live_stock(db, query.with_entities(*SWEET_COLUMNS).limit(limit).all())
 
 
 @router.get("/search", response_model=List[SweetResponse])
 async def search_sweets(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: DBSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
     name: Optional[str] = Query(None, min_length=1),
     category: Optional[str] = Query(None, min_length=1),
@@ -89,13 +238,34 @@ async def search_sweets(
     - **max_price**: Maximum price filter
     - **in_stock_only**: Show only sweets in stock (default: true)
     """
-    query = db.query(Sweet).filter(Sweet.is_active == True)
+    not_modified = check_not_modified(request, response)
+    if not_modified is not None:
+        return not_modified
     
-    if name:
-        query = query.filter(Sweet.name.ilike(f"%{name}%"))
+    search_backend = await run_db(db, get_search_backend)
+    if not search_backend.loaded():
+        # Building an in-process index is CPU work: off the event loop
+        await run_blocking_db(db, search_backend.load)
+    
+    sweets = await run_db(db, _search_sweets, name, category, min_price, max_price, in_stock_only)
+    
+    return sweets_response(sweets, response.headers)
+
+
+def _search_sweets(
+    db: Session,
+    name: Optional[str],
+    category: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    in_stock_only: bool
+) -> List[Row]:
+    query = db.query(Sweet).filter(Sweet.is_active == True)
     
-    if category:
-        query = query.filter(Sweet.category.ilike(f"%{category}%"))
+    # Name/category matching is answered by the configured search index
+    text_match = get_search_backend(db).match(db, name, category)
+    if text_match is not None:
+        query = query.filter(text_match)
     
     if min_price is not None:
         query = query.filter(Sweet.price >= min_price)
@@ -104,22 +274,242 @@ async def search_sweets(
         query = query.filter(Sweet.price <= max_price)
     
     if in_stock_only:
-        query = query.filter(Sweet.quantity > 0)
+        query = query.filter(SWEET_IN_STOCK)
+    
+    return with_live_stock(db, query.with_entities(*SWEET_COLUMNS).all())
+
+
+@router.get("/stats", response_model=InventoryStatsResponse)
+async def get_inventory_stats(
+    request: Request,
+    response: Response,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Inventory statistics for the active catalog (Admin only)
+    
+    Totals and per-category counts of products, in-stock, out-of-stock and
+    low-stock sweets (1 to `low_stock_threshold` units), units held and
+    stock value. Read from counters kept up to date by every write, so the
+    cost does not grow with the catalog. Carries the catalog ETag.
+    """
+    not_modified = check_not_modified(request, response)
+    if not_modified is not None:
+        return not_modified
+    
+    return await run_db(db, read_stats)
+
+
+@router.post("/stats/recompute", response_model=InventoryStatsResponse)
+async def recompute_inventory_stats(
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Rebuild the inventory statistics from the sweets table (Admin only)
+    
+    Repairs the counters after sweets were changed outside the API, e.g.
+    by scripts or manual SQL. Scans the whole catalog.
+    """
+    return await run_blocking_db(db, _recompute_stats)
+
+
+def _recompute_stats(db: Session) -> dict:
+    # Queued purchase deltas would otherwise land on top of the rebuilt counters
+    ledger.flush()
+    recompute_stats(db)
+    db.commit()
+    return read_stats(db)
+
+
+# ========== Inventory Ledger ==========
+# Declared before /{sweet_id} so "movements" is not taken for an ID
+
+@router.get("/movements", response_model=List[InventoryMovementResponse])
+async def list_movements(
+    response: Response,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None)
+):
+    """
+    Inventory ledger entries for all sweets (Admin only)
+    
+    - **since**: Entries at or after this time (ISO 8601, UTC without an offset)
+    - **until**: Entries before this time
+    - **limit**: Maximum number of entries to return
+    - **cursor**: Opaque cursor from the `X-Next-Cursor` header of the previous page
+    
+    Entries are returned oldest first. In the queued ledger mode a change
+    shows up here once its batch is written, within `LEDGER_FLUSH_SECONDS`.
+    """
+    return await _movements_page(response, db, None, since, until, limit, cursor)
+
+
+@router.get("/{sweet_id}/movements", response_model=List[InventoryMovementResponse])
+async def list_sweet_movements(
+    sweet_id: int,
+    response: Response,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None)
+):
+    """
+    Inventory ledger entries for one sweet (Admin only)
+    
+    Takes the same parameters as `GET /api/sweets/movements`.
+    """
+    return await _movements_page(response, db, sweet_id, since, until, limit, cursor)
+
+
+async def _movements_page(
+    response: Response,
+    db: DBSession,
+    sweet_id: Optional[int],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    limit: int,
+    cursor: Optional[str]
+) -> list:
+    after = decode_time_cursor(cursor) if cursor is not None else None
+    # Fetch one extra row to learn whether another page exists
+    movements = await run_db(db, query_movements, sweet_id, since, until, after, limit + 1)
+    
+    if len(movements) > limit:
+        movements = movements[:limit]
+        last = movements[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_time_cursor(last.created_at, last.id)
+    
+    return movements
+
+
+# ========== Delta Sync ==========
+# Declared before /{sweet_id} so "changes" is not taken for an ID
+
+@router.get("/changes", response_model=List[SweetResponse])
+async def list_changes(
+    response: Response,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    since: Optional[str] = Query(None),
+    limit: int = Query(500, ge=1, le=1000)
+):
+    """
+    Sweets created, updated, restocked, purchased or deleted since a sync cursor
+    
+    - **since**: Cursor from the `X-Sync-Cursor` header of the previous sync;
+      omit it for a full first sync
+    - **limit**: Maximum number of sweets to return
+    
+    Returns changed sweets in (updated_at, id) order, deleted ones with
+    `is_active` false, and always sets `X-Sync-Cursor`. While
+    `X-Next-Cursor` is set too, more changes follow: call again at once.
+    Changes from the last `SYNC_SETTLE_SECONDS` are sent again by the
+    next sync, so apply sweets by ID. Purchases of hot sweets show up
+    within `HOT_SYNC_SECONDS`.
+    """
+    after = decode_time_cursor(since) if since is not None else None
+    # Fetch one extra row to learn whether another page exists
+    sweets = await run_db(db, _list_changes, after, limit + 1)
+    
+    if len(sweets) > limit:
+        sweets = sweets[:limit]
+        last = sweets[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_time_cursor(last.updated_at, last.id)
+        response.headers[SYNC_CURSOR_HEADER] = response.headers[NEXT_CURSOR_HEADER]
+    else:
+        response.headers[SYNC_CURSOR_HEADER] = encode_time_cursor(*_settled_position(sweets, after))
+    
+    return sweets_response(sweets, response.headers)
+
+
+def _list_changes(db: Session, after: Optional[tuple], limit: int) -> List[Row]:
+    query = db.query(Sweet)
     
-    sweets = query.all()
-    return sweets
+    if after is not None:
+        # Keyset seek on ix_sweets_updated
+        at, last_id = after
+        query = query.filter(tuple_(Sweet.updated_at, Sweet.id) > tuple_(at, last_id))
+    
+    query = query.order_by(Sweet.updated_at, Sweet.id)
+    return with_live_stock(db, query.with_entities(*SWEET_COLUMNS).limit(limit).all())
+
+
+def _settled_position(sweets: List[Row], after: Optional[tuple]) -> tuple:
+    # Rows stamped within the settle window may still be joined by rows
+    # committed late or stamped in the same second with a lower ID, so
+    # the final cursor never passes the start of the window
+    settled = datetime.now(timezone.utc) - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    position = (sweets[-1].updated_at, sweets[-1].id) if sweets else after
+    
+    if position is None:
+        return settled, 0
+    at = position[0] if position[0].tzinfo else position[0].replace(tzinfo=timezone.utc)
+    return (settled, 0) if at > settled else position
+
+
+# ========== Stock Change Stream ==========
+# Declared before /{sweet_id} so "stream" is not taken for an ID
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_stock_changes(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None),
+    db: DBSession = Depends(get_db)
+):
+    """
+    Server-sent events with stock and price changes as they are committed
+    
+    - **access_token**: JWT for clients that cannot set the Authorization
+      header (browser EventSource)
+    
+    Each `stock` event carries a JSON list of `{id, quantity, price,
+    is_active}` changes, merged per sweet over bursts of writes. A `reset`
+    event means changes were dropped for a slow client: refetch the
+    catalog. The user is checked once, when the stream opens; the
+    stream itself holds no database connection.
+    """
+    # Same checks as get_current_user: a deactivated user cannot subscribe
+    await get_current_user(token or access_token or "", db)
+    
+    return StreamingResponse(
+        stream_changes(
+            stock_feed.subscribe(),
+            settings.STOCK_FEED_COALESCE_SECONDS,
+            settings.STOCK_FEED_KEEPALIVE_SECONDS
+        ),
+        media_type="text/event-stream",
+        # Proxies must pass events through as they come
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ========== Single Sweet Operations ==========
 
 
 @router.get("/{sweet_id}", response_model=SweetResponse)
 async def get_sweet(
     sweet_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: DBSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get a specific sweet by ID
     """
-    sweet = db.query(Sweet).filter(Sweet.id == sweet_id, Sweet.is_active == True).first()
+    not_modified = check_not_modified(request, response)
+    if not_modified is not None:
+        return not_modified
+    
+    sweet = await run_db(db, _get_active_sweet, sweet_id)
     
     if not sweet:
         raise HTTPException(
@@ -130,11 +520,18 @@ async def get_sweet(
     return sweet
 
 
+def _get_active_sweet(db: Session, sweet_id: int) -> Optional[Sweet]:
+    sweet = db.query(Sweet).filter(Sweet.id == sweet_id, Sweet.is_active == True).first()
+    if sweet is not None:
+        show_live_quantity(db, sweet)
+    return sweet
+
+
 @router.put("/{sweet_id}", response_model=SweetResponse)
 async def update_sweet(
     sweet_id: int,
     sweet_data: SweetUpdate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -142,7 +539,14 @@ async def update_sweet(
     
     All fields are optional. Only provided fields will be updated.
     """
-    sweet = db.query(Sweet).filter(Sweet.id == sweet_id).first()
+    sweet = await run_db(db, _update_sweet, sweet_id, sweet_data)
+    
+    return sweet
+
+
+def _update_sweet(db: Session, sweet_id: int, sweet_data: SweetUpdate) -> Sweet:
+    # Locked, so no purchase lands between the statistics' before and after
+    sweet = lock_sweet(db, sweet_id)
     
     if not sweet:
         raise HTTPException(
@@ -151,12 +555,30 @@ async def update_sweet(
         )
     
     # Update only provided fields
-    update_data = sweet_data.dict(exclude_unset=True)
+    before = sweet_state(sweet)
+    update_data = sweet_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(sweet, field, value)
     
+    if sweet.stock_slots and "quantity" in update_data:
+        fill_slots(db, sweet.id, sweet.stock_slots, sweet.quantity)
+    
+    record_change(db, before, sweet_state(sweet))
+    change = stock_change(sweet)
+    if sweet.stock_slots:
+        # The row's quantity is stale while the slots hold the stock
+        change["quantity"] = live_quantity(db, sweet.id)
+    stage_change(db, change)
     db.commit()
     db.refresh(sweet)
+    show_live_quantity(db, sweet)
+    
+    if update_data.keys() & {"name", "category", "is_active"}:
+        search_backend = get_search_backend(db)
+        if sweet.is_active:
+            search_backend.index_sweet(sweet)
+        else:
+            search_backend.remove_sweet(sweet.id)
     
     return sweet
 
@@ -164,7 +586,7 @@ async def update_sweet(
 @router.delete("/{sweet_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_sweet(
     sweet_id: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -172,7 +594,13 @@ async def delete_sweet(
     
     This performs a soft delete by setting is_active to False
     """
-    sweet = db.query(Sweet).filter(Sweet.id == sweet_id).first()
+    await run_db(db, _delete_sweet, sweet_id)
+    
+    return None
+
+
+def _delete_sweet(db: Session, sweet_id: int):
+    sweet = lock_sweet(db, sweet_id)
     
     if not sweet:
         raise HTTPException(
@@ -180,10 +608,12 @@ async def delete_sweet(
             detail=f"Sweet with ID {sweet_id} not found"
         )
     
+    before = sweet_state(sweet)
     sweet.is_active = False
+    record_change(db, before, sweet_state(sweet))
+    stage_change(db, {"id": sweet_id, "is_active": False})
     db.commit()
-    
-    return None
+    get_search_backend(db).remove_sweet(sweet_id)
 
 
 # ========== Inventory Operations ==========
@@ -192,7 +622,7 @@ async def delete_sweet(
 async def purchase_sweet(
     sweet_id: int,
     purchase_data: PurchaseRequest,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -202,43 +632,85 @@ async def purchase_sweet(
     
     Returns updated sweet information
     """
-    sweet = db.query(Sweet).filter(Sweet.id == sweet_id, Sweet.is_active == True).first()
-    
-    if not sweet:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Sweet with ID {sweet_id} not found"
-        )
+    sweet_response = await run_db(db, _purchase_sweet, sweet_id, purchase_data.quantity, current_user.id)
     
-    if not sweet.is_in_stock():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Sweet '{sweet.name}' is out of stock"
-        )
+    return {
+        "success": True,
+        "message": f"Successfully purchased {purchase_data.quantity} units of {sweet_response.name}",
+        "sweet": sweet_response
+    }
+
+
+def _purchase_sweet(db: Session, sweet_id: int, quantity: int, user_id: int) -> SweetResponse:
+    # Single conditional UPDATE: no read-modify-write race between buyers
+    sweet = decrement_stock(db, sweet_id, quantity)
     
-    if not sweet.can_purchase(purchase_data.quantity):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Insufficient stock. Available: {sweet.quantity}, Requested: {purchase_data.quantity}"
-        )
+    if sweet is None:
+        db.rollback()
+        raise purchase_error(db, sweet_id, quantity)
     
-    # Update quantity
-    sweet.quantity -= purchase_data.quantity
+    ledger.record(db, [movement(sweet, MovementKind.PURCHASE, -quantity, user_id)])
+    # Serialize before commit so the expired instance is not reloaded
+    sweet_response = SweetResponse.model_validate(sweet)
     db.commit()
-    db.refresh(sweet)
+    record_purchase(quantity)
+    
+    return sweet_response
+
+
+@router.post("/checkout", response_model=CheckoutResponse)
+async def checkout(
+    cart: CheckoutRequest,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Purchase every item in a cart in one transaction
+    
+    - **items**: List of `{sweet_id, quantity}` lines; repeated sweets are merged
+    
+    Either every line is purchased or none is. Rows are decremented in
+    sweet ID order so concurrent checkouts cannot deadlock each other.
+    """
+    quantities = {}
+    for item in cart.items:
+        quantities[item.sweet_id] = quantities.get(item.sweet_id, 0) + item.quantity
+    
+    purchased = await run_db(db, _checkout, quantities, current_user.id)
     
     return {
         "success": True,
-        "message": f"Successfully purchased {purchase_data.quantity} units of {sweet.name}",
-        "sweet": sweet
+        "message": f"Successfully purchased {sum(quantities.values())} units of {len(purchased)} sweets",
+        "sweets": purchased
     }
 
 
+def _checkout(db: Session, quantities: dict, user_id: int) -> List[SweetResponse]:
+    purchased = []
+    movements = []
+    for sweet_id in sorted(quantities):
+        sweet = decrement_stock(db, sweet_id, quantities[sweet_id])
+        
+        if sweet is None:
+            db.rollback()
+            raise purchase_error(db, sweet_id, quantities[sweet_id])
+        
+        purchased.append(SweetResponse.model_validate(sweet))
+        movements.append(movement(sweet, MovementKind.PURCHASE, -quantities[sweet_id], user_id))
+    
+    ledger.record(db, movements)
+    db.commit()
+    for quantity in quantities.values():
+        record_purchase(quantity)
+    
+    return purchased
+
+
 @router.post("/{sweet_id}/restock", response_model=InventoryResponse)
 async def restock_sweet(
     sweet_id: int,
     restock_data: RestockRequest,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -248,7 +720,61 @@ async def restock_sweet(
     
     Returns updated sweet information
     """
-    sweet = db.query(Sweet).filter(Sweet.id == sweet_id).first()
+    sweet = await run_db(db, _restock_sweet, sweet_id, restock_data.quantity, current_user.id)
+    
+    return {
+        "success": True,
+        "message": f"Successfully restocked {restock_data.quantity} units of {sweet.name}",
+        "sweet": sweet
+    }
+
+
+def _restock_sweet(db: Session, sweet_id: int, quantity: int, user_id: int) -> Sweet:
+    # Single conditional UPDATE, like purchases: a purchase committed
+    # meanwhile is never undone. Reactivates the sweet if it was inactive
+    restocked = increment_stock(db, sweet_id, quantity, reactivate=True)
+    
+    if restocked is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Sweet with ID {sweet_id} not found"
+        )
+    
+    sweet, before = restocked
+    ledger.record(db, [movement(sweet, MovementKind.RESTOCK, quantity, user_id)])
+    db.commit()
+    record_restock(quantity)
+    db.refresh(sweet)
+    if not before.is_active:
+        # Stock changes leave the index alone; only a revived sweet rejoins it
+        get_search_backend(db).index_sweet(sweet)
+    
+    return sweet
+
+
+@router.put("/{sweet_id}/stock-slots", response_model=SweetResponse)
+async def set_stock_slots(
+    sweet_id: int,
+    slots_data: StockSlotsRequest,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Switch a sweet in or out of hot mode (Admin only)
+    
+    - **slots**: Number of stock slots to spread the quantity over, 0 to leave hot mode
+    
+    For flash sales: purchases of a hot sweet decrement one of its slots
+    instead of its own row, so concurrent buyers rarely wait for each
+    other. Purchases in flight while the slots change may be rejected.
+    """
+    sweet = await run_db(db, _set_stock_slots, sweet_id, slots_data.slots)
+    
+    return sweet
+
+
+def _set_stock_slots(db: Session, sweet_id: int, slots: int) -> Sweet:
+    sweet = db.query(Sweet).filter(Sweet.id == sweet_id).with_for_update().first()
     
     if not sweet:
         raise HTTPException(
@@ -256,14 +782,130 @@ async def restock_sweet(
             detail=f"Sweet with ID {sweet_id} not found"
         )
     
-    # Update quantity
-    sweet.quantity += restock_data.quantity
-    sweet.is_active = True  # Reactivate if was inactive
+    before = sweet_state(sweet)
+    total = live_quantity(db, sweet.id, lock=True) if sweet.stock_slots else sweet.quantity
+    fill_slots(db, sweet.id, slots, total)
+    sweet.stock_slots = slots
+    sweet.quantity = total
+    record_change(db, before, sweet_state(sweet))
+    stage_change(db, stock_change(sweet))
     db.commit()
     db.refresh(sweet)
     
-    return {
-        "success": True,
-        "message": f"Successfully restocked {restock_data.quantity} units of {sweet.name}",
-        "sweet": sweet
-    }
+    return sweet
+
+
+# ========== Stock Reservations ==========
+
+@router.post("/{sweet_id}/reserve", response_model=ReservationResponse, status_code=status.HTTP_201_CREATED)
+async def reserve_sweet(
+    sweet_id: int,
+    reserve_data: ReserveRequest,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Hold stock while a checkout's payment runs
+    
+    - **quantity**: Number of units to hold (must be > 0)
+    - **ttl_seconds**: How long to hold them (default and cap set by the server)
+    
+    The units leave stock at once. Confirm the reservation to purchase
+    them or release it to put them back; holds still open when they
+    expire go back to stock.
+    """
+    reservation = await run_db(
+        db, _reserve_sweet, sweet_id, reserve_data.quantity, reserve_data.ttl_seconds, current_user.id
+    )
+    reservation_expiry.schedule(reservation.expires_at, reservation.id)
+    
+    return reservation
+
+
+def _reserve_sweet(
+    db: Session, sweet_id: int, quantity: int, ttl_seconds: Optional[int], user_id: int
+) -> ReservationResponse:
+    # Same conditional UPDATE as a purchase: holds can never oversell
+    sweet = decrement_stock(db, sweet_id, quantity)
+    
+    if sweet is None:
+        db.rollback()
+        raise purchase_error(db, sweet_id, quantity)
+    
+    reservation = StockReservation(
+        sweet_id=sweet_id,
+        user_id=user_id,
+        quantity=quantity,
+        status=ReservationStatus.HELD,
+        expires_at=hold_expiry(ttl_seconds)
+    )
+    db.add(reservation)
+    db.flush()
+    reservation_response = ReservationResponse.model_validate(reservation)
+    db.commit()
+    RESERVATIONS.labels("held").inc()
+    
+    return reservation_response
+
+
+@router.post("/reservations/{reservation_id}/confirm", response_model=ReservationResponse)
+async def confirm_reservation(
+    reservation_id: int,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Purchase the units of one of your holds (after payment succeeded)
+    
+    Fails with 410 once the hold has expired and 409 if it was already
+    confirmed or released.
+    """
+    return await run_db(db, _confirm_reservation, reservation_id, current_user.id)
+
+
+def _confirm_reservation(db: Session, reservation_id: int, user_id: int) -> ReservationResponse:
+    reservation = close_reservation(db, reservation_id, user_id, ReservationStatus.CONFIRMED)
+    
+    if reservation is None:
+        db.rollback()
+        raise reservation_error(db, reservation_id, user_id)
+    
+    # The stock left at reserve time; the purchase enters the ledger now
+    sweet = db.get(Sweet, reservation.sweet_id)
+    show_live_quantity(db, sweet)
+    ledger.record(db, [movement(sweet, MovementKind.PURCHASE, -reservation.quantity, user_id)])
+    reservation_response = ReservationResponse.model_validate(reservation)
+    db.commit()
+    record_purchase(reservation_response.quantity)
+    RESERVATIONS.labels("confirmed").inc()
+    
+    return reservation_response
+
+
+@router.post("/reservations/{reservation_id}/release", response_model=ReservationResponse)
+async def release_reservation(
+    reservation_id: int,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Give up one of your holds and put its units back into stock
+    
+    Fails with 410 once the hold has expired (its units are already on
+    their way back) and 409 if it was already confirmed or released.
+    """
+    return await run_db(db, _release_reservation, reservation_id, current_user.id)
+
+
+def _release_reservation(db: Session, reservation_id: int, user_id: int) -> ReservationResponse:
+    reservation = close_reservation(db, reservation_id, user_id, ReservationStatus.RELEASED)
+    
+    if reservation is None:
+        db.rollback()
+        raise reservation_error(db, reservation_id, user_id)
+    
+    reservation_response = ReservationResponse.model_validate(reservation)
+    db.commit()
+    RESERVATIONS.labels("released").inc()
+    
+    return reservation_response
@@ -2,9 +2,9 @@
 Pydantic schemas for request/response validation
 """
 from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
-from app.models import UserRole
+from app.models import MovementKind, ReservationStatus, UserRole
 
 
 # ========== Auth Schemas ==========
@@ -40,10 +40,13 @@ class Token(BaseModel):
 
 
 class TokenData(BaseModel):
-    """Schema for token payload data"""
+    """Schema for token payload data (frozen: decoded tokens are cached)"""
     email: Optional[str] = None
     user_id: Optional[int] = None
     role: Optional[str] = None
+    
+    class Config:
+        frozen = True
 
 
 class UserResponse(BaseModel):
@@ -92,6 +95,7 @@ class SweetResponse(BaseModel):
     description: Optional[str]
     image_url: Optional[str]
     is_active: bool
+    stock_slots: int
     created_at: datetime
     updated_at: Optional[datetime]
     
@@ -120,8 +124,127 @@ class RestockRequest(BaseModel):
     quantity: int = Field(..., gt=0, le=1000000)
 
 
+class StockSlotsRequest(BaseModel):
+    """Schema for switching a sweet in or out of hot (sharded stock) mode"""
+    slots: int = Field(..., ge=0, le=64)
+
+
 class InventoryResponse(BaseModel):
     """Schema for inventory operation response"""
     success: bool
     message: str
     sweet: SweetResponse
+
+
+class CheckoutItem(BaseModel):
+    """Schema for a single cart line"""
+    sweet_id: int = Field(..., gt=0)
+    quantity: int = Field(..., gt=0, le=1000)
+
+
+class CheckoutRequest(BaseModel):
+    """Schema for checking out a whole cart in one transaction"""
+    items: List[CheckoutItem] = Field(..., min_length=1, max_length=100)
+
+
+class CheckoutResponse(BaseModel):
+    """Schema for checkout response"""
+    success: bool
+    message: str
+    sweets: List[SweetResponse]
+
+
+class ReserveRequest(BaseModel):
+    """Schema for holding stock during checkout"""
+    quantity: int = Field(..., gt=0, le=1000)
+    ttl_seconds: Optional[int] = Field(None, gt=0)
+
+
+class ReservationResponse(BaseModel):
+    """Schema for a stock reservation"""
+    id: int
+    sweet_id: int
+    quantity: int
+    status: ReservationStatus
+    expires_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class CategoryStatsResponse(BaseModel):
+    """Schema for the inventory counters of one category"""
+    category: str
+    products: int
+    in_stock: int
+    out_of_stock: int
+    low_stock: int
+    units: int
+    stock_value: float
+    hot_products: int
+
+
+class InventoryStatsResponse(BaseModel):
+    """Schema for catalog-wide inventory statistics"""
+    products: int
+    in_stock: int
+    out_of_stock: int
+    low_stock: int
+    units: int
+    stock_value: float
+    hot_products: int
+    low_stock_threshold: int
+    categories: List[CategoryStatsResponse]
+
+
+class InventoryMovementResponse(BaseModel):
+    """Schema for an inventory ledger entry"""
+    id: int
+    sweet_id: int
+    user_id: Optional[int]
+    kind: MovementKind
+    quantity: int
+    quantity_after: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+# ========== Bulk Import Schemas ==========
+
+class ImportRowError(BaseModel):
+    """Schema for a rejected import row"""
+    row: int
+    error: str
+
+
+class ImportResponse(BaseModel):
+    """Schema for bulk import report"""
+    processed: int
+    created: int
+    updated: int
+    failed: int
+    errors: List[ImportRowError]
+
+
+# ========== Admin Schemas ==========
+
+class PoolStatusResponse(BaseModel):
+    """Schema for connection pool metrics of one worker process"""
+    pid: int
+    pool_class: str
+    pre_ping: str
+    size: Optional[int] = None
+    max_overflow: Optional[int] = None
+    timeout: Optional[float] = None
+    checked_out: Optional[int] = None
+    checked_in: Optional[int] = None
+    overflow: Optional[int] = None
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    wait_seconds_avg: float = 0.0
+    pings: int = 0
+    ping_failures: int = 0
@@ -0,0 +1,424 @@
+"""
+Pluggable substring search for the sweets catalog
+
+/api/sweets/search matches name and category by case-insensitive
+substring. A plain ILIKE '%term%' cannot use a btree index, so every
+search scans the whole table. The backends below answer the same
+question from an index instead:
+
+- fts5: SQLite FTS5 table with the trigram tokenizer, kept in sync by triggers
+- trigram: PostgreSQL pg_trgm GIN indexes, which ILIKE uses directly
+- ngram: in-process trigram inverted index, for any other database
+- like: the original table scan
+
+SEARCH_BACKEND=auto picks fts5 or trigram when the database supports
+them and falls back to ngram otherwise.
+"""
+import logging
+import threading
+import weakref
+from array import array
+from typing import Dict, List, Optional, Set
+from sqlalchemy import Integer, and_, column, event, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+from app.catalog import create_version_backend
+from app.config import settings
+from app.database import Base
+from app.models import Sweet
+
+logger = logging.getLogger(__name__)
+
+SEARCH_BACKENDS = ("auto", "like", "fts5", "trigram", "ngram")
+SEARCH_FIELDS = ("name", "category")
+
+# Trigram indexes cannot answer terms shorter than one trigram
+MIN_TERM_LENGTH = 3
+
+# Counts the writes the ngram backend indexes, in every worker process,
+# so each worker's in-process index notices writes made through others
+index_version = create_version_backend("search")
+
+
+def trigrams(value: str) -> Set[str]:
+    """Split a string into its lowercase character trigrams"""
+    value = value.lower()
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class SearchBackend:
+    """
+    Plain ILIKE table scan, and the interface every backend implements
+    
+    Backends return a WHERE clause for the name/category part of a search;
+    the route adds the price and stock filters itself. The index_* hooks
+    are called by write routes after commit and only matter for backends
+    that keep their own index outside the database.
+    """
+    name = "like"
+    
+    def match(self, db: Session, name: Optional[str], category: Optional[str]) -> Optional[ColumnElement]:
+        """Build the clause matching sweets whose name/category contain the terms"""
+        clauses = [
+            getattr(Sweet, field).ilike(f"%{value}%")
+            for field, value in (("name", name), ("category", category))
+            if value
+        ]
+        return and_(*clauses) if clauses else None
+    
+    def index_sweet(self, sweet: Sweet):
+        """Index a created, renamed or reactivated sweet"""
+    
+    def remove_sweet(self, sweet_id: int):
+        """Drop a deleted sweet from the index"""
+    
+    def invalidate(self):
+        """Discard the index after bulk writes it did not see"""
+    
+    def loaded(self) -> bool:
+        """Whether match() can run without building an index first"""
+        return True
+    
+    def load(self, db: Session):
+        """Build the in-process index now, e.g. on a worker thread"""
+
+
+class TrigramSearchBackend(SearchBackend):
+    """
+    PostgreSQL pg_trgm backend
+    
+    The GIN trigram indexes created alongside the schema let the planner
+    answer ILIKE '%term%' from the index, so the clause stays the same.
+    """
+    name = "trigram"
+
+
+class FTS5SearchBackend(SearchBackend):
+    """
+    SQLite FTS5 backend using the trigram tokenizer
+    
+    sweets_fts is an external-content index over sweets, maintained by
+    triggers, so it stays in sync with every write including bulk imports.
+    """
+    name = "fts5"
+    
+    def match(self, db: Session, name: Optional[str], category: Optional[str]) -> Optional[ColumnElement]:
+        clauses = []
+        terms = []
+        
+        for field, value in (("name", name), ("category", category)):
+            if not value:
+                continue
+            if len(value) < MIN_TERM_LENGTH:
+                clauses.append(getattr(Sweet, field).ilike(f"%{value}%"))
+            else:
+                quoted = value.replace('"', '""')
+                terms.append(f'{field} : "{quoted}"')
+        
+        if terms:
+            matching_ids = text(
+                "SELECT rowid FROM sweets_fts WHERE sweets_fts MATCH :query"
+            ).bindparams(query=" AND ".join(terms)).columns(column("rowid", Integer))
+            clauses.append(Sweet.id.in_(matching_ids))
+        
+        return and_(*clauses) if clauses else None
+
+
+class NGramSearchBackend(SearchBackend):
+    """
+    In-process trigram inverted index
+    
+    Postings are append-only arrays of sweet IDs per trigram, built lazily
+    from the database on the first search. A search intersects the
+    postings of the term's trigrams, rarest first, and hands the small
+    candidate set to the database together with the ILIKE clause, which
+    does the final substring check. Renamed sweets therefore only leave
+    harmless stale postings; the index is rebuilt once too many pile up.
+    
+    The index remembers the index_version it reflects. Its own writes
+    advance both by one; a search that finds index_version further on
+    (another worker indexed a write) rebuilds the index first.
+    """
+    name = "ngram"
+    
+    # Stop intersecting once the candidate set is this small
+    GOOD_ENOUGH_CANDIDATES = 256
+    
+    def __init__(self, max_candidates: int = 20000):
+        self.max_candidates = max_candidates
+        self._lock = threading.Lock()
+        self._postings: Optional[Dict[str, Dict[str, array]]] = None
+        self._removed: Set[int] = set()
+        self._version = 0
+        self._indexed = 0
+        self._stale = 0
+    
+    def match(self, db: Session, name: Optional[str], category: Optional[str]) -> Optional[ColumnElement]:
+        clauses = []
+        
+        for field, value in (("name", name), ("category", category)):
+            if not value:
+                continue
+            clauses.append(getattr(Sweet, field).ilike(f"%{value}%"))
+            if len(value) >= MIN_TERM_LENGTH:
+                candidates = self._candidates(db, field, value)
+                if candidates is not None:
+                    clauses.append(Sweet.id.in_(candidates))
+        
+        return and_(*clauses) if clauses else None
+    
+    def index_sweet(self, sweet: Sweet):
+        with self._lock:
+            if not self._advance():
+                return
+            self._add(self._postings, sweet.id, sweet.name, sweet.category)
+            self._removed.discard(sweet.id)
+            self._stale += 1
+            self._maybe_discard()
+    
+    def remove_sweet(self, sweet_id: int):
+        with self._lock:
+            if not self._advance():
+                return
+            self._removed.add(sweet_id)
+            self._stale += 1
+            self._maybe_discard()
+    
+    def invalidate(self):
+        with self._lock:
+            index_version.increment()
+            self._postings = None
+    
+    def loaded(self) -> bool:
+        return self._postings is not None and index_version.read() == self._version
+    
+    def load(self, db: Session):
+        self._load(db)
+    
+    def _advance(self) -> bool:
+        """Count a committed write; False if the index must be rebuilt instead"""
+        version = index_version.increment()
+        if self._postings is None:
+            return False
+        if version != self._version + 1:
+            # Writes through other workers since the index was built
+            self._postings = None
+            return False
+        self._version = version
+        return True
+    
+    def _candidates(self, db: Session, field: str, value: str) -> Optional[List[int]]:
+        """Return candidate IDs, or None if the index is not selective enough"""
+        postings = self._load(db)[field]
+        lists = []
+        for gram in trigrams(value):
+            posting = postings.get(gram)
+            if posting is None:
+                return []
+            lists.append(posting)
+        
+        lists.sort(key=len)
+        if len(lists[0]) > self.max_candidates * 10:
+            return None
+        
+        candidates = set(lists[0])
+        for posting in lists[1:]:
+            if len(candidates) <= self.GOOD_ENOUGH_CANDIDATES:
+                break
+            candidates.intersection_update(posting)
+        
+        if len(candidates) > self.max_candidates:
+            return None
+        
+        with self._lock:
+            candidates -= self._removed
+        return sorted(candidates)
+    
+    def _load(self, db: Session) -> Dict[str, Dict[str, array]]:
+        postings = self._postings
+        if postings is not None and index_version.read() == self._version:
+            return postings
+        
+        with self._lock:
+            # Read before the rows, so a write indexed meanwhile forces another rebuild
+            version = index_version.read()
+            if self._postings is None or version != self._version:
+                postings = {field: {} for field in SEARCH_FIELDS}
+                rows = db.execute(
+                    select(Sweet.id, Sweet.name, Sweet.category)
+                    .where(Sweet.is_active == True)
+                    .execution_options(yield_per=10000)
+                )
+                indexed = 0
+                for sweet_id, name, category in rows:
+                    self._add(postings, sweet_id, name, category)
+                    indexed += 1
+                
+                self._postings = postings
+                self._removed = set()
+                self._version = version
+                self._indexed = indexed
+                self._stale = 0
+            return self._postings
+    
+    @staticmethod
+    def _add(postings: Dict[str, Dict[str, array]], sweet_id: int, name: str, category: str):
+        for field, value in (("name", name), ("category", category)):
+            field_postings = postings[field]
+            for gram in trigrams(value):
+                posting = field_postings.get(gram)
+                if posting is None:
+                    posting = field_postings[gram] = array("q")
+                posting.append(sweet_id)
+    
+    def _maybe_discard(self):
+        # Rebuild lazily once stale postings reach a quarter of the index
+        if self._stale > max(1000, self._indexed // 4):
+            self._postings = None
+
+
+BACKEND_CLASSES = {
+    "like": SearchBackend,
+    "fts5": FTS5SearchBackend,
+    "trigram": TrigramSearchBackend,
+    "ngram": NGramSearchBackend,
+}
+
+_backends = weakref.WeakKeyDictionary()
+_backends_lock = threading.Lock()
+
+
+def get_search_backend(db: Session) -> SearchBackend:
+    """
+    Return the search backend for the session's database
+    
+    The choice is made once per engine from SEARCH_BACKEND and what the
+    database actually provides.
+    """
+    engine = db.get_bind()
+    backend = _backends.get(engine)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(engine)
+            if backend is None:
+                backend = _backends[engine] = _resolve_backend(db)
+    return backend
+
+
+def reset_search_backends():
+    """Forget every resolved backend and in-process index"""
+    with _backends_lock:
+        _backends.clear()
+
+
+def _resolve_backend(db: Session) -> SearchBackend:
+    choice = settings.SEARCH_BACKEND
+    if choice in ("like", "ngram"):
+        return BACKEND_CLASSES[choice]()
+    
+    dialect = db.get_bind().dialect.name
+    if choice in ("auto", "fts5") and dialect == "sqlite" and _has_fts5_index(db):
+        return FTS5SearchBackend()
+    if choice in ("auto", "trigram") and dialect == "postgresql" and _has_trigram_index(db):
+        return TrigramSearchBackend()
+    
+    if choice != "auto":
+        logger.warning("Search backend %r is not available on %s, using ngram", choice, dialect)
+    return NGramSearchBackend()
+
+
+def _has_fts5_index(db: Session) -> bool:
+    return db.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sweets_fts'")
+    ).first() is not None
+
+
+def _has_trigram_index(db: Session) -> bool:
+    return db.execute(
+        text("SELECT 1 FROM pg_indexes WHERE tablename = 'sweets' AND indexname = 'ix_sweets_name_trgm'")
+    ).first() is not None
+
+
+# ========== Search Index DDL ==========
+
+FTS5_DDL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS sweets_fts_insert AFTER INSERT ON sweets BEGIN
+        INSERT INTO sweets_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sweets_fts_delete AFTER DELETE ON sweets BEGIN
+        INSERT INTO sweets_fts(sweets_fts, rowid, name, category)
+        VALUES ('delete', old.id, old.name, old.category);
+    END
+    """,
+    # Only fires when name or category is written, not on stock changes
+    """
+    CREATE TRIGGER IF NOT EXISTS sweets_fts_update AFTER UPDATE OF name, category ON sweets BEGIN
+        INSERT INTO sweets_fts(sweets_fts, rowid, name, category)
+        VALUES ('delete', old.id, old.name, old.category);
+        INSERT INTO sweets_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END
+    """,
+]
+
+TRIGRAM_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_sweets_name_trgm ON sweets USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_sweets_category_trgm ON sweets USING gin (category gin_trgm_ops)",
+]
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_search_indexes(target, connection: Connection, **kw):
+    """Create the database-side search index alongside the schema"""
+    if settings.SEARCH_BACKEND not in ("auto", "fts5", "trigram"):
+        return
+    
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        _create_fts5_index(connection)
+    elif dialect == "postgresql":
+        _create_trigram_index(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def drop_search_indexes(target, connection: Connection, **kw):
+    """Drop the FTS5 table, which dropping sweets would leave behind"""
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DROP TABLE IF EXISTS sweets_fts"))
+
+
+def _create_fts5_index(connection: Connection):
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sweets_fts'")
+    ).first() is not None
+    
+    if not exists:
+        try:
+            connection.execute(text(
+                "CREATE VIRTUAL TABLE sweets_fts USING fts5("
+                "name, category, content='sweets', content_rowid='id', tokenize='trigram')"
+            ))
+        except DBAPIError:
+            logger.warning("SQLite FTS5 trigram tokenizer unavailable; search will use ngram")
+            return
+    
+    for statement in FTS5_DDL:
+        connection.execute(text(statement))
+    
+    if not exists:
+        # Index sweets that were inserted before the FTS table existed
+        connection.execute(text("INSERT INTO sweets_fts(sweets_fts) VALUES ('rebuild')"))
+
+
+def _create_trigram_index(connection: Connection):
+    try:
+        with connection.begin_nested():
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for statement in TRIGRAM_DDL:
+                connection.execute(text(statement))
+    except DBAPIError:
+        logger.warning("pg_trgm unavailable; search will use ngram")
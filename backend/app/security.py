@@ -1,15 +1,22 @@
 """
 Security utilities for authentication and authorization
 """
+import asyncio
+import hashlib
+import time
 from datetime import datetime, timedelta
 from typing import Optional
+import anyio
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.cache import TTLCache
 from app.config import settings
-from app.database import get_db
+from app.database import DBSession, get_db, run_db
+from app.metrics import PASSWORD_HASH_SECONDS
 from app.models import User, UserRole
 from app.schemas import TokenData
 
@@ -18,16 +25,66 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+# For routes that also take the token elsewhere, e.g. in the query string
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+
+# Active users by ID, so authenticated requests can skip the users table
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS
+)
+
+# Verified claims by token digest, each kept until the token's exp
+token_cache = TTLCache(
+    maxsize=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
+
+# User columns kept in the cache; everything routes read from current_user
+USER_CACHE_FIELDS = ("id", "email", "name", "role", "is_active", "created_at", "updated_at")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against a hashed password"""
-    return pwd_context.verify(plain_password, hashed_password)
+    with PASSWORD_HASH_SECONDS.labels("verify").time():
+        return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    with PASSWORD_HASH_SECONDS.labels("hash").time():
+        return pwd_context.hash(password)
+
+
+# bcrypt takes ~250ms of CPU per call. Async routes hash on worker threads
+# behind their own limiter, so a login burst queues on the event loop
+# instead of occupying every thread other requests need.
+_password_hash_limiters = {}
+
+
+def _password_hash_limiter() -> anyio.CapacityLimiter:
+    loop = asyncio.get_running_loop()
+    limiter = _password_hash_limiters.get(loop)
+    if limiter is None:
+        _password_hash_limiters.clear()
+        limiter = _password_hash_limiters[loop] = anyio.CapacityLimiter(settings.PASSWORD_HASH_WORKERS)
+    return limiter
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop"""
+    return await anyio.to_thread.run_sync(
+        verify_password, plain_password, hashed_password,
+        limiter=_password_hash_limiter()
+    )
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await anyio.to_thread.run_sync(
+        get_password_hash, password,
+        limiter=_password_hash_limiter()
+    )
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -58,15 +115,24 @@ def decode_access_token(token: str) -> TokenData:
     """
     Decode and validate a JWT access token
     
+    Verified claims are cached by the token's SHA-256 digest until the
+    token expires, so a client resending its token skips the signature
+    check. Invalid tokens are never cached.
+    
     Args:
         token: JWT token string
     
     Returns:
-        TokenData object
+        TokenData object, shared between requests with the same token
     
     Raises:
         HTTPException: If token is invalid
     """
+    cache_key = hashlib.sha256(token.encode()).digest()
+    token_data = token_cache.get(cache_key)
+    if token_data is not None:
+        return token_data
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -83,15 +149,20 @@ def decode_access_token(token: str) -> TokenData:
             raise credentials_exception
         
         token_data = TokenData(email=email, user_id=user_id, role=role)
-        return token_data
     
     except JWTError:
         raise credentials_exception
+    
+    expires_at = payload.get("exp")
+    if isinstance(expires_at, (int, float)):
+        token_cache.set(cache_key, token_data, ttl=expires_at - time.time())
+    
+    return token_data
 
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_db)
 ) -> User:
     """
     Get current authenticated user from JWT token
@@ -108,7 +179,12 @@ async def get_current_user(
     """
     token_data = decode_access_token(token)
     
-    user = db.query(User).filter(User.id == token_data.user_id).first()
+    cached = user_cache.get(token_data.user_id)
+    if cached is not None:
+        # Detached copy, so requests never share a mutable instance
+        return User(**cached)
+    
+    user = await run_db(db, _load_user, token_data.user_id)
     
     if user is None:
         raise HTTPException(
@@ -123,9 +199,47 @@ async def get_current_user(
             detail="Inactive user"
         )
     
+    user_cache.set(user.id, {field: getattr(user, field) for field in USER_CACHE_FIELDS})
+    
     return user
 
 
+def _load_user(db: Session, user_id: int) -> Optional[User]:
+    return db.query(User).filter(User.id == user_id).first()
+
+
+def invalidate_user(user_id: int):
+    """
+    Drop a user from the authentication cache
+    
+    ORM updates and deletes of users invalidate automatically; call this
+    after changing users with bulk or raw SQL statements.
+    """
+    user_cache.pop(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: User):
+    """Evict a user on flush, and again once the change is committed"""
+    user_cache.pop(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("invalidated_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session):
+    # A concurrent request may have re-cached the old row before commit
+    for user_id in session.info.pop("invalidated_user_ids", ()):
+        user_cache.pop(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_users(session: Session, previous_transaction):
+    session.info.pop("invalidated_user_ids", None)
+
+
 async def get_current_admin_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
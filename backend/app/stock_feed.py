@@ -0,0 +1,241 @@
+"""
+Push feed of stock and price changes (server-sent events)
+
+Code that changes a sweet stages a compact change on its session with
+stage_change: the sweet's id with its new quantity, price and
+is_active, using SweetResponse field names so clients can merge it into
+the sweet they hold. The in-process StockFeed publishes the staged
+changes once the session's transaction commits and drops them on
+rollback, so every path that changes stock (routes, the reservation
+sweeper, bulk import) reaches the stream without publishing itself.
+Changes too broad to describe per sweet, such as imported new sweets,
+stage a reset instead. Every subscriber (one
+open GET /api/sweets/stream) has a bounded buffer keyed by sweet, so
+changes to the same sweet that arrive before the subscriber reads them
+are merged into one. A subscriber whose buffer fills with distinct
+sweets is sent a reset event instead, telling it to refetch the
+catalog, so a slow client costs the server at most STOCK_FEED_BUFFER
+pending changes.
+
+The feed is per worker process: with several workers, a stream only
+carries the changes made through its own worker.
+"""
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.metrics import STOCK_FEED_CHANGES, STOCK_FEED_RESETS, STOCK_FEED_SUBSCRIBERS
+from app.serialization import encode_json
+
+# Browsers reconnect this long after the stream drops
+RETRY_MILLISECONDS = 3000
+
+# Session.info key for changes waiting on the session's commit
+_PENDING = "stock_feed_pending"
+# Key of a staged reset among the pending changes
+_RESET = "reset"
+
+
+def stock_change(sweet: Any) -> Dict[str, Any]:
+    """Compact change for a sweet (ORM object or SweetResponse) after a write"""
+    return {"id": sweet.id, "quantity": sweet.quantity, "price": sweet.price, "is_active": sweet.is_active}
+
+
+class Subscription:
+    """
+    One subscriber's pending changes, at most max_pending sweets
+    
+    Only touched from the event loop that created it.
+    """
+    
+    def __init__(self, feed: "StockFeed", max_pending: int):
+        self._feed = feed
+        self._max_pending = max_pending
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._reset = False
+        self._ready = asyncio.Event()
+    
+    def push(self, change: Dict[str, Any]):
+        pending = self._pending.get(change["id"])
+        if pending is not None:
+            # Coalesce: the subscriber only needs the latest values
+            pending.update(change)
+        elif self._reset:
+            return
+        elif len(self._pending) >= self._max_pending:
+            self.reset()
+            STOCK_FEED_RESETS.inc()
+            return
+        else:
+            self._pending[change["id"]] = dict(change)
+        self._ready.set()
+    
+    def reset(self):
+        """Drop the pending changes and tell the subscriber to refetch"""
+        self._pending.clear()
+        self._reset = True
+        self._ready.set()
+    
+    async def next(self, timeout: float) -> Tuple[bool, List[Dict[str, Any]]]:
+        """
+        Wait up to timeout seconds for changes
+        
+        Returns:
+            (reset, changes): reset when changes were dropped and the
+            subscriber must refetch; changes in first-change order
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False, []
+        self._ready.clear()
+        reset, changes = self._reset, list(self._pending.values())
+        self._reset = False
+        self._pending = {}
+        return reset, changes
+    
+    def close(self):
+        self._feed.unsubscribe(self)
+
+
+class StockFeed:
+    """
+    Fans committed stock changes out to every subscriber of this worker
+    
+    Args:
+        max_pending: Sweets with undelivered changes per subscriber
+            before it is reset
+    """
+    
+    def __init__(self, max_pending: int = 1000):
+        self.max_pending = max_pending
+        self._subscribers: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+    
+    def subscribe(self) -> Subscription:
+        """Start buffering changes for a new subscriber (call from the event loop)"""
+        subscription = Subscription(self, self.max_pending)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.add(subscription)
+        STOCK_FEED_SUBSCRIBERS.inc()
+        return subscription
+    
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription not in self._subscribers:
+                return
+            self._subscribers.discard(subscription)
+        STOCK_FEED_SUBSCRIBERS.dec()
+    
+    def publish(self, changes: Iterable[Dict[str, Any]]):
+        """
+        Send committed changes to every subscriber
+        
+        Costs nothing without subscribers. Safe to call from any thread.
+        """
+        if not self._subscribers:
+            return
+        changes = list(changes)
+        STOCK_FEED_CHANGES.inc(len(changes))
+        self._on_loop(self._fan_out, changes)
+    
+    def publish_reset(self):
+        """Tell every subscriber to refetch the catalog. Safe to call from any thread."""
+        if self._subscribers:
+            self._on_loop(self._reset_all)
+    
+    def _on_loop(self, fn: Callable[..., None], *args):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            fn(*args)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(fn, *args)
+    
+    def _subscribers_now(self) -> List[Subscription]:
+        with self._lock:
+            return list(self._subscribers)
+    
+    def _fan_out(self, changes: List[Dict[str, Any]]):
+        for subscription in self._subscribers_now():
+            for change in changes:
+                subscription.push(change)
+    
+    def _reset_all(self):
+        for subscription in self._subscribers_now():
+            subscription.reset()
+
+
+def stage_change(db: Session, change: Dict[str, Any]):
+    """
+    Publish a sweet's change once db commits
+    
+    A later change to the same sweet in the transaction updates the
+    earlier one.
+    """
+    pending = db.info.setdefault(_PENDING, {})
+    if change["id"] in pending:
+        pending[change["id"]].update(change)
+    else:
+        pending[change["id"]] = dict(change)
+
+
+def stage_reset(db: Session):
+    """Tell subscribers to refetch the catalog once db commits"""
+    db.info.setdefault(_PENDING, {})[_RESET] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session: Session):
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    if _RESET in pending:
+        # The refetch covers every change of the transaction
+        stock_feed.publish_reset()
+    else:
+        stock_feed.publish(pending.values())
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, previous_transaction):
+    session.info.pop(_PENDING, None)
+
+
+def sse_event(event: str, data: Any) -> bytes:
+    """Encode one server-sent event"""
+    return b"event: " + event.encode() + b"\ndata: " + encode_json(data) + b"\n\n"
+
+
+async def stream_changes(subscription: Subscription, coalesce_seconds: float, keepalive_seconds: float):
+    """
+    Server-sent events for one subscriber, until the client disconnects
+    
+    Sends a stock event with the list of changes, at most once every
+    coalesce_seconds, a reset event after an overflow and a comment line
+    when idle for keepalive_seconds, so proxies keep the connection open.
+    """
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n".encode()
+        while True:
+            reset, changes = await subscription.next(keepalive_seconds)
+            if reset:
+                yield sse_event("reset", {})
+            if changes:
+                yield sse_event("stock", changes)
+            if not (reset or changes):
+                yield b": keepalive\n\n"
+                continue
+            # Let a burst of writes gather into the next event
+            await asyncio.sleep(coalesce_seconds)
+    finally:
+        subscription.close()
+
+
+stock_feed = StockFeed(max_pending=settings.STOCK_FEED_BUFFER)
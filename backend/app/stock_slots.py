@@ -0,0 +1,200 @@
+"""
+Sharded stock for flash-sale ("hot") sweets
+
+A purchase normally takes units off Sweet.quantity with one conditional
+UPDATE, so every buyer of a sweet queues for that row's lock. A sweet in
+hot mode (Sweet.stock_slots = N > 0) keeps its stock in N rows of
+sweet_stock_slots instead. A purchase decrements one random slot with a
+conditional UPDATE and tries the others in turn when that slot runs
+short, so concurrent buyers mostly lock different rows. A purchase that
+no single slot can fill takes units from several slots under row locks.
+
+Purchases never change a hot sweet's quantity column: it holds the
+slot total as of the last admin write (enabling hot mode, update,
+restock, import), as do the inventory statistics. Reads replace it with
+the live sum of the slots. So that delta sync still sees the stock
+change, purchases stamp the row's updated_at, at most once every
+HOT_SYNC_SECONDS (see stamp_hot_sweet).
+"""
+import random
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from app.config import settings
+from app.models import StockSlot, Sweet, utc_now
+from app.serialization import SweetRow
+
+
+def split(total: int, slots: int) -> List[int]:
+    """Spread total units over slots as evenly as possible"""
+    share, extra = divmod(total, slots)
+    return [share + (slot < extra) for slot in range(slots)]
+
+
+def fill_slots(db: Session, sweet_id: int, slots: int, total: int):
+    """
+    Replace a sweet's slot rows with slots rows holding total between them
+    
+    The caller sets Sweet.stock_slots and Sweet.quantity to match and
+    commits. Purchases waiting on the old rows find them gone and fail.
+    
+    Args:
+        db: Database session
+        sweet_id: Sweet to reshard
+        slots: Number of slots, 0 to leave hot mode
+        total: Units to spread over the slots
+    """
+    db.execute(delete(StockSlot).where(StockSlot.sweet_id == sweet_id))
+    if slots:
+        db.execute(insert(StockSlot), [
+            {"sweet_id": sweet_id, "slot": slot, "quantity": quantity}
+            for slot, quantity in enumerate(split(total, slots))
+        ])
+
+
+def add_to_slots(db: Session, sweet_id: int, slots: int, quantity: int):
+    """Restock a hot sweet, spreading the units over its slots"""
+    for slot, share in enumerate(split(quantity, slots)):
+        if share:
+            db.execute(
+                update(StockSlot)
+                .where(StockSlot.sweet_id == sweet_id, StockSlot.slot == slot)
+                .values(quantity=StockSlot.quantity + share)
+            )
+
+
+def live_quantity(db: Session, sweet_id: int, lock: bool = False) -> int:
+    """
+    Units left in a hot sweet's slots
+    
+    Args:
+        lock: Lock the slot rows until the transaction ends, so no
+            purchase changes them before the caller reshards
+    """
+    stmt = select(StockSlot.quantity).where(StockSlot.sweet_id == sweet_id)
+    if lock:
+        stmt = stmt.with_for_update()
+    return sum(db.scalars(stmt))
+
+
+def live_quantities(db: Session, sweet_ids: Iterable[int]) -> Dict[int, int]:
+    """Units left in the slots of several hot sweets, by sweet ID"""
+    rows = db.execute(
+        select(StockSlot.sweet_id, func.sum(StockSlot.quantity))
+        .where(StockSlot.sweet_id.in_(list(sweet_ids)))
+        .group_by(StockSlot.sweet_id)
+    )
+    return {sweet_id: total for sweet_id, total in rows}
+
+
+def take_from_slots(db: Session, sweet_id: int, slots: int, quantity: int) -> bool:
+    """
+    Take units out of a hot sweet's slots
+    
+    Tries a single conditional UPDATE per slot, starting at a random one,
+    then falls back to draining several slots under row locks.
+    
+    Returns:
+        True if the units were taken, False if the slots hold too few
+    """
+    start = random.randrange(slots)
+    for offset in range(slots):
+        result = db.execute(
+            update(StockSlot)
+            .where(
+                StockSlot.sweet_id == sweet_id,
+                StockSlot.slot == (start + offset) % slots,
+                StockSlot.quantity >= quantity
+            )
+            .values(quantity=StockSlot.quantity - quantity)
+        )
+        if result.rowcount == 1:
+            return True
+    
+    # Locked in slot order, so concurrent multi-slot purchases cannot deadlock
+    held = db.execute(
+        select(StockSlot.slot, StockSlot.quantity)
+        .where(StockSlot.sweet_id == sweet_id, StockSlot.quantity > 0)
+        .order_by(StockSlot.slot)
+        .with_for_update()
+    ).all()
+    if sum(units for _, units in held) < quantity:
+        return False
+    
+    remaining = quantity
+    for slot, units in held:
+        taken = min(units, remaining)
+        db.execute(
+            update(StockSlot)
+            .where(StockSlot.sweet_id == sweet_id, StockSlot.slot == slot)
+            .values(quantity=StockSlot.quantity - taken)
+        )
+        remaining -= taken
+        if not remaining:
+            break
+    return True
+
+
+def decrement_hot_stock(db: Session, sweet_id: int, quantity: int) -> Optional[Sweet]:
+    """
+    Purchase path for a sweet in hot mode
+    
+    Returns:
+        The Sweet carrying its live quantity, or None if the sweet is
+        missing, inactive, not in hot mode or short of stock
+    """
+    sweet = (
+        db.query(Sweet)
+        .filter(Sweet.id == sweet_id, Sweet.is_active == True, Sweet.stock_slots > 0)
+        .first()
+    )
+    if sweet is None or not take_from_slots(db, sweet_id, sweet.stock_slots, quantity):
+        return None
+    
+    stamp_hot_sweet(db, sweet_id)
+    show_live_quantity(db, sweet)
+    return sweet
+
+
+def stamp_hot_sweet(db: Session, sweet_id: int):
+    """
+    Mark a hot sweet's slots as changed for delta sync
+    
+    Stamps updated_at HOT_SYNC_SECONDS ahead, and only once the previous
+    stamp has passed, so the sweet row is written at most once per
+    interval however many buyers there are. Delta sync sends a row again
+    until its stamp is older than SYNC_SETTLE_SECONDS, by when the live
+    quantity it carries includes every purchase the stamp covered.
+    """
+    now = utc_now()
+    db.execute(
+        update(Sweet)
+        .where(Sweet.id == sweet_id, or_(Sweet.updated_at.is_(None), Sweet.updated_at <= now))
+        .values(updated_at=now + timedelta(seconds=settings.HOT_SYNC_SECONDS))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def show_live_quantity(db: Session, sweet: Sweet):
+    """Load a hot sweet's live quantity into the instance without marking it changed"""
+    if sweet.stock_slots:
+        set_committed_value(sweet, "quantity", live_quantity(db, sweet.id))
+
+
+def with_live_stock(db: Session, rows: Sequence[Any]) -> Sequence[Any]:
+    """
+    Replace the quantity of hot sweets in SWEET_COLUMNS rows with their live total
+    
+    Costs one query, and only when the rows include a hot sweet.
+    """
+    hot_ids = [row.id for row in rows if row.stock_slots]
+    if not hot_ids:
+        return rows
+    
+    totals = live_quantities(db, hot_ids)
+    return [
+        SweetRow(*row)._replace(quantity=totals.get(row.id, 0)) if row.stock_slots else row
+        for row in rows
+    ]
@@ -0,0 +1,11 @@
+"""
+Sweet Shop Management System - Benchmarks Package
+
+Run a benchmark from the backend directory, e.g.:
+    python -m benchmarks.bench_purchase
+"""
+import os
+
+# app.config requires these; benchmarks build their own engines anyway
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
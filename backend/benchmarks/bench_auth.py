@@ -0,0 +1,85 @@
+"""
+Per-request authentication overhead, with and without the token cache
+
+Times two things a warm authenticated request pays for, each with
+token_cache disabled ("uncached", a full python-jose decode, HMAC check
+and TokenData build per call) and enabled ("cached", a SHA-256 digest
+and one cache lookup):
+
+- decode: decode_access_token alone
+- dependency: get_current_user with the user already in user_cache,
+  i.e. all the auth work of a typical request
+
+Usage:
+    python -m benchmarks.bench_auth
+    python -m benchmarks.bench_auth --iterations 200000
+"""
+import argparse
+import asyncio
+import json
+import time
+from app import security
+from app.cache import TTLCache
+from app.models import UserRole
+
+USER = {
+    "id": 1,
+    "email": "bench@example.com",
+    "name": "Bench User",
+    "role": UserRole.USER,
+    "is_active": True,
+    "created_at": None,
+    "updated_at": None,
+}
+
+
+def time_decode(token: str, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        security.decode_access_token(token)
+    return time.perf_counter() - started
+
+
+async def time_dependency(token: str, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        # A user_cache hit never touches the session
+        await security.get_current_user(token=token, db=None)
+    return time.perf_counter() - started
+
+
+def run(cache: TTLCache, token: str, iterations: int) -> dict:
+    security.token_cache = cache
+    security.decode_access_token(token)
+    return {
+        "decode_us": round(time_decode(token, iterations) / iterations * 1e6, 2),
+        "dependency_us": round(asyncio.run(time_dependency(token, iterations)) / iterations * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50000)
+    args = parser.parse_args()
+    
+    token = security.create_access_token({"sub": USER["email"], "user_id": USER["id"], "role": "user"})
+    security.user_cache.set(USER["id"], USER)
+    original_cache = security.token_cache
+    
+    try:
+        results = {
+            "iterations": args.iterations,
+            "uncached": run(TTLCache(maxsize=0, ttl=0), token, args.iterations),
+            "cached": run(TTLCache(maxsize=1000, ttl=3600), token, args.iterations),
+        }
+    finally:
+        security.token_cache = original_cache
+    
+    for metric in ("decode_us", "dependency_us"):
+        results[f"{metric[:-3]}_speedup"] = round(results["uncached"][metric] / results["cached"][metric], 1)
+    
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Contention benchmark for hot (sharded stock) sweets
+
+Buyer threads race for single units of one sweet, first with its stock
+in the sweet row (every purchase updates the same row) and then in hot
+mode with --slots stock slots (purchases update one random slot). The
+run repeats for each buyer count in --threads, so the report shows how
+throughput scales as contention grows, and checks that neither mode
+oversells.
+
+SQLite serializes all writers whatever row they touch, so the default
+temporary SQLite database only checks correctness; run against
+PostgreSQL to see row-lock contention and what sharding buys.
+
+Usage:
+    python -m benchmarks.bench_hot_stock --threads 1,2,4,8,16,32 --slots 8
+    python -m benchmarks.bench_hot_stock --database-url postgresql://...
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.inventory import decrement_stock
+from app.models import StockSlot, Sweet
+from app.stock_slots import fill_slots
+
+
+def run_mode(session_factory, slots: int, threads: int, stock: int, attempts: int) -> dict:
+    """Let ``threads`` buyers race for one sweet with ``slots`` stock slots (0 for the sweet row)"""
+    with session_factory() as db:
+        sweet = Sweet(name="Hot Sweet", category="candy", price=1.0, quantity=stock, stock_slots=slots)
+        db.add(sweet)
+        db.flush()
+        fill_slots(db, sweet.id, slots, stock)
+        db.commit()
+        sweet_id = sweet.id
+    
+    barrier = threading.Barrier(threads + 1)
+    sold = [0] * threads
+    
+    def buyer(index: int):
+        with session_factory() as db:
+            barrier.wait()
+            for _ in range(attempts):
+                if decrement_stock(db, sweet_id, 1) is None:
+                    db.rollback()
+                    continue
+                db.commit()
+                sold[index] += 1
+    
+    workers = [threading.Thread(target=buyer, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    
+    with session_factory() as db:
+        if slots:
+            final_stock = db.query(func.sum(StockSlot.quantity)).filter(StockSlot.sweet_id == sweet_id).scalar()
+        else:
+            final_stock = db.get(Sweet, sweet_id).quantity
+    
+    units_sold = sum(sold)
+    total_attempts = threads * attempts
+    return {
+        "mode": f"sharded x{slots}" if slots else "single_row",
+        "threads": threads,
+        "attempts": total_attempts,
+        "initial_stock": stock,
+        "units_sold": units_sold,
+        "final_stock": final_stock,
+        "oversold": units_sold - (stock - final_stock),
+        "seconds": round(elapsed, 3),
+        "purchases_per_second": round(units_sold / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Target database (default: temporary SQLite file)")
+    parser.add_argument("--threads", default="1,2,4,8,16,32", help="Comma-separated buyer counts")
+    parser.add_argument("--slots", type=int, default=8)
+    parser.add_argument("--stock", type=int, default=2000)
+    parser.add_argument("--attempts", type=int, default=None, help="Purchases per thread (default: stock split over the threads)")
+    args = parser.parse_args()
+    
+    thread_counts = [int(count) for count in args.threads.split(",")]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench_hot_stock.db')}"
+        connect_args = {"check_same_thread": False, "timeout": 60} if url.startswith("sqlite") else {}
+        engine = create_engine(url, pool_size=max(thread_counts), max_overflow=0, connect_args=connect_args)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        
+        results = []
+        for threads in thread_counts:
+            attempts = args.attempts or max(1, args.stock // threads)
+            for slots in (0, args.slots):
+                results.append(run_mode(session_factory, slots, threads, args.stock, attempts))
+        engine.dispose()
+    
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Load test: catalog latency during a burst of logins
+
+Catalog readers poll GET /api/sweets while, in the second phase, other
+clients hammer POST /api/auth/login. bcrypt costs ~250ms of CPU per
+login; if it ran on the event loop, every catalog request on that worker
+would queue behind it and catalog p99 would jump by whole bcrypt rounds.
+
+Usage:
+    python -m benchmarks.bench_login_burst
+    python -m benchmarks.bench_login_burst --readers 20 --logins 16 --duration 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import List
+import httpx
+from benchmarks.harness import (
+    BENCH_PASSWORD,
+    bench_user_email,
+    running_server,
+    seed_database,
+    summarize,
+)
+
+
+async def catalog_reader(client: httpx.AsyncClient, token: str, stop_at: float, samples: List[float]):
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        response = await client.get("/api/sweets", params={"limit": 50}, headers=headers)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+
+
+async def login_client(client: httpx.AsyncClient, index: int, stop_at: float, samples: List[float]):
+    form = {"username": bench_user_email(index), "password": BENCH_PASSWORD}
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        response = await client.post("/api/auth/login", data=form)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+
+
+async def run_phase(base_url: str, token: str, readers: int, logins: int, duration: float) -> dict:
+    catalog_samples: List[float] = []
+    login_samples: List[float] = []
+    limits = httpx.Limits(max_connections=readers + logins + 4)
+    
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        stop_at = time.monotonic() + duration
+        await asyncio.gather(
+            *(catalog_reader(client, token, stop_at, catalog_samples) for _ in range(readers)),
+            *(login_client(client, i, stop_at, login_samples) for i in range(logins)),
+        )
+    
+    return {
+        "readers": readers,
+        "login_clients": logins,
+        "catalog": summarize(catalog_samples, duration),
+        "login": summarize(login_samples, duration),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sweets", type=int, default=1000)
+    parser.add_argument("--readers", type=int, default=10)
+    parser.add_argument("--logins", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench_login_burst.db')}"
+        seed_database(url, sweets=args.sweets, users=args.logins + 1)
+        
+        with running_server(url) as base_url:
+            token = httpx.post(
+                f"{base_url}/api/auth/login",
+                data={"username": bench_user_email(0), "password": BENCH_PASSWORD},
+            ).json()["access_token"]
+            
+            results = {
+                "quiet": asyncio.run(run_phase(base_url, token, args.readers, 0, args.duration)),
+                "login_burst": asyncio.run(run_phase(base_url, token, args.readers, args.logins, args.duration)),
+            }
+    
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Concurrency benchmark for the purchase path
+
+Many threads buy single units of one hot sweet at the same time. The
+legacy read-modify-write purchase (SELECT, check in Python, assign, commit,
+refresh) is compared with the single conditional UPDATE now used by
+purchase_sweet, and the conditional UPDATE with an inventory ledger
+entry written three ways: in a second commit after the purchase
+(ledger_commit), in the purchase transaction (ledger_sync, LEDGER_MODE=sync)
+and through the batching background writer (ledger_queued, the default).
+For each strategy the report shows throughput, whether stock was
+oversold, i.e. whether more units were sold than were deducted, and how
+many ledger entries were written.
+
+Except in ledger_sync and stats_sync, the inventory statistics change of
+each purchase is batched by the ledger writer. stats_sync is atomic with
+the category_stats upsert in the purchase transaction instead, so every
+buyer also waits for the category's counter row: compare it with atomic.
+
+Usage:
+    python -m benchmarks.bench_purchase --threads 16 --stock 2000
+    python -m benchmarks.bench_purchase --strategy atomic --strategy ledger_queued
+    python -m benchmarks.bench_purchase --database-url postgresql://...
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from sqlalchemy import create_engine, func, insert
+from sqlalchemy.orm import Session, sessionmaker
+from app.database import Base
+from app.inventory import decrement_stock
+from app.ledger import ledger, movement
+from app.models import InventoryMovement, MovementKind, Sweet
+
+# Strategies run with the ledger (entries and statistics) in sync mode
+SYNC_STRATEGIES = ("ledger_sync", "stats_sync")
+
+
+def legacy_purchase(db: Session, sweet_id: int, quantity: int) -> bool:
+    """Purchase the way purchase_sweet used to: read, check, write back"""
+    sweet = db.query(Sweet).filter(Sweet.id == sweet_id, Sweet.is_active == True).first()
+    
+    if not sweet or not sweet.can_purchase(quantity):
+        db.rollback()
+        return False
+    
+    sweet.quantity -= quantity
+    db.commit()
+    db.refresh(sweet)
+    return True
+
+
+def atomic_purchase(db: Session, sweet_id: int, quantity: int) -> bool:
+    """Purchase through the conditional UPDATE"""
+    sweet = decrement_stock(db, sweet_id, quantity)
+    
+    if sweet is None:
+        db.rollback()
+        return False
+    
+    db.commit()
+    return True
+
+
+def ledger_commit_purchase(db: Session, sweet_id: int, quantity: int) -> bool:
+    """Conditional UPDATE, then the ledger entry in a transaction of its own"""
+    sweet = decrement_stock(db, sweet_id, quantity)
+    
+    if sweet is None:
+        db.rollback()
+        return False
+    
+    entry = movement(sweet, MovementKind.PURCHASE, -quantity, None)
+    db.commit()
+    db.execute(insert(InventoryMovement), [entry])
+    db.commit()
+    return True
+
+
+def ledger_purchase(db: Session, sweet_id: int, quantity: int) -> bool:
+    """Conditional UPDATE with the ledger entry recorded in the run's ledger mode"""
+    sweet = decrement_stock(db, sweet_id, quantity)
+    
+    if sweet is None:
+        db.rollback()
+        return False
+    
+    ledger.record(db, [movement(sweet, MovementKind.PURCHASE, -quantity, None)])
+    db.commit()
+    return True
+
+
+STRATEGIES = {
+    "legacy": legacy_purchase,
+    "atomic": atomic_purchase,
+    "stats_sync": atomic_purchase,
+    "ledger_commit": ledger_commit_purchase,
+    "ledger_sync": ledger_purchase,
+    "ledger_queued": ledger_purchase,
+}
+
+
+def run_strategy(name: str, session_factory, threads: int, stock: int, attempts: int) -> dict:
+    """Let ``threads`` buyers race for one sweet and report the outcome"""
+    purchase = STRATEGIES[name]
+    ledger.mode = "sync" if name in SYNC_STRATEGIES else "queued"
+    
+    with session_factory() as db:
+        sweet = Sweet(name="Hot Sweet", category="candy", price=1.0, quantity=stock)
+        db.add(sweet)
+        db.commit()
+        sweet_id = sweet.id
+    
+    barrier = threading.Barrier(threads + 1)
+    sold = [0] * threads
+    
+    def buyer(index: int):
+        with session_factory() as db:
+            barrier.wait()
+            for _ in range(attempts):
+                if purchase(db, sweet_id, 1):
+                    sold[index] += 1
+    
+    workers = [threading.Thread(target=buyer, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    # Queued entries count once they are written
+    ledger.flush()
+    elapsed = time.perf_counter() - started
+    
+    with session_factory() as db:
+        final_stock = db.get(Sweet, sweet_id).quantity
+        ledger_entries = db.query(func.count(InventoryMovement.id)).filter(
+            InventoryMovement.sweet_id == sweet_id
+        ).scalar()
+    
+    units_sold = sum(sold)
+    total_attempts = threads * attempts
+    return {
+        "strategy": name,
+        "threads": threads,
+        "attempts": total_attempts,
+        "initial_stock": stock,
+        "units_sold": units_sold,
+        "final_stock": final_stock,
+        "oversold": units_sold - (stock - final_stock),
+        "ledger_entries": ledger_entries,
+        "seconds": round(elapsed, 3),
+        "attempts_per_second": round(total_attempts / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Target database (default: temporary SQLite file)")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--stock", type=int, default=2000)
+    parser.add_argument("--attempts", type=int, default=None, help="Purchases per thread (default: 1.5x stock in total)")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), action="append")
+    args = parser.parse_args()
+    
+    attempts = args.attempts or max(1, (args.stock * 3 // 2) // args.threads)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench_purchase.db')}"
+        connect_args = {"check_same_thread": False, "timeout": 60} if url.startswith("sqlite") else {}
+        engine = create_engine(url, pool_size=args.threads, max_overflow=0, connect_args=connect_args)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        ledger.session_factory = session_factory
+        
+        results = [
+            run_strategy(name, session_factory, args.threads, args.stock, attempts)
+            for name in (args.strategy or list(STRATEGIES))
+        ]
+        ledger.close()
+        engine.dispose()
+    
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
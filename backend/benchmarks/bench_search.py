@@ -0,0 +1,139 @@
+"""
+Search backend benchmark on a large synthetic catalog
+
+Builds a SQLite catalog (1M sweets by default), then times the
+/api/sweets/search query for each backend: the original ILIKE table
+scan, the FTS5 trigram index and the in-process n-gram index. The
+catalog file is cached between runs, keyed by row count.
+
+Usage:
+    python -m benchmarks.bench_search
+    python -m benchmarks.bench_search --rows 200000 --repeat 20
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import settings
+from app.database import Base
+from app.models import Sweet
+from app.search import BACKEND_CLASSES
+
+ADJECTIVES = [
+    "Classic", "Dark", "Milk", "White", "Sour", "Sweet", "Zesty", "Creamy", "Crunchy", "Chewy",
+    "Fizzy", "Salted", "Smoky", "Spicy", "Tangy", "Velvet", "Golden", "Royal", "Tiny", "Giant",
+]
+FLAVORS = [
+    "Chocolate", "Caramel", "Mango", "Strawberry", "Raspberry", "Lemon", "Lime", "Cherry",
+    "Peppermint", "Vanilla", "Hazelnut", "Toffee", "Coconut", "Banana", "Blueberry", "Apple",
+    "Cinnamon", "Licorice", "Honey", "Pistachio", "Almond", "Coffee", "Orange", "Peach",
+]
+FORMS = [
+    "Bar", "Drops", "Gummies", "Bears", "Worms", "Chews", "Truffles", "Fudge", "Lollipop",
+    "Buttons", "Brittle", "Bonbons", "Twists", "Clusters", "Nougat", "Marshmallows",
+]
+CATEGORIES = ["chocolate", "candy", "gummy", "toffee", "lollipop", "licorice", "nougat", "fudge"]
+
+QUERIES = [
+    {"name": "pistachio nougat"},
+    {"name": "velvet"},
+    {"name": "#12345"},
+    {"name": "zesty lime", "category": "gummy"},
+    {"name": "bubblegum"},
+    {"category": "lic"},
+]
+
+
+def build_catalog(url: str, rows: int, batch: int = 20000):
+    """Create the catalog, then add the FTS index in one rebuild"""
+    engine = create_engine(url)
+    rng = random.Random(42)
+    
+    settings.SEARCH_BACKEND = "like"
+    Base.metadata.create_all(bind=engine)
+    
+    with engine.begin() as conn:
+        for start in range(0, rows, batch):
+            conn.execute(insert(Sweet), [
+                {
+                    "name": f"{rng.choice(ADJECTIVES)} {rng.choice(FLAVORS)} {rng.choice(FORMS)} #{i}",
+                    "category": rng.choice(CATEGORIES),
+                    "price": round(rng.uniform(0.5, 20), 2),
+                    "quantity": rng.randint(0, 500),
+                    "is_active": True,
+                }
+                for i in range(start, min(start + batch, rows))
+            ])
+    
+    # after_create hooks install the FTS5 index and index existing rows
+    settings.SEARCH_BACKEND = "auto"
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+
+def run_query(db: Session, backend, params: dict) -> int:
+    """Run the search route's query and return the number of matches"""
+    query = db.query(Sweet).filter(Sweet.is_active == True)
+    text_match = backend.match(db, params.get("name"), params.get("category"))
+    if text_match is not None:
+        query = query.filter(text_match)
+    return len(query.filter(Sweet.quantity > 0).all())
+
+
+def bench_backend(session_factory, name: str, repeat: int) -> dict:
+    backend = BACKEND_CLASSES[name]()
+    result = {"backend": name, "queries": []}
+    
+    with session_factory() as db:
+        started = time.perf_counter()
+        run_query(db, backend, QUERIES[0])
+        result["first_query_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        
+        for params in QUERIES:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                matches = run_query(db, backend, params)
+            elapsed = (time.perf_counter() - started) / repeat
+            result["queries"].append({
+                "params": params,
+                "matches": matches,
+                "mean_ms": round(elapsed * 1000, 2),
+            })
+    
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--backend", choices=["like", "fts5", "ngram"], action="append")
+    parser.add_argument("--cache-dir", default=tempfile.gettempdir())
+    args = parser.parse_args()
+    
+    path = os.path.join(args.cache_dir, f"bench_search_{args.rows}.db")
+    url = f"sqlite:///{path}"
+    
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        build_catalog(url, args.rows)
+        print(f"Built {args.rows} sweets in {time.perf_counter() - started:.1f}s at {path}")
+    
+    engine = create_engine(url)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    
+    results = [
+        bench_backend(session_factory, name, args.repeat)
+        for name in (args.backend or ["like", "fts5", "ngram"])
+    ]
+    engine.dispose()
+    
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
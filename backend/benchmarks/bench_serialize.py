@@ -0,0 +1,129 @@
+"""
+Serialization benchmark for the list endpoints
+
+Times turning a page of sweets into a JSON body two ways:
+
+- before: ORM objects through FastAPI's response_model path
+  (List[SweetResponse] validation from attributes, jsonable_encoder,
+  JSONResponse rendering), as get_all_sweets used to return them
+- after: column rows through app.serialization.encode_sweets
+
+Each is measured on its own ("encode") and together with loading the
+page from SQLite ("load+encode"). Reports per-row cost in microseconds.
+
+Usage:
+    python -m benchmarks.bench_serialize
+    python -m benchmarks.bench_serialize --sizes 1000 10000 50000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import Sweet
+from app.schemas import SweetResponse
+from app.serialization import SWEET_COLUMNS, encode_sweets, orjson
+
+RESPONSE_FIELD = create_response_field(name="Response_get_all_sweets", type_=List[SweetResponse])
+
+
+def build_catalog(url: str, rows: int):
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(7)
+    with engine.begin() as conn:
+        conn.execute(insert(Sweet), [
+            {
+                "name": f"Sweet #{i}",
+                "category": rng.choice(["chocolate", "candy", "gummy", "toffee"]),
+                "price": round(rng.uniform(0.5, 20), 2),
+                "quantity": rng.randint(0, 500),
+                "description": "A benchmark sweet" if i % 2 else None,
+                "is_active": True,
+            }
+            for i in range(rows)
+        ])
+    engine.dispose()
+
+
+async def encode_before(sweets) -> bytes:
+    content = await serialize_response(field=RESPONSE_FIELD, response_content=sweets)
+    return JSONResponse(content).body
+
+
+def encode_after(sweets) -> bytes:
+    return encode_sweets(sweets)
+
+
+async def timed(fn, repeat: int) -> float:
+    """Best wall time of repeat runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        if asyncio.iscoroutine(result):
+            await result
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def bench_size(session_factory, size: int, repeat: int) -> dict:
+    with session_factory() as db:
+        objects = db.query(Sweet).order_by(Sweet.id).limit(size).all()
+        rows = db.query(Sweet).with_entities(*SWEET_COLUMNS).order_by(Sweet.id).limit(size).all()
+        assert json.loads(await encode_before(objects)) == json.loads(encode_after(rows))
+        
+        def load_before():
+            db.expunge_all()
+            return encode_before(db.query(Sweet).order_by(Sweet.id).limit(size).all())
+        
+        def load_after():
+            return encode_after(db.query(Sweet).with_entities(*SWEET_COLUMNS).order_by(Sweet.id).limit(size).all())
+        
+        timings = {
+            "encode_before": await timed(lambda: encode_before(objects), repeat),
+            "encode_after": await timed(lambda: encode_after(rows), repeat),
+            "load_encode_before": await timed(load_before, repeat),
+            "load_encode_after": await timed(load_after, repeat),
+        }
+    
+    result = {"rows": size}
+    for name, seconds in timings.items():
+        result[f"{name}_us_per_row"] = round(seconds / size * 1e6, 2)
+    result["encode_speedup"] = round(timings["encode_before"] / timings["encode_after"], 1)
+    result["load_encode_speedup"] = round(timings["load_encode_before"] / timings["load_encode_after"], 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'serialize.db')}"
+        build_catalog(url, max(args.sizes))
+        engine = create_engine(url)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        
+        results = {
+            "encoder": "orjson" if orjson is not None else "pydantic TypeAdapter",
+            "sizes": [asyncio.run(bench_size(session_factory, size, args.repeat)) for size in args.sizes],
+        }
+        engine.dispose()
+    
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Cold-start benchmark: process launch to the first 200 from /health
+
+Starts a fresh interpreter that imports app.main and serves it with
+uvicorn, polls /health until it answers 200, then stops the server.
+Reports per run the time spent importing app.main and the total from
+launch to the first healthy response, and fails (exit code 1) when the
+median total exceeds the budget, so the number can be tracked in CI.
+
+Usage:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --budget-ms 2000 --no-create-schema
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.harness import BACKEND_DIR, BENCH_SECRET_KEY, free_port
+
+# Median launch-to-healthy time allowed, in milliseconds
+DEFAULT_BUDGET_MS = 2500
+
+SERVER_BOOTSTRAP = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+print(json.dumps({"import_ms": (time.perf_counter() - started) * 1000}), flush=True)
+import uvicorn
+uvicorn.run(app.main.app, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+"""
+
+
+def is_healthy(port: int) -> bool:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+    try:
+        connection.request("GET", "/health")
+        return connection.getresponse().status == 200
+    except OSError:
+        return False
+    finally:
+        connection.close()
+
+
+def cold_start(env: dict, timeout: float) -> dict:
+    """Launch one server and time it until /health answers 200"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVER_BOOTSTRAP, str(port)],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    
+    try:
+        while not is_healthy(port):
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("Server did not become healthy in time")
+            time.sleep(0.002)
+        healthy_ms = (time.perf_counter() - started) * 1000
+        import_ms = json.loads(process.stdout.readline())["import_ms"]
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    
+    return {"import_ms": round(import_ms, 1), "healthy_ms": round(healthy_ms, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--database-url", help="Database to start against (default: a temporary SQLite file)")
+    parser.add_argument("--no-create-schema", action="store_true", help="Start as a migration-managed deployment")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "DATABASE_URL": args.database_url or f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+            "SECRET_KEY": BENCH_SECRET_KEY,
+            "ENVIRONMENT": "benchmark",
+            "DB_CREATE_SCHEMA": "false" if args.no_create_schema else "true",
+        }
+        runs = [cold_start(env, args.timeout) for _ in range(args.runs)]
+    
+    median_ms = statistics.median(run["healthy_ms"] for run in runs)
+    results = {
+        "runs": runs,
+        "import_median_ms": round(statistics.median(run["import_ms"] for run in runs), 1),
+        "healthy_median_ms": round(median_ms, 1),
+        "healthy_min_ms": min(run["healthy_ms"] for run in runs),
+        "budget_ms": args.budget_ms,
+        "within_budget": median_ms <= args.budget_ms,
+    }
+    print(json.dumps(results, indent=2))
+    
+    if not results["within_budget"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Shared helpers for HTTP benchmarks
+
+Seeds a file-backed SQLite database, boots app.main:app under uvicorn in
+a subprocess pointed at it, and summarizes latency samples.
+"""
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+import httpx
+from sqlalchemy import create_engine, insert
+from app.database import Base
+from app.models import Sweet, User, UserRole
+from app.security import get_password_hash
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCH_PASSWORD = "Benchmark123!"
+BENCH_SECRET_KEY = "benchmark-secret-key"
+BENCH_CATEGORIES = ["chocolate", "candy", "gummy", "toffee", "lollipop"]
+
+
+def bench_user_email(index: int) -> str:
+    return f"bench{index}@example.com"
+
+
+def seed_database(url: str, sweets: int = 1000, users: int = 10, admins: int = 1, seed: int = 42):
+    """
+    Create the schema and fill it with benchmark data
+    
+    Users bench0..benchN share BENCH_PASSWORD; the first ``admins`` of
+    them are admins.
+    """
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {
+                "email": bench_user_email(i),
+                "hashed_password": hashed_password,
+                "name": f"Bench User {i}",
+                "role": UserRole.ADMIN if i < admins else UserRole.USER,
+                "is_active": True,
+            }
+            for i in range(users)
+        ])
+        for start in range(0, sweets, 10000):
+            conn.execute(insert(Sweet), [
+                {
+                    "name": f"Sweet {i}",
+                    "category": rng.choice(BENCH_CATEGORIES),
+                    "price": round(rng.uniform(0.5, 20), 2),
+                    "quantity": rng.randint(100, 100000),
+                    "description": f"Benchmark sweet number {i}",
+                    "is_active": True,
+                }
+                for i in range(start, min(start + 10000, sweets))
+            ])
+    engine.dispose()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def running_server(
+    database_url: str,
+    workers: int = 1,
+    env: Optional[Dict[str, str]] = None,
+    startup_timeout: float = 60.0
+) -> Iterator[str]:
+    """
+    Run uvicorn serving app.main:app until the block exits
+    
+    Yields:
+        Base URL of the running server
+    """
+    port = free_port()
+    server_env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "SECRET_KEY": BENCH_SECRET_KEY,
+        "ENVIRONMENT": "benchmark",
+        **(env or {}),
+    }
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=server_env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            try:
+                if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("Server did not become healthy in time")
+            time.sleep(0.1)
+        
+        yield base_url
+    
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def summarize(samples: List[float], elapsed: Optional[float] = None) -> dict:
+    """Latency percentiles in milliseconds (and throughput if elapsed is given)"""
+    if not samples:
+        return {"count": 0}
+    
+    ordered = sorted(samples)
+    
+    def percentile(p: float) -> float:
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return round(ordered[index] * 1000, 2)
+    
+    summary = {
+        "count": len(ordered),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+    if elapsed:
+        summary["requests_per_second"] = round(len(ordered) / elapsed, 1)
+    return summary
@@ -0,0 +1,268 @@
+"""
+Mixed-workload HTTP load test for the API
+
+Seeds a file-backed SQLite database at the requested scale, boots
+app.main:app under uvicorn against it and lets many concurrent async
+clients issue a weighted mix of list, search, get, purchase, restock and
+login requests. Reports overall throughput and p50/p95/p99 per route as
+JSON, so runs of two releases can be compared; with --baseline the run
+fails (exit code 1) when a route's p95 regressed beyond --max-regression.
+
+Usage:
+    python -m benchmarks.loadtest
+    python -m benchmarks.loadtest --sweets 50000 --clients 100 --duration 30 --workers 4
+    python -m benchmarks.loadtest --mix list=50,get=30,purchase=20 --output run.json
+    python -m benchmarks.loadtest --baseline run.json --max-regression 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+from benchmarks.harness import (
+    BENCH_CATEGORIES,
+    BENCH_PASSWORD,
+    bench_user_email,
+    running_server,
+    seed_database,
+    summarize,
+)
+
+# Share of requests per route, in percent
+DEFAULT_MIX = {
+    "list": 35,
+    "search": 20,
+    "get": 25,
+    "purchase": 12,
+    "restock": 3,
+    "login": 5,
+}
+
+
+class Workload:
+    """Builds requests for each route against the seeded catalog"""
+    
+    def __init__(self, sweets: int, users: int, user_tokens: List[str], admin_token: str):
+        self.sweets = sweets
+        self.users = users
+        self.user_tokens = user_tokens
+        self.admin_token = admin_token
+        self.routes: Dict[str, Callable[[httpx.AsyncClient, random.Random], Awaitable[httpx.Response]]] = {
+            "list": self.list_sweets,
+            "search": self.search_sweets,
+            "get": self.get_sweet,
+            "purchase": self.purchase,
+            "restock": self.restock,
+            "login": self.login,
+        }
+    
+    def _user_headers(self, rng: random.Random) -> dict:
+        return {"Authorization": f"Bearer {rng.choice(self.user_tokens)}"}
+    
+    def _sweet_id(self, rng: random.Random) -> int:
+        return rng.randint(1, self.sweets)
+    
+    def list_sweets(self, client: httpx.AsyncClient, rng: random.Random):
+        params = {"limit": 50, "skip": rng.randrange(max(self.sweets - 50, 1))}
+        return client.get("/api/sweets", params=params, headers=self._user_headers(rng))
+    
+    def search_sweets(self, client: httpx.AsyncClient, rng: random.Random):
+        if rng.random() < 0.5:
+            params = {"name": str(rng.randrange(self.sweets))}
+        else:
+            params = {"category": rng.choice(BENCH_CATEGORIES), "max_price": rng.choice([2, 5, 10])}
+        return client.get("/api/sweets/search", params=params, headers=self._user_headers(rng))
+    
+    def get_sweet(self, client: httpx.AsyncClient, rng: random.Random):
+        return client.get(f"/api/sweets/{self._sweet_id(rng)}", headers=self._user_headers(rng))
+    
+    def purchase(self, client: httpx.AsyncClient, rng: random.Random):
+        return client.post(
+            f"/api/sweets/{self._sweet_id(rng)}/purchase",
+            json={"quantity": 1},
+            headers=self._user_headers(rng),
+        )
+    
+    def restock(self, client: httpx.AsyncClient, rng: random.Random):
+        return client.post(
+            f"/api/sweets/{self._sweet_id(rng)}/restock",
+            json={"quantity": 10},
+            headers={"Authorization": f"Bearer {self.admin_token}"},
+        )
+    
+    def login(self, client: httpx.AsyncClient, rng: random.Random):
+        form = {"username": bench_user_email(rng.randrange(self.users)), "password": BENCH_PASSWORD}
+        return client.post("/api/auth/login", data=form)
+
+
+class Recorder:
+    """Latency samples and failures per route, ignored until started"""
+    
+    def __init__(self):
+        self.recording = False
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Counter] = {}
+    
+    def record(self, route: str, seconds: float, outcome: Optional[str]):
+        if not self.recording:
+            return
+        if outcome is None:
+            self.samples.setdefault(route, []).append(seconds)
+        else:
+            self.errors.setdefault(route, Counter())[outcome] += 1
+
+
+async def client_loop(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    mix: Dict[str, int],
+    rng: random.Random,
+    recorder: Recorder,
+    stop_at: float
+):
+    routes = list(mix)
+    weights = list(mix.values())
+    while time.monotonic() < stop_at:
+        route = rng.choices(routes, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = await workload.routes[route](client, rng)
+            outcome = None if response.is_success else str(response.status_code)
+        except httpx.HTTPError as error:
+            outcome = type(error).__name__
+        recorder.record(route, time.perf_counter() - started, outcome)
+
+
+async def run_load(base_url: str, workload: Workload, args, mix: Dict[str, int]) -> dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.clients + 4)
+    
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        stop_at = time.monotonic() + args.warmup + args.duration
+        clients = [
+            asyncio.create_task(
+                client_loop(client, workload, mix, random.Random(args.seed + i), recorder, stop_at)
+            )
+            for i in range(args.clients)
+        ]
+        # Let connections, caches and the pool settle before measuring
+        await asyncio.sleep(args.warmup)
+        recorder.recording = True
+        started = time.perf_counter()
+        await asyncio.gather(*clients)
+        elapsed = time.perf_counter() - started
+    
+    all_samples = [sample for samples in recorder.samples.values() for sample in samples]
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "total": {
+            **summarize(all_samples, elapsed),
+            "errors": sum(sum(errors.values()) for errors in recorder.errors.values()),
+        },
+        "routes": {
+            route: {
+                **summarize(recorder.samples.get(route, []), elapsed),
+                "errors": dict(recorder.errors.get(route, {})),
+            }
+            for route in mix
+        },
+    }
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> List[dict]:
+    """Routes whose p95 grew by more than max_regression percent"""
+    regressions = []
+    for route, current in results["routes"].items():
+        before = baseline.get("routes", {}).get(route, {}).get("p95_ms")
+        if not before or "p95_ms" not in current:
+            continue
+        change = (current["p95_ms"] - before) / before * 100
+        if change > max_regression:
+            regressions.append({
+                "route": route,
+                "baseline_p95_ms": before,
+                "p95_ms": current["p95_ms"],
+                "change_pct": round(change, 1),
+            })
+    return regressions
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        route, _, weight = part.partition("=")
+        route = route.strip()
+        if route not in DEFAULT_MIX or not weight.strip().isdigit():
+            raise argparse.ArgumentTypeError(
+                f"expected route=weight with route in {', '.join(DEFAULT_MIX)}, got {part!r}"
+            )
+        mix[route] = int(weight)
+    return {route: weight for route, weight in mix.items() if weight > 0}
+
+
+async def log_in(base_url: str, users: int) -> List[str]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        responses = await asyncio.gather(*(
+            client.post("/api/auth/login", data={"username": bench_user_email(i), "password": BENCH_PASSWORD})
+            for i in range(users)
+        ))
+    return [response.raise_for_status().json()["access_token"] for response in responses]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sweets", type=int, default=10000, help="Catalog size to seed")
+    parser.add_argument("--users", type=int, default=20, help="Shoppers to seed (bench1..benchN, bench0 is admin)")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before the run")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="Route weights, e.g. list=40,get=60")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare p95 against")
+    parser.add_argument("--max-regression", type=float, default=25.0, help="Allowed p95 growth in percent")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'loadtest.db')}"
+        seed_database(url, sweets=args.sweets, users=args.users + 1, admins=1, seed=args.seed)
+        
+        with running_server(url, workers=args.workers) as base_url:
+            tokens = asyncio.run(log_in(base_url, args.users + 1))
+            workload = Workload(args.sweets, args.users + 1, user_tokens=tokens[1:], admin_token=tokens[0])
+            results = {
+                "config": {
+                    "sweets": args.sweets,
+                    "users": args.users,
+                    "clients": args.clients,
+                    "workers": args.workers,
+                    "duration_s": args.duration,
+                    "mix": args.mix,
+                },
+                **asyncio.run(run_load(base_url, workload, args, args.mix)),
+            }
+    
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.max_regression)
+        results["regressions"] = regressions
+        exit_code = 1 if regressions else 0
+    
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(report + "\n")
+    
+    raise SystemExit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Bulk import sweets from a CSV or NDJSON supplier feed
+
+Usage:
+    python import_sweets.py feed.csv
+    python import_sweets.py feed.ndjson --chunk-size 5000
+"""
+import argparse
+import os
+import sys
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, engine, Base
+from app.bulk_import import DEFAULT_CHUNK_SIZE, SUPPORTED_FORMATS, SweetImporter, read_rows
+
+
+def import_sweets(path: str, fmt: str, chunk_size: int) -> bool:
+    """Import a feed file and print a summary report"""
+    Base.metadata.create_all(bind=engine)
+    
+    db: Session = SessionLocal()
+    
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as feed:
+            report = SweetImporter(db, chunk_size).add_all(read_rows(feed, fmt)).finish()
+        
+        print(f"✅ Processed {report.processed} rows from {path}")
+        print(f"   Created: {report.created}")
+        print(f"   Updated: {report.updated}")
+        print(f"   Failed:  {report.failed}")
+        
+        for error in report.errors[:20]:
+            print(f"   ❌ Row {error.row}: {error.error}")
+        if report.failed > 20:
+            print(f"   ... and {report.failed - 20} more rejected rows")
+        
+        return report.failed == 0
+    
+    except Exception as e:
+        print(f"❌ Error importing sweets: {str(e)}")
+        db.rollback()
+        return False
+    
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import sweets from a CSV or NDJSON feed")
+    parser.add_argument("path", help="Feed file to import")
+    parser.add_argument("--format", choices=SUPPORTED_FORMATS, help="Feed format (default: from file extension)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+    
+    extension = os.path.splitext(args.path)[1].lower()
+    fmt = args.format or ("csv" if extension == ".csv" else "ndjson")
+    
+    if not import_sweets(args.path, fmt, args.chunk_size):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
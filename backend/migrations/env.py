@@ -0,0 +1,69 @@
+"""
+Alembic environment for the Sweet Shop database
+
+Migrations always run on the sync driver, also when DATABASE_URL names
+an async one.
+"""
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine
+from app.config import settings
+from app.database import Base, sync_database_url
+import app.models  # noqa: F401  registers the tables on Base.metadata
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def database_url() -> str:
+    """-x url=..., then sqlalchemy.url, then DATABASE_URL"""
+    url = context.get_x_argument(as_dictionary=True).get("url") or config.get_main_option("sqlalchemy.url")
+    return sync_database_url(url or settings.DATABASE_URL)
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL instead of running it"""
+    context.configure(
+        url=database_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run the migrations against the database"""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        # Called from code (e.g. tests) with an open connection
+        _run(connection)
+        return
+    
+    engine = create_engine(database_url())
+    with engine.connect() as connection:
+        _run(connection)
+    engine.dispose()
+
+
+def _run(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite cannot ALTER most constraints in place
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,61 @@
+"""Baseline schema: users and sweets
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-01-15 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("role", sa.Enum("ADMIN", "USER", name="userrole"), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("(CURRENT_TIMESTAMP)"), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_id", "users", ["id"])
+    
+    op.create_table(
+        "sweets",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("image_url", sa.String(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("(CURRENT_TIMESTAMP)"), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_sweets_id", "sweets", ["id"])
+    op.create_index("ix_sweets_name", "sweets", ["name"])
+    op.create_index("ix_sweets_category", "sweets", ["category"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sweets_category", table_name="sweets")
+    op.drop_index("ix_sweets_name", table_name="sweets")
+    op.drop_index("ix_sweets_id", table_name="sweets")
+    op.drop_table("sweets")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_table("users")
+    sa.Enum(name="userrole").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,104 @@
+"""Substring search indexes (SQLite FTS5 / PostgreSQL pg_trgm)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-01-22 00:00:00
+"""
+import logging
+from alembic import op
+import sqlalchemy as sa
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+# app.search.FTS5_DDL and TRIGRAM_DDL when this revision was written
+FTS5_TABLE = (
+    "CREATE VIRTUAL TABLE sweets_fts USING fts5("
+    "name, category, content='sweets', content_rowid='id', tokenize='trigram')"
+)
+
+FTS5_DDL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS sweets_fts_insert AFTER INSERT ON sweets BEGIN
+        INSERT INTO sweets_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sweets_fts_delete AFTER DELETE ON sweets BEGIN
+        INSERT INTO sweets_fts(sweets_fts, rowid, name, category)
+        VALUES ('delete', old.id, old.name, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sweets_fts_update AFTER UPDATE OF name, category ON sweets BEGIN
+        INSERT INTO sweets_fts(sweets_fts, rowid, name, category)
+        VALUES ('delete', old.id, old.name, old.category);
+        INSERT INTO sweets_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END
+    """,
+]
+
+TRIGRAM_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_sweets_name_trgm ON sweets USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_sweets_category_trgm ON sweets USING gin (category gin_trgm_ops)",
+]
+
+
+def upgrade() -> None:
+    # A no-op where SEARCH_BACKEND needs no index
+    if settings.SEARCH_BACKEND not in ("auto", "fts5", "trigram"):
+        return
+    
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        _create_fts5_index(bind)
+    elif bind.dialect.name == "postgresql":
+        _create_trigram_index(bind)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for trigger in ("sweets_fts_insert", "sweets_fts_delete", "sweets_fts_update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS sweets_fts")
+    elif bind.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_sweets_name_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_sweets_category_trgm")
+
+
+def _create_fts5_index(bind: sa.engine.Connection):
+    exists = bind.execute(
+        sa.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sweets_fts'")
+    ).first() is not None
+    
+    if not exists:
+        try:
+            bind.execute(sa.text(FTS5_TABLE))
+        except sa.exc.DBAPIError:
+            logger.warning("SQLite FTS5 trigram tokenizer unavailable; search will use ngram")
+            return
+    
+    for statement in FTS5_DDL:
+        bind.execute(sa.text(statement))
+    
+    if not exists:
+        # Index sweets that were inserted before the FTS table existed
+        bind.execute(sa.text("INSERT INTO sweets_fts(sweets_fts) VALUES ('rebuild')"))
+
+
+def _create_trigram_index(bind: sa.engine.Connection):
+    try:
+        with bind.begin_nested():
+            bind.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for statement in TRIGRAM_DDL:
+                bind.execute(sa.text(statement))
+    except sa.exc.DBAPIError:
+        logger.warning("pg_trgm unavailable; search will use ngram")
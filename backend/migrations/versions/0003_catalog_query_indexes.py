@@ -0,0 +1,51 @@
+"""Indexes matched to the catalog query shapes
+
+- ix_sweets_name_category replaces ix_sweets_name for import lookups
+- ix_sweets_active: listing active sweets in ID order
+- ix_sweets_in_stock / ix_sweets_in_stock_price: in-stock listing and
+  price-range search, partial so they only hold sellable rows
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-02-05 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("is_active = true")
+IN_STOCK = sa.text("is_active = true AND quantity > 0")
+# SQLite stores booleans as integers and has no "true" before 3.23
+SQLITE_ACTIVE = sa.text("is_active = 1")
+SQLITE_IN_STOCK = sa.text("is_active = 1 AND quantity > 0")
+
+
+def upgrade() -> None:
+    op.create_index("ix_sweets_name_category", "sweets", ["name", "category"])
+    op.drop_index("ix_sweets_name", table_name="sweets")
+    op.create_index(
+        "ix_sweets_active", "sweets", ["id"],
+        sqlite_where=SQLITE_ACTIVE, postgresql_where=ACTIVE
+    )
+    op.create_index(
+        "ix_sweets_in_stock", "sweets", ["id"],
+        sqlite_where=SQLITE_IN_STOCK, postgresql_where=IN_STOCK
+    )
+    op.create_index(
+        "ix_sweets_in_stock_price", "sweets", ["price"],
+        sqlite_where=SQLITE_IN_STOCK, postgresql_where=IN_STOCK
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sweets_in_stock_price", table_name="sweets")
+    op.drop_index("ix_sweets_in_stock", table_name="sweets")
+    op.drop_index("ix_sweets_active", table_name="sweets")
+    op.create_index("ix_sweets_name", "sweets", ["name"])
+    op.drop_index("ix_sweets_name_category", table_name="sweets")
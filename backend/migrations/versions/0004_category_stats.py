@@ -0,0 +1,64 @@
+"""Inventory statistics counters per category
+
+Creates category_stats and fills it from the current catalog; the API
+keeps it up to date from then on.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-02-19 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# app.inventory_stats.LOW_STOCK_THRESHOLD when this revision was written
+LOW_STOCK_THRESHOLD = 10
+
+
+def upgrade() -> None:
+    stats = op.create_table(
+        "category_stats",
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("products", sa.Integer(), nullable=False),
+        sa.Column("in_stock", sa.Integer(), nullable=False),
+        sa.Column("out_of_stock", sa.Integer(), nullable=False),
+        sa.Column("low_stock", sa.Integer(), nullable=False),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("stock_value", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("category"),
+    )
+    
+    sweets = sa.table(
+        "sweets",
+        sa.column("category", sa.String()),
+        sa.column("price", sa.Float()),
+        sa.column("quantity", sa.Integer()),
+        sa.column("is_active", sa.Boolean()),
+    )
+    quantity = sweets.c.quantity
+    op.execute(
+        stats.insert().from_select(
+            ["category", "products", "in_stock", "out_of_stock", "low_stock", "units", "stock_value"],
+            sa.select(
+                sweets.c.category,
+                sa.func.count(),
+                sa.func.sum(sa.case((quantity > 0, 1), else_=0)),
+                sa.func.sum(sa.case((quantity == 0, 1), else_=0)),
+                sa.func.sum(sa.case(((quantity > 0) & (quantity <= LOW_STOCK_THRESHOLD), 1), else_=0)),
+                sa.func.sum(quantity),
+                sa.func.sum(quantity * sweets.c.price),
+            )
+            .where(sweets.c.is_active == sa.true())
+            .group_by(sweets.c.category)
+        )
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("category_stats")
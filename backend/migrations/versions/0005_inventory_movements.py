@@ -0,0 +1,46 @@
+"""Append-only inventory ledger
+
+- inventory_movements: one row per purchase line and restock
+- ix_inventory_movements_sweet_created / ix_inventory_movements_created:
+  per-sweet and catalog-wide ledger reads in (created_at, id) order
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-02-26 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "inventory_movements",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("sweet_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("kind", sa.Enum("PURCHASE", "RESTOCK", name="movementkind"), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("quantity_after", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["sweet_id"], ["sweets.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_inventory_movements_sweet_created", "inventory_movements", ["sweet_id", "created_at", "id"]
+    )
+    op.create_index("ix_inventory_movements_created", "inventory_movements", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_inventory_movements_created", table_name="inventory_movements")
+    op.drop_index("ix_inventory_movements_sweet_created", table_name="inventory_movements")
+    op.drop_table("inventory_movements")
+    sa.Enum(name="movementkind").drop(op.get_bind(), checkfirst=True)
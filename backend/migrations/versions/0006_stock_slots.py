@@ -0,0 +1,50 @@
+"""Sharded stock for hot sweets
+
+- sweets.stock_slots: number of stock slots, 0 outside hot mode
+- sweet_stock_slots: the slot counters of hot sweets
+- ix_sweets_hot: the few sweets in hot mode, for the statistics
+- category_stats.hot_products: hot sweets per category
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-03-04 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("sweets") as batch_op:
+        batch_op.add_column(sa.Column("stock_slots", sa.Integer(), server_default="0", nullable=False))
+    op.create_index(
+        "ix_sweets_hot", "sweets", ["id"],
+        sqlite_where=sa.text("stock_slots > 0"), postgresql_where=sa.text("stock_slots > 0")
+    )
+    
+    op.create_table(
+        "sweet_stock_slots",
+        sa.Column("sweet_id", sa.Integer(), nullable=False),
+        sa.Column("slot", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["sweet_id"], ["sweets.id"]),
+        sa.PrimaryKeyConstraint("sweet_id", "slot"),
+    )
+    
+    with op.batch_alter_table("category_stats") as batch_op:
+        batch_op.add_column(sa.Column("hot_products", sa.Integer(), server_default="0", nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("category_stats") as batch_op:
+        batch_op.drop_column("hot_products")
+    op.drop_table("sweet_stock_slots")
+    op.drop_index("ix_sweets_hot", table_name="sweets")
+    with op.batch_alter_table("sweets") as batch_op:
+        batch_op.drop_column("stock_slots")
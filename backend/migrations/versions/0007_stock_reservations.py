@@ -0,0 +1,48 @@
+"""Time-limited stock reservations for checkout
+
+- stock_reservations: units held while a checkout's payment runs
+- ix_stock_reservations_status_expires: the expiry sweep's held
+  reservations in expires_at order
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-03-11 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stock_reservations",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("sweet_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("HELD", "CONFIRMED", "RELEASED", "EXPIRED", name="reservationstatus"),
+            nullable=False
+        ),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("(CURRENT_TIMESTAMP)"), nullable=True),
+        sa.ForeignKeyConstraint(["sweet_id"], ["sweets.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_stock_reservations_status_expires", "stock_reservations", ["status", "expires_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stock_reservations_status_expires", table_name="stock_reservations")
+    op.drop_table("stock_reservations")
+    sa.Enum(name="reservationstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,37 @@
+"""Delta sync on sweets.updated_at
+
+- Backfills updated_at of sweets never updated since they were created
+  (the application now sets it on insert)
+- ix_sweets_updated: GET /api/sweets/changes in (updated_at, id) order
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2024-03-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    sweets = sa.table(
+        "sweets",
+        sa.column("created_at", sa.DateTime(timezone=True)),
+        sa.column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.execute(
+        sweets.update()
+        .where(sweets.c.updated_at.is_(None))
+        .values(updated_at=sa.func.coalesce(sweets.c.created_at, sa.func.current_timestamp()))
+    )
+    op.create_index("ix_sweets_updated", "sweets", ["updated_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sweets_updated", table_name="sweets")
@@ -3,6 +3,7 @@ Seed database with sample sweets for testing
 """
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine, Base
+from app.inventory_stats import recompute_stats
 from app.models import Sweet
 
 
@@ -125,13 +126,16 @@ def seed_sweets():
             sweet = Sweet(**sweet_data)
             db.add(sweet)
         
+        # Added around the API, so count them into the inventory statistics
+        db.flush()
+        recompute_stats(db)
         db.commit()
         
         print(f"✅ Successfully seeded {len(sample_sweets)} sweets!")
         print("\nSample Sweets Added:")
         for i, sweet_data in enumerate(sample_sweets, 1):
             print(f"   {i}. {sweet_data['name']} - ${sweet_data['price']} ({sweet_data['quantity']} in stock)")
-        
+    
     except Exception as e:
         print(f"❌ Error seeding database: {str(e)}")
         db.rollback()
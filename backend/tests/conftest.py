@@ -1,15 +1,19 @@
 """
 Test configuration and fixtures
 """
+from contextlib import contextmanager
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from app.main import app
 from app.database import Base, get_db
+from app.ledger import ledger
+from app.reservations import reservation_expiry
 from app.models import User, Sweet, UserRole
-from app.security import get_password_hash
+from app.security import get_password_hash, token_cache, user_cache
+from app.search import reset_search_backends
 
 # Create in-memory SQLite database for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -34,11 +38,24 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+# Queued ledger rows wait for ledger.flush(): a writer thread would share
+# the single in-memory connection with the requests
+ledger.session_factory = TestingSessionLocal
+ledger.background = False
+# Likewise, expired reservations wait for reservation_expiry.run_due()
+reservation_expiry.session_factory = TestingSessionLocal
+reservation_expiry.background = False
+
 
 @pytest.fixture(scope="function")
 def db_session():
     """Create a fresh database session for each test"""
     Base.metadata.create_all(bind=engine)
+    reset_search_backends()
+    user_cache.clear()
+    token_cache.clear()
+    ledger.clear()
+    reservation_expiry.clear()
     db = TestingSessionLocal()
     try:
         yield db
@@ -138,3 +155,34 @@ def auth_headers_user(user_token):
 def auth_headers_admin(admin_token):
     """Get authorization headers for test admin"""
     return {"Authorization": f"Bearer {admin_token}"}
+
+
+@pytest.fixture
+def assert_max_queries():
+    """
+    Fail when a block runs more SQL statements than its budget
+    
+    Usage:
+        with assert_max_queries(2):
+            client.get("/api/sweets", headers=headers)
+    
+    The block yields the list of statements it ran.
+    """
+    @contextmanager
+    def check(budget: int):
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(engine, "after_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "after_cursor_execute", record)
+        
+        assert len(statements) <= budget, (
+            f"{len(statements)} queries ran, budget is {budget}:\n" + "\n".join(statements)
+        )
+    
+    return check
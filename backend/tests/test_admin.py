@@ -0,0 +1,123 @@
+"""
+Tests for admin operational endpoints and pool instrumentation
+"""
+import pytest
+from fastapi import status
+
+
+@pytest.fixture
+def pooled_engine(tmp_path, monkeypatch):
+    """File-backed engine built from the pool settings, one connection, no overflow"""
+    from sqlalchemy import create_engine
+    from app.config import settings
+    from app.pool import install_pre_ping, pool_options
+    
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 1)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 0)
+    monkeypatch.setattr(settings, "DB_POOL_TIMEOUT", 0.1)
+    monkeypatch.setattr(settings, "DB_POOL_PRE_PING", "idle")
+    monkeypatch.setattr(settings, "DB_POOL_PRE_PING_IDLE_SECONDS", 0.0)
+    
+    url = f"sqlite:///{tmp_path / 'pool.db'}"
+    engine = create_engine(url, **pool_options(url))
+    install_pre_ping(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.integration
+class TestPoolStatusEndpoint:
+    """Test GET /api/admin/pool"""
+    
+    def test_admin_reads_pool_status(self, client, auth_headers_admin):
+        """
+        TEST: Admin requests pool metrics
+        EXPECT: 200 OK with worker pid, pool class and counters
+        """
+        response = client.get("/api/admin/pool", headers=auth_headers_admin)
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["pid"] > 0
+        assert data["pool_class"]
+        assert data["timeouts"] >= 0
+    
+    def test_user_cannot_read_pool_status(self, client, auth_headers_user):
+        """
+        TEST: Regular user requests pool metrics
+        EXPECT: 403 Forbidden
+        """
+        response = client.get("/api/admin/pool", headers=auth_headers_user)
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.integration
+class TestPoolInstrumentation:
+    """Test the configured pool and its counters"""
+    
+    def test_pool_settings_applied(self, pooled_engine):
+        """
+        TEST: Build an engine from the DB_POOL_* settings
+        EXPECT: Instrumented pool with the configured size and timeout
+        """
+        from app.pool import InstrumentedQueuePool, pool_status
+        
+        assert isinstance(pooled_engine.pool, InstrumentedQueuePool)
+        report = pool_status(pooled_engine)
+        assert report["size"] == 1
+        assert report["max_overflow"] == 0
+        assert report["timeout"] == 0.1
+    
+    def test_checkout_wait_and_timeout_counted(self, pooled_engine):
+        """
+        TEST: Request a second connection while the only one is checked out
+        EXPECT: The request times out and is counted
+        """
+        from sqlalchemy.exc import TimeoutError
+        from app.pool import pool_status
+        
+        with pooled_engine.connect():
+            assert pool_status(pooled_engine)["checked_out"] == 1
+            with pytest.raises(TimeoutError):
+                pooled_engine.connect()
+        
+        report = pool_status(pooled_engine)
+        assert report["checkouts"] == 1
+        assert report["timeouts"] == 1
+        assert report["checked_out"] == 0
+        assert report["wait_seconds_max"] >= 0.1
+    
+    def test_idle_connection_is_pinged(self, pooled_engine):
+        """
+        TEST: Reuse a pooled connection past the idle threshold
+        EXPECT: One ping for the reused connection, none for the new one
+        """
+        from app.pool import pool_status
+        
+        for _ in range(2):
+            with pooled_engine.connect():
+                pass
+        
+        assert pool_status(pooled_engine)["pings"] == 1
+    
+    def test_failed_ping_replaces_connection(self, pooled_engine, monkeypatch):
+        """
+        TEST: Reuse a pooled connection whose ping fails
+        EXPECT: A fresh connection is handed out and the failure is counted
+        """
+        from sqlalchemy import text
+        from app.pool import pool_status
+        
+        with pooled_engine.connect() as connection:
+            first = connection.connection.dbapi_connection
+        
+        def broken_ping(dbapi_connection):
+            raise RuntimeError("server closed the connection")
+        
+        monkeypatch.setattr(pooled_engine.dialect, "do_ping", broken_ping)
+        with pooled_engine.connect() as connection:
+            assert connection.connection.dbapi_connection is not first
+            assert connection.execute(text("SELECT 1")).scalar() == 1
+        
+        assert pool_status(pooled_engine)["ping_failures"] == 1
@@ -211,3 +211,123 @@ class TestGetCurrentUser:
         )
         
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.auth
+class TestUserCache:
+    """Test the authenticated-user cache"""
+    
+    def test_cached_user_skips_users_table(self, client, auth_headers_user, test_user, db_session):
+        """
+        TEST: Repeat a request after the user row disappears behind the ORM's back
+        EXPECT: Served from cache until the user is invalidated
+        """
+        from sqlalchemy import delete
+        from app.models import User
+        from app.security import invalidate_user
+        
+        assert client.get("/api/auth/me", headers=auth_headers_user).status_code == status.HTTP_200_OK
+        
+        db_session.execute(delete(User).where(User.id == test_user.id))
+        db_session.commit()
+        
+        response = client.get("/api/auth/me", headers=auth_headers_user)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["email"] == test_user.email
+        
+        invalidate_user(test_user.id)
+        response = client.get("/api/auth/me", headers=auth_headers_user)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    
+    def test_deactivated_user_is_evicted(self, client, auth_headers_user, test_user, db_session):
+        """
+        TEST: Deactivate a user whose record is cached
+        EXPECT: The next request is rejected with 403 Forbidden
+        """
+        assert client.get("/api/auth/me", headers=auth_headers_user).status_code == status.HTTP_200_OK
+        
+        test_user.is_active = False
+        db_session.commit()
+        
+        response = client.get("/api/auth/me", headers=auth_headers_user)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+    
+    def test_role_change_is_evicted(self, client, auth_headers_user, test_user, db_session):
+        """
+        TEST: Promote a cached user to admin
+        EXPECT: The next request sees the new role
+        """
+        from app.models import UserRole
+        
+        assert client.get("/api/auth/me", headers=auth_headers_user).json()["role"] == "user"
+        
+        test_user.role = UserRole.ADMIN
+        db_session.commit()
+        
+        response = client.post(
+            "/api/sweets",
+            json={"name": "Toffee", "category": "toffee", "price": 1.0, "quantity": 1},
+            headers=auth_headers_user
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.auth
+class TestTokenCache:
+    """Test the verified-token cache in decode_access_token"""
+    
+    def test_repeated_token_skips_verification(self, db_session, monkeypatch):
+        """
+        TEST: Decode the same token twice
+        EXPECT: The second decode returns the cached claims without calling jwt.decode
+        """
+        from app import security
+        
+        token = security.create_access_token({"sub": "cached@example.com", "user_id": 7, "role": "user"})
+        first = security.decode_access_token(token)
+        
+        def fail_decode(*args, **kwargs):
+            raise AssertionError("token verified again")
+        
+        monkeypatch.setattr(security.jwt, "decode", fail_decode)
+        
+        assert security.decode_access_token(token) is first
+        assert first.user_id == 7
+    
+    def test_entry_expires_with_token(self, db_session, monkeypatch):
+        """
+        TEST: Cache a token that expires in 60 seconds, then move the clock past it
+        EXPECT: The cache no longer holds the claims
+        """
+        import hashlib
+        from datetime import timedelta
+        from app import cache, security
+        
+        token = security.create_access_token(
+            {"sub": "short@example.com", "user_id": 8, "role": "user"},
+            expires_delta=timedelta(seconds=60)
+        )
+        security.decode_access_token(token)
+        key = hashlib.sha256(token.encode()).digest()
+        assert security.token_cache.get(key) is not None
+        
+        now = cache.time.monotonic()
+        monkeypatch.setattr(cache.time, "monotonic", lambda: now + 61)
+        
+        assert security.token_cache.get(key) is None
+    
+    def test_invalid_token_not_cached(self, db_session):
+        """
+        TEST: Decode a token with a tampered signature
+        EXPECT: 401, and nothing is cached
+        """
+        from fastapi import HTTPException
+        from app import security
+        
+        token = security.create_access_token({"sub": "bad@example.com", "user_id": 9, "role": "user"})
+        
+        with pytest.raises(HTTPException) as error:
+            security.decode_access_token(token[:-2] + ("AA" if not token.endswith("AA") else "BB"))
+        
+        assert error.value.status_code == status.HTTP_401_UNAUTHORIZED
+        assert len(security.token_cache) == 0
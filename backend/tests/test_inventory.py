@@ -121,6 +121,57 @@ class TestPurchaseSweet:
         )
         
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    
+    def test_purchase_more_than_available(self, client, auth_headers_user, test_sweet):
+        """
+        TEST: Purchase one unit more than the remaining stock
+        EXPECT: 400 Bad Request and stock left untouched
+        """
+        response = client.post(
+            f"/api/sweets/{test_sweet.id}/purchase",
+            json={"quantity": test_sweet.quantity + 1},
+            headers=auth_headers_user
+        )
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert f"Available: {test_sweet.quantity}" in response.json()["detail"]
+        
+        response = client.get(f"/api/sweets/{test_sweet.id}", headers=auth_headers_user)
+        assert response.json()["quantity"] == test_sweet.quantity
+    
+    def test_purchase_inactive_sweet(self, client, auth_headers_user, test_sweet, db_session):
+        """
+        TEST: Purchase a soft-deleted sweet
+        EXPECT: 404 Not Found
+        """
+        test_sweet.is_active = False
+        db_session.commit()
+        
+        response = client.post(
+            f"/api/sweets/{test_sweet.id}/purchase",
+            json={"quantity": 1},
+            headers=auth_headers_user
+        )
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_purchase_without_returning_support(
+        self, client, auth_headers_user, test_sweet, db_session, monkeypatch
+    ):
+        """
+        TEST: Purchase on a backend without UPDATE ... RETURNING
+        EXPECT: 200 OK via the re-read fallback
+        """
+        monkeypatch.setattr(db_session.get_bind().dialect, "update_returning", False)
+        
+        response = client.post(
+            f"/api/sweets/{test_sweet.id}/purchase",
+            json={"quantity": 3},
+            headers=auth_headers_user
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["sweet"]["quantity"] == test_sweet.quantity - 3
 
 
 @pytest.mark.inventory
@@ -204,6 +255,106 @@ class TestRestockSweet:
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
+@pytest.mark.inventory
+class TestCheckout:
+    """Test multi-item checkout endpoint"""
+    
+    @pytest.fixture
+    def second_sweet(self, db_session):
+        """Create a second sweet for the cart"""
+        from app.models import Sweet
+        
+        sweet = Sweet(name="Gummy Bears", category="gummy", price=1.99, quantity=10, is_active=True)
+        db_session.add(sweet)
+        db_session.commit()
+        db_session.refresh(sweet)
+        return sweet
+    
+    def test_checkout_success(self, client, auth_headers_user, test_sweet, second_sweet):
+        """
+        TEST: Checkout a cart with two sweets
+        EXPECT: 200 OK with both sweets decremented, in ID order
+        """
+        response = client.post(
+            "/api/sweets/checkout",
+            json={"items": [
+                {"sweet_id": second_sweet.id, "quantity": 4},
+                {"sweet_id": test_sweet.id, "quantity": 5}
+            ]},
+            headers=auth_headers_user
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["success"] is True
+        assert [sweet["id"] for sweet in data["sweets"]] == [test_sweet.id, second_sweet.id]
+        assert data["sweets"][0]["quantity"] == test_sweet.quantity - 5
+        assert data["sweets"][1]["quantity"] == second_sweet.quantity - 4
+    
+    def test_checkout_merges_duplicate_lines(self, client, auth_headers_user, test_sweet):
+        """
+        TEST: Checkout a cart listing the same sweet twice
+        EXPECT: 200 OK with the quantities summed
+        """
+        response = client.post(
+            "/api/sweets/checkout",
+            json={"items": [
+                {"sweet_id": test_sweet.id, "quantity": 2},
+                {"sweet_id": test_sweet.id, "quantity": 3}
+            ]},
+            headers=auth_headers_user
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["sweets"][0]["quantity"] == test_sweet.quantity - 5
+    
+    def test_checkout_is_all_or_nothing(self, client, auth_headers_user, test_sweet, second_sweet):
+        """
+        TEST: Checkout where one line exceeds the available stock
+        EXPECT: 400 Bad Request and no stock taken from any sweet
+        """
+        response = client.post(
+            "/api/sweets/checkout",
+            json={"items": [
+                {"sweet_id": test_sweet.id, "quantity": 5},
+                {"sweet_id": second_sweet.id, "quantity": second_sweet.quantity + 1}
+            ]},
+            headers=auth_headers_user
+        )
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "insufficient stock" in response.json()["detail"].lower()
+        
+        response = client.get(f"/api/sweets/{test_sweet.id}", headers=auth_headers_user)
+        assert response.json()["quantity"] == test_sweet.quantity
+    
+    def test_checkout_nonexistent_sweet(self, client, auth_headers_user, test_sweet):
+        """
+        TEST: Checkout a cart containing an unknown sweet
+        EXPECT: 404 Not Found
+        """
+        response = client.post(
+            "/api/sweets/checkout",
+            json={"items": [{"sweet_id": 99999, "quantity": 1}]},
+            headers=auth_headers_user
+        )
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_checkout_empty_cart(self, client, auth_headers_user):
+        """
+        TEST: Checkout an empty cart
+        EXPECT: 422 Unprocessable Entity
+        """
+        response = client.post(
+            "/api/sweets/checkout",
+            json={"items": []},
+            headers=auth_headers_user
+        )
+        
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 @pytest.mark.inventory
 class TestInventoryIntegration:
     """Integration tests for inventory operations"""
@@ -271,3 +422,784 @@ class TestInventoryIntegration:
         )
         assert response.status_code == status.HTTP_200_OK
         assert response.json()["sweet"]["quantity"] == restock_qty - 5
+
+
+@pytest.mark.inventory
+class TestConcurrentPurchase:
+    """Concurrency tests for the atomic stock updates"""
+    
+    def test_concurrent_purchases_never_oversell(self, tmp_path):
+        """
+        TEST: Many threads buy from one sweet with limited stock
+        EXPECT: Exactly the available stock is sold, never more
+        """
+        import threading
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from app.database import Base
+        from app.inventory import decrement_stock
+        from app.models import Sweet
+        
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'concurrency.db'}",
+            connect_args={"check_same_thread": False, "timeout": 30},
+        )
+        Base.metadata.create_all(bind=engine)
+        SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        
+        with SessionFactory() as db:
+            sweet = Sweet(name="Hot Sweet", category="candy", price=1.0, quantity=50)
+            db.add(sweet)
+            db.commit()
+            sweet_id = sweet.id
+        
+        sold = []
+        
+        def buyer():
+            with SessionFactory() as db:
+                for _ in range(10):
+                    if decrement_stock(db, sweet_id, 1) is not None:
+                        sold.append(1)
+                    db.commit()
+        
+        threads = [threading.Thread(target=buyer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        with SessionFactory() as db:
+            assert db.get(Sweet, sweet_id).quantity == 0
+        assert len(sold) == 50
+        engine.dispose()
+    
+    @pytest.fixture
+    def race_db(self, tmp_path, monkeypatch):
+        """A file database threads can share, holding a sweet with 10 units to race on; ledger in sync mode"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from app.database import Base
+        from app.inventory_stats import recompute_stats
+        from app.ledger import ledger
+        from app.models import Sweet
+        
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'race.db'}",
+            connect_args={"check_same_thread": False, "timeout": 30},
+        )
+        Base.metadata.create_all(bind=engine)
+        SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        monkeypatch.setattr(ledger, "mode", "sync")
+        
+        with SessionFactory() as db:
+            sweet = Sweet(name="Raced Sweet", category="candy", price=1.0, quantity=10)
+            # Keeps the category's counters alive when the raced sweet is deleted
+            db.add(Sweet(name="Bystander", category="candy", price=1.0, quantity=10))
+            db.add(sweet)
+            db.flush()
+            recompute_stats(db)
+            db.commit()
+            sweet_id = sweet.id
+        
+        yield engine, SessionFactory, sweet_id
+        engine.dispose()
+    
+    def purchase_during(self, race_db, write, quantity):
+        """
+        Run write, and once it has run its first statement buy quantity
+        units on another thread, giving the purchase a second to commit
+        before write goes on
+        """
+        import threading
+        from sqlalchemy import event
+        from app.routes.sweets import _purchase_sweet
+        
+        engine, SessionFactory, sweet_id = race_db
+        writer = threading.current_thread()
+        buyers = []
+        
+        def buy():
+            with SessionFactory() as db:
+                _purchase_sweet(db, sweet_id, quantity, None)
+        
+        def after_first_statement(conn, cursor, statement, parameters, context, executemany):
+            if threading.current_thread() is writer and not buyers:
+                buyers.append(threading.Thread(target=buy))
+                buyers[0].start()
+                buyers[0].join(1)
+        
+        event.listen(engine, "after_cursor_execute", after_first_statement)
+        try:
+            with SessionFactory() as db:
+                write(db, sweet_id)
+        finally:
+            event.remove(engine, "after_cursor_execute", after_first_statement)
+        buyers[0].join()
+    
+    def test_restock_keeps_concurrent_purchase(self, race_db):
+        """
+        TEST: A purchase of 4 lands while a restock of 5 is under way on 10 units
+        EXPECT: 11 units: the restock adds to the stock instead of writing back what it read
+        """
+        from app.models import Sweet
+        from app.routes.sweets import _restock_sweet
+        
+        self.purchase_during(race_db, lambda db, sweet_id: _restock_sweet(db, sweet_id, 5, None), 4)
+        
+        _, SessionFactory, sweet_id = race_db
+        with SessionFactory() as db:
+            assert db.get(Sweet, sweet_id).quantity == 11
+    
+    @pytest.mark.parametrize("write", ["update", "delete", "restock"])
+    def test_admin_write_racing_purchase_keeps_stats(self, race_db, write):
+        """
+        TEST: A purchase of 4 lands while an admin updates, deletes or restocks the sweet
+        EXPECT: The incremental statistics equal a full recompute
+        """
+        from app.inventory_stats import read_stats, recompute_stats
+        from app.routes.sweets import _delete_sweet, _restock_sweet, _update_sweet
+        from app.schemas import SweetUpdate
+        
+        writes = {
+            "update": lambda db, sweet_id: _update_sweet(db, sweet_id, SweetUpdate(price=2.0)),
+            "delete": _delete_sweet,
+            "restock": lambda db, sweet_id: _restock_sweet(db, sweet_id, 5, None),
+        }
+        self.purchase_during(race_db, writes[write], 4)
+        
+        _, SessionFactory, _ = race_db
+        with SessionFactory() as db:
+            stats = read_stats(db)
+            recompute_stats(db)
+            assert stats == read_stats(db)
+
+
+@pytest.mark.inventory
+class TestInventoryStats:
+    """Test the incrementally maintained inventory statistics"""
+    
+    def test_counters_match_recompute_after_writes(self, client, auth_headers_admin, auth_headers_user, test_sweet):
+        """
+        TEST: Create, update, purchase, check out, restock, delete and import sweets
+        EXPECT: GET /stats equals a full recompute from the sweets table
+        """
+        from app.ledger import ledger
+        
+        # Fixture rows were written around the API
+        client.post("/api/sweets/stats/recompute", headers=auth_headers_admin)
+        
+        created = client.post(
+            "/api/sweets",
+            json={"name": "Gummy Bears", "category": "gummy", "price": 1.99, "quantity": 8},
+            headers=auth_headers_admin
+        ).json()
+        toffee = client.post(
+            "/api/sweets",
+            json={"name": "Toffee Block", "category": "toffee", "price": 4.0, "quantity": 0},
+            headers=auth_headers_admin
+        ).json()
+        client.put(f"/api/sweets/{created['id']}", json={"category": "candy", "price": 2.5}, headers=auth_headers_admin)
+        client.post(f"/api/sweets/{test_sweet.id}/purchase", json={"quantity": 95}, headers=auth_headers_user)
+        client.post(
+            "/api/sweets/checkout",
+            json={"items": [{"sweet_id": test_sweet.id, "quantity": 2}, {"sweet_id": created["id"], "quantity": 8}]},
+            headers=auth_headers_user
+        )
+        client.delete(f"/api/sweets/{toffee['id']}", headers=auth_headers_admin)
+        client.post(f"/api/sweets/{toffee['id']}/restock", json={"quantity": 5}, headers=auth_headers_admin)
+        client.post(
+            "/api/sweets/import",
+            content="name,category,price,quantity\nGummy Bears,candy,3.0,40\nLollipop,candy,0.5,7\n",
+            headers={**auth_headers_admin, "Content-Type": "text/csv"}
+        )
+        # Purchase deltas are applied with the ledger batch
+        ledger.flush()
+        
+        incremental = client.get("/api/sweets/stats", headers=auth_headers_admin).json()
+        recomputed = client.post("/api/sweets/stats/recompute", headers=auth_headers_admin).json()
+        
+        assert incremental == recomputed
+        assert incremental["products"] == 4
+        assert incremental["in_stock"] == 4
+        assert incremental["low_stock"] == 3
+        assert incremental["units"] == 3 + 40 + 7 + 5
+        assert incremental["stock_value"] == round(3 * 2.99 + 40 * 3.0 + 7 * 0.5 + 5 * 4.0, 2)
+        assert [category["category"] for category in incremental["categories"]] == ["candy", "chocolate", "toffee"]
+    
+    def test_stats_read_does_not_scan_sweets(self, client, auth_headers_admin, assert_max_queries):
+        """
+        TEST: Read the statistics
+        EXPECT: One query, against category_stats only
+        """
+        client.get("/api/auth/me", headers=auth_headers_admin)
+        
+        with assert_max_queries(1) as statements:
+            response = client.get("/api/sweets/stats", headers=auth_headers_admin)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert "FROM category_stats" in statements[0]
+        assert "sweets " not in statements[0].replace("category_stats", "")
+    
+    def test_recompute_repairs_drift(self, client, auth_headers_admin, db_session):
+        """
+        TEST: Insert a sweet around the API, then recompute
+        EXPECT: The stale counters miss it until the recompute picks it up
+        """
+        from app.models import Sweet
+        
+        db_session.add(Sweet(name="Fudge", category="fudge", price=2.0, quantity=3, is_active=True))
+        db_session.commit()
+        
+        assert client.get("/api/sweets/stats", headers=auth_headers_admin).json()["products"] == 0
+        
+        response = client.post("/api/sweets/stats/recompute", headers=auth_headers_admin)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["categories"] == [{
+            "category": "fudge",
+            "products": 1,
+            "in_stock": 1,
+            "out_of_stock": 0,
+            "low_stock": 1,
+            "units": 3,
+            "stock_value": 6.0,
+            "hot_products": 0,
+        }]
+    
+    def test_purchase_stats_wait_for_ledger_batch(
+        self, client, auth_headers_admin, auth_headers_user, test_sweet, assert_max_queries
+    ):
+        """
+        TEST: Purchase in the queued ledger mode, then flush the ledger
+        EXPECT: The purchase runs one statement and leaves category_stats alone;
+                the flush applies its delta
+        """
+        from app.ledger import ledger
+        
+        client.post("/api/sweets/stats/recompute", headers=auth_headers_admin)
+        client.get("/api/sweets/search?name=warm", headers=auth_headers_user)
+        
+        with assert_max_queries(1) as statements:
+            client.post(f"/api/sweets/{test_sweet.id}/purchase", json={"quantity": 5}, headers=auth_headers_user)
+        assert not any("category_stats" in statement for statement in statements)
+        assert client.get("/api/sweets/stats", headers=auth_headers_admin).json()["units"] == 100
+        
+        ledger.flush()
+        assert client.get("/api/sweets/stats", headers=auth_headers_admin).json()["units"] == 95
+    
+    def test_startup_backfills_empty_stats(self, db_session, test_sweet):
+        """
+        TEST: Sweets inserted around the API (like seed_db.py), then the startup backfill
+        EXPECT: Empty counters are rebuilt once; filled counters are left alone
+        """
+        from app.inventory_stats import backfill_stats, read_stats
+        
+        assert read_stats(db_session)["products"] == 0
+        
+        assert backfill_stats(db_session) is True
+        db_session.commit()
+        assert read_stats(db_session)["products"] == 1
+        assert backfill_stats(db_session) is False
+    
+    def test_stats_admin_only(self, client, auth_headers_user):
+        """
+        TEST: Regular user requests the statistics or a recompute
+        EXPECT: 403 Forbidden
+        """
+        assert client.get("/api/sweets/stats", headers=auth_headers_user).status_code == status.HTTP_403_FORBIDDEN
+        assert client.post(
+            "/api/sweets/stats/recompute", headers=auth_headers_user
+        ).status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.inventory
+class TestInventoryLedger:
+    """Test the append-only inventory ledger"""
+    
+    def test_purchases_and_restocks_recorded_after_flush(
+        self, client, auth_headers_user, auth_headers_admin, test_user, test_admin, test_sweet
+    ):
+        """
+        TEST: Purchase, check out and restock in the queued ledger mode
+        EXPECT: No entries until the queue is flushed, then one per stock change
+        """
+        from app.ledger import ledger
+        
+        client.post(f"/api/sweets/{test_sweet.id}/purchase", json={"quantity": 5}, headers=auth_headers_user)
+        client.post(
+            "/api/sweets/checkout",
+            json={"items": [{"sweet_id": test_sweet.id, "quantity": 2}]},
+            headers=auth_headers_user
+        )
+        client.post(f"/api/sweets/{test_sweet.id}/restock", json={"quantity": 10}, headers=auth_headers_admin)
+        
+        assert client.get("/api/sweets/movements", headers=auth_headers_admin).json() == []
+        
+        ledger.flush()
+        response = client.get(f"/api/sweets/{test_sweet.id}/movements", headers=auth_headers_admin)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert [
+            (entry["kind"], entry["quantity"], entry["quantity_after"], entry["user_id"])
+            for entry in response.json()
+        ] == [
+            ("purchase", -5, 95, test_user.id),
+            ("purchase", -2, 93, test_user.id),
+            ("restock", 10, 103, test_admin.id),
+        ]
+    
+    def test_rejected_purchase_not_recorded(self, client, auth_headers_user, auth_headers_admin, test_sweet):
+        """
+        TEST: Check out a cart whose second line cannot be filled
+        EXPECT: The rolled back first line leaves no ledger entry
+        """
+        from app.ledger import ledger
+        
+        response = client.post(
+            "/api/sweets/checkout",
+            json={"items": [{"sweet_id": test_sweet.id, "quantity": 1}, {"sweet_id": 9999, "quantity": 1}]},
+            headers=auth_headers_user
+        )
+        ledger.flush()
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert client.get("/api/sweets/movements", headers=auth_headers_admin).json() == []
+    
+    def test_sync_mode_writes_in_purchase_transaction(
+        self, client, auth_headers_user, auth_headers_admin, test_sweet, monkeypatch, assert_max_queries
+    ):
+        """
+        TEST: Purchase in the sync ledger mode
+        EXPECT: The entry is inserted by the purchase request itself, before any flush
+        """
+        from app.ledger import ledger
+        
+        monkeypatch.setattr(ledger, "mode", "sync")
+        client.post(f"/api/sweets/{test_sweet.id}/purchase", json={"quantity": 1}, headers=auth_headers_user)
+        
+        with assert_max_queries(3) as statements:
+            client.post(f"/api/sweets/{test_sweet.id}/purchase", json={"quantity": 1}, headers=auth_headers_user)
+        
+        assert any(statement.startswith("INSERT INTO inventory_movements") for statement in statements)
+        assert len(client.get("/api/sweets/movements", headers=auth_headers_admin).json()) == 2
+    
+    def test_full_queue_falls_back_to_sync(self, client, auth_headers_user, auth_headers_admin, test_sweet, monkeypatch):
+        """
+        TEST: Purchase twice with room for one queued transaction
+        EXPECT: The second purchase writes its entry directly; nothing is lost
+        """
+        import queue
+        from app.ledger import ledger
+        
+        monkeypatch.setattr(ledger, "_queue", queue.Queue(maxsize=1))
+        for _ in range(2):
+            client.post(f"/api/sweets/{test_sweet.id}/purchase", json={"quantity": 1}, headers=auth_headers_user)
+        
+        assert [entry["quantity_after"] for entry in client.get(
+            "/api/sweets/movements", headers=auth_headers_admin
+        ).json()] == [98]
+        
+        ledger.flush()
+        assert len(client.get("/api/sweets/movements", headers=auth_headers_admin).json()) == 2
+    
+    def test_background_writer_batches(self, tmp_path):
+        """
+        TEST: Commit seven single-entry transactions with a batch size of three
+        EXPECT: The writer thread inserts batches of 3 and 3; flush writes the last one
+        """
+        from sqlalchemy import create_engine, func
+        from sqlalchemy.orm import sessionmaker
+        from app.database import Base
+        from app.ledger import InventoryLedger, movement
+        from app.models import InventoryMovement, MovementKind, Sweet
+        
+        engine = create_engine(f"sqlite:///{tmp_path / 'ledger.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        writer = InventoryLedger(batch_size=3, flush_seconds=30, session_factory=SessionFactory)
+        
+        batches = []
+        write = writer._write
+        writer._write = lambda rows, stats: (batches.append(len(rows)), write(rows, stats))
+        
+        sweet = Sweet(id=1, quantity=7)
+        for _ in range(7):
+            with SessionFactory() as db:
+                writer.record(db, [movement(sweet, MovementKind.PURCHASE, -1, None)])
+                db.commit()
+        writer.flush()
+        
+        with SessionFactory() as db:
+            assert db.query(func.count(InventoryMovement.id)).scalar() == 7
+        assert batches == [3, 3, 1]
+        
+        writer.close()
+        engine.dispose()
+    
+    def test_movements_time_range_and_cursor(self, client, auth_headers_admin, test_sweet, db_session):
+        """
+        TEST: Page through a time range of ledger entries two at a time
+        EXPECT: Only entries inside the range, oldest first, without gaps or repeats
+        """
+        from datetime import datetime, timedelta
+        from sqlalchemy import insert
+        from app.models import InventoryMovement, MovementKind
+        
+        start = datetime(2024, 3, 1, 12, 0)
+        db_session.execute(insert(InventoryMovement), [
+            {
+                "sweet_id": test_sweet.id,
+                "kind": MovementKind.PURCHASE,
+                "quantity": -1,
+                "quantity_after": 100 - i,
+                "created_at": start + timedelta(minutes=i // 2),
+            }
+            for i in range(10)
+        ])
+        db_session.commit()
+        
+        params = {"since": "2024-03-01T12:01:00Z", "until": "2024-03-01T12:04:00Z", "limit": 2}
+        seen = []
+        while True:
+            response = client.get("/api/sweets/movements", params=params, headers=auth_headers_admin)
+            assert response.status_code == status.HTTP_200_OK
+            seen.extend(entry["quantity_after"] for entry in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            params["cursor"] = cursor
+        
+        assert seen == [98, 97, 96, 95, 94, 93]
+    
+    def test_movements_admin_only(self, client, auth_headers_user, test_sweet):
+        """
+        TEST: Regular user requests ledger entries
+        EXPECT: 403 Forbidden
+        """
+        assert client.get("/api/sweets/movements", headers=auth_headers_user).status_code == status.HTTP_403_FORBIDDEN
+        assert client.get(
+            f"/api/sweets/{test_sweet.id}/movements", headers=auth_headers_user
+        ).status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.inventory
+class TestHotStock:
+    """Test sharded stock slots for hot sweets"""
+    
+    def test_enable_spreads_quantity_over_slots(self, client, auth_headers_admin, test_sweet, db_session):
+        """
+        TEST: Put a sweet with 100 units in hot mode with 3 slots
+        EXPECT: Slots hold 34/33/33, the sweet reports 3 slots and its quantity
+        """
+        from app.models import StockSlot
+        
+        response = client.put(
+            f"/api/sweets/{test_sweet.id}/stock-slots", json={"slots": 3}, headers=auth_headers_admin
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["stock_slots"] == 3
+        assert response.json()["quantity"] == 100
+        slots = db_session.query(StockSlot).filter(StockSlot.sweet_id == test_sweet.id).order_by(StockSlot.slot).all()
+        assert [slot.quantity for slot in slots] == [34, 33, 33]
+    
+    def test_purchase_never_writes_sweet_quantity(
+        self, client, auth_headers_admin, auth_headers_user, test_sweet, db_session, assert_max_queries
+    ):
+        """
+        TEST: Purchase a hot sweet
+        EXPECT: Units come off a slot, not the sweet's quantity or the category counters; the row
+                only gets a delta sync stamp; reads show the live total
+        """
+        from app.models import Sweet
+        
+        client.post("/api/sweets/stats/recompute", headers=auth_headers_admin)
+        client.put(f"/api/sweets/{test_sweet.id}/stock-slots", json={"slots": 4}, headers=auth_headers_admin)
+        client.get("/api/sweets/search?name=warm", headers=auth_headers_user)
+        
+        with assert_max_queries(5) as statements:
+            response = client.post(
+                f"/api/sweets/{test_sweet.id}/purchase", json={"quantity": 3}, headers=auth_headers_user
+            )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["sweet"]["quantity"] == 97
+        assert any(statement.startswith("UPDATE sweet_stock_slots") for statement in statements)
+        assert sum(statement.startswith("UPDATE sweets SET updated_at=") for statement in statements) == 1
+        assert not any("category_stats" in statement for statement in statements)
+        db_session.expire_all()
+        assert db_session.get(Sweet, test_sweet.id).quantity == 100
+        
+        assert client.get(f"/api/sweets/{test_sweet.id}", headers=auth_headers_user).json()["quantity"] == 97
+        listed = client.get("/api/sweets", headers=auth_headers_user).json()
+        assert [sweet["quantity"] for sweet in listed] == [97]
+        stats = client.get("/api/sweets/stats", headers=auth_headers_admin).json()
+        assert (stats["units"], stats["hot_products"]) == (97, 1)
+    
+    def test_purchase_larger_than_any_slot(self, client, auth_headers_admin, auth_headers_user, db_session):
+        """
+        TEST: Buy 9 of 10 units spread over 4 slots, then 2 more
+        EXPECT: The first purchase drains several slots; the second is refused with the live stock
+        """
+        from app.models import Sweet
+        
+        sweet = Sweet(name="Flash Fudge", category="fudge", price=1.0, quantity=10)
+        db_session.add(sweet)
+        db_session.commit()
+        client.put(f"/api/sweets/{sweet.id}/stock-slots", json={"slots": 4}, headers=auth_headers_admin)
+        
+        first = client.post(f"/api/sweets/{sweet.id}/purchase", json={"quantity": 9}, headers=auth_headers_user)
+        second = client.post(f"/api/sweets/{sweet.id}/purchase", json={"quantity": 2}, headers=auth_headers_user)
+        
+        assert first.status_code == status.HTTP_200_OK
+        assert first.json()["sweet"]["quantity"] == 1
+        assert second.status_code == status.HTTP_400_BAD_REQUEST
+        assert second.json()["detail"] == "Insufficient stock. Available: 1, Requested: 2"
+    
+    def test_sold_out_hot_sweet_leaves_in_stock_lists(self, client, auth_headers_admin, auth_headers_user, db_session):
+        """
+        TEST: Sell out a hot sweet, restock it, then leave hot mode
+        EXPECT: Hidden from in-stock lists while empty; restock and leaving keep the total
+        """
+        from app.models import StockSlot, Sweet
+        
+        sweet = Sweet(name="Flash Toffee", category="toffee", price=2.0, quantity=4)
+        db_session.add(sweet)
+        db_session.commit()
+        client.post("/api/sweets/stats/recompute", headers=auth_headers_admin)
+        client.put(f"/api/sweets/{sweet.id}/stock-slots", json={"slots": 2}, headers=auth_headers_admin)
+        client.post(f"/api/sweets/{sweet.id}/purchase", json={"quantity": 4}, headers=auth_headers_user)
+        
+        assert client.get("/api/sweets", params={"in_stock_only": True}, headers=auth_headers_user).json() == []
+        assert client.get("/api/sweets/search", params={"name": "Flash"}, headers=auth_headers_user).json() == []
+        assert client.get("/api/sweets/stats", headers=auth_headers_admin).json()["out_of_stock"] == 1
+        
+        restocked = client.post(f"/api/sweets/{sweet.id}/restock", json={"quantity": 5}, headers=auth_headers_admin)
+        assert restocked.json()["sweet"]["quantity"] == 5
+        assert [slot.quantity for slot in db_session.query(StockSlot).order_by(StockSlot.slot)] == [3, 2]
+        
+        response = client.put(f"/api/sweets/{sweet.id}/stock-slots", json={"slots": 0}, headers=auth_headers_admin)
+        assert (response.json()["stock_slots"], response.json()["quantity"]) == (0, 5)
+        assert db_session.query(StockSlot).count() == 0
+        
+        incremental = client.get("/api/sweets/stats", headers=auth_headers_admin).json()
+        assert incremental == client.post("/api/sweets/stats/recompute", headers=auth_headers_admin).json()
+        assert (incremental["units"], incremental["hot_products"]) == (5, 0)
+    
+    def test_concurrent_hot_purchases_never_oversell(self, tmp_path):
+        """
+        TEST: Many threads buy from one hot sweet with limited stock
+        EXPECT: Exactly the available stock is sold across the slots
+        """
+        import threading
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from app.database import Base
+        from app.inventory import decrement_stock
+        from app.models import StockSlot, Sweet
+        from app.stock_slots import fill_slots
+        
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'hot.db'}",
+            connect_args={"check_same_thread": False, "timeout": 30},
+        )
+        Base.metadata.create_all(bind=engine)
+        SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        
+        with SessionFactory() as db:
+            sweet = Sweet(name="Hot Sweet", category="candy", price=1.0, quantity=50, stock_slots=4)
+            db.add(sweet)
+            db.flush()
+            fill_slots(db, sweet.id, 4, 50)
+            db.commit()
+            sweet_id = sweet.id
+        
+        sold = []
+        
+        def buyer():
+            with SessionFactory() as db:
+                for _ in range(10):
+                    if decrement_stock(db, sweet_id, 1) is not None:
+                        sold.append(1)
+                    db.commit()
+        
+        threads = [threading.Thread(target=buyer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        with SessionFactory() as db:
+            assert db.query(StockSlot).filter(StockSlot.quantity != 0).count() == 0
+            assert db.get(Sweet, sweet_id).quantity == 50
+        assert len(sold) == 50
+        engine.dispose()
+
+
+@pytest.mark.inventory
+class TestStockReservations:
+    """Test time-limited stock holds for checkout"""
+    
+    def reserve(self, client, headers, sweet_id, quantity, **body):
+        return client.post(f"/api/sweets/{sweet_id}/reserve", json={"quantity": quantity, **body}, headers=headers)
+    
+    def test_reserve_then_confirm(self, client, auth_headers_user, auth_headers_admin, test_user, test_sweet):
+        """
+        TEST: Reserve 5 units, then confirm the hold twice
+        EXPECT: Stock drops at reserve time; the first confirm records the purchase, the second conflicts
+        """
+        from datetime import datetime, timedelta, timezone
+        from app.ledger import ledger
+        
+        response = self.reserve(client, auth_headers_user, test_sweet.id, 5, ttl_seconds=120)
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        hold = response.json()
+        assert (hold["sweet_id"], hold["quantity"], hold["status"]) == (test_sweet.id, 5, "held")
+        expires_at = datetime.fromisoformat(hold["expires_at"])
+        assert timedelta(seconds=110) < expires_at - datetime.now(timezone.utc) <= timedelta(seconds=120)
+        assert client.get(f"/api/sweets/{test_sweet.id}", headers=auth_headers_user).json()["quantity"] == 95
+        
+        confirmed = client.post(f"/api/sweets/reservations/{hold['id']}/confirm", headers=auth_headers_user)
+        again = client.post(f"/api/sweets/reservations/{hold['id']}/confirm", headers=auth_headers_user)
+        
+        assert confirmed.status_code == status.HTTP_200_OK
+        assert confirmed.json()["status"] == "confirmed"
+        assert again.status_code == status.HTTP_409_CONFLICT
+        assert again.json()["detail"] == f"Reservation {hold['id']} is already confirmed"
+        assert client.get(f"/api/sweets/{test_sweet.id}", headers=auth_headers_user).json()["quantity"] == 95
+        ledger.flush()
+        entries = client.get(f"/api/sweets/{test_sweet.id}/movements", headers=auth_headers_admin).json()
+        assert [(entry["kind"], entry["quantity"], entry["user_id"]) for entry in entries] == [
+            ("purchase", -5, test_user.id)
+        ]
+    
+    def test_release_returns_stock(self, client, auth_headers_user, auth_headers_admin, test_sweet):
+        """
+        TEST: Reserve, then release the hold
+        EXPECT: Stock and statistics are back where they started; nothing enters the ledger
+        """
+        from app.ledger import ledger
+        
+        client.post("/api/sweets/stats/recompute", headers=auth_headers_admin)
+        hold = self.reserve(client, auth_headers_user, test_sweet.id, 30).json()
+        
+        response = client.post(f"/api/sweets/reservations/{hold['id']}/release", headers=auth_headers_user)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["status"] == "released"
+        assert client.get(f"/api/sweets/{test_sweet.id}", headers=auth_headers_user).json()["quantity"] == 100
+        ledger.flush()
+        stats = client.get("/api/sweets/stats", headers=auth_headers_admin).json()
+        assert stats == client.post("/api/sweets/stats/recompute", headers=auth_headers_admin).json()
+        assert stats["units"] == 100
+        ledger.flush()
+        assert client.get("/api/sweets/movements", headers=auth_headers_admin).json() == []
+        
+        confirm = client.post(f"/api/sweets/reservations/{hold['id']}/confirm", headers=auth_headers_user)
+        assert confirm.status_code == status.HTTP_409_CONFLICT
+    
+    def test_reserve_rejections(self, client, auth_headers_user, auth_headers_admin, test_sweet):
+        """
+        TEST: Reserve more than the stock, and close another user's hold
+        EXPECT: 400 with the available stock, and 404 for the other user
+        """
+        too_many = self.reserve(client, auth_headers_user, test_sweet.id, 101)
+        hold = self.reserve(client, auth_headers_user, test_sweet.id, 1).json()
+        foreign = client.post(f"/api/sweets/reservations/{hold['id']}/release", headers=auth_headers_admin)
+        
+        assert too_many.status_code == status.HTTP_400_BAD_REQUEST
+        assert too_many.json()["detail"] == "Insufficient stock. Available: 100, Requested: 101"
+        assert foreign.status_code == status.HTTP_404_NOT_FOUND
+        assert client.get(f"/api/sweets/{test_sweet.id}", headers=auth_headers_user).json()["quantity"] == 99
+    
+    def test_expired_holds_swept_in_batches(self, client, auth_headers_user, auth_headers_admin, test_sweet):
+        """
+        TEST: Let five holds expire, sweeping two per transaction
+        EXPECT: Nothing happens before they are due; then all return to stock and can no longer be confirmed
+        """
+        from datetime import datetime, timedelta, timezone
+        from app.ledger import ledger
+        from app.reservations import reservation_expiry
+        
+        client.post("/api/sweets/stats/recompute", headers=auth_headers_admin)
+        holds = [self.reserve(client, auth_headers_user, test_sweet.id, 4, ttl_seconds=60).json() for _ in range(5)]
+        kept = self.reserve(client, auth_headers_user, test_sweet.id, 3, ttl_seconds=600).json()
+        now = datetime.now(timezone.utc)
+        
+        assert reservation_expiry.run_due(now) == 0
+        reservation_expiry.batch_size = 2
+        try:
+            assert reservation_expiry.run_due(now + timedelta(seconds=61)) == 5
+        finally:
+            reservation_expiry.batch_size = 500
+        
+        assert client.get(f"/api/sweets/{test_sweet.id}", headers=auth_headers_user).json()["quantity"] == 97
+        ledger.flush()
+        stats = client.get("/api/sweets/stats", headers=auth_headers_admin).json()
+        assert stats == client.post("/api/sweets/stats/recompute", headers=auth_headers_admin).json()
+        
+        expired = client.post(f"/api/sweets/reservations/{holds[0]['id']}/confirm", headers=auth_headers_user)
+        assert expired.status_code == status.HTTP_410_GONE
+        assert client.post(
+            f"/api/sweets/reservations/{kept['id']}/confirm", headers=auth_headers_user
+        ).status_code == status.HTTP_200_OK
+    
+    def test_ttl_capped(self, client, auth_headers_user, test_sweet):
+        """
+        TEST: Ask for a hold far longer than RESERVATION_MAX_TTL_SECONDS
+        EXPECT: The hold expires at the cap
+        """
+        from datetime import datetime, timedelta, timezone
+        from app.config import settings
+        
+        hold = self.reserve(client, auth_headers_user, test_sweet.id, 1, ttl_seconds=10 ** 7).json()
+        
+        remaining = datetime.fromisoformat(hold["expires_at"]) - datetime.now(timezone.utc)
+        assert remaining <= timedelta(seconds=settings.RESERVATION_MAX_TTL_SECONDS)
+    
+    def test_sweeper_thread_wakes_at_expiry(self, tmp_path):
+        """
+        TEST: Schedule a hold that expires shortly with the background sweeper running
+        EXPECT: The sweeper wakes on its own and returns the units to stock
+        """
+        import time
+        from datetime import datetime, timedelta, timezone
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from app.database import Base
+        from app.models import ReservationStatus, StockReservation, Sweet
+        from app.reservations import ReservationExpiry
+        
+        engine = create_engine(f"sqlite:///{tmp_path / 'holds.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        expiry = ReservationExpiry(session_factory=SessionFactory)
+        
+        with SessionFactory() as db:
+            sweet = Sweet(name="Held Sweet", category="candy", price=1.0, quantity=6)
+            db.add(sweet)
+            db.flush()
+            hold = StockReservation(
+                sweet_id=sweet.id, user_id=1, quantity=4,
+                expires_at=datetime.now(timezone.utc) + timedelta(seconds=0.2)
+            )
+            db.add(hold)
+            db.commit()
+            sweet_id, hold_id = sweet.id, hold.id
+        
+        try:
+            expiry.schedule(hold.expires_at, hold_id)
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                with SessionFactory() as db:
+                    if db.get(StockReservation, hold_id).status == ReservationStatus.EXPIRED:
+                        break
+                time.sleep(0.05)
+        finally:
+            expiry.close()
+        
+        with SessionFactory() as db:
+            assert db.get(StockReservation, hold_id).status == ReservationStatus.EXPIRED
+            assert db.get(Sweet, sweet_id).quantity == 10
+        engine.dispose()
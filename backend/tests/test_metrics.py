@@ -0,0 +1,131 @@
+"""
+Tests for the Prometheus metrics middleware and /metrics endpoint
+"""
+import os
+import subprocess
+import sys
+import pytest
+from fastapi import status
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.integration
+class TestMetricsEndpoint:
+    """Test request metrics and GET /metrics"""
+    
+    def test_requests_counted_by_route_template(self, client, test_sweet, auth_headers_user):
+        """
+        TEST: Get one sweet twice, then scrape /metrics
+        EXPECT: Both requests counted under the route template with DB time and statements observed
+        """
+        labels = {"method": "GET", "route": "/api/sweets/{sweet_id}"}
+        before = sample("http_requests_total", status="200", **labels)
+        db_before = sample("http_request_db_seconds_count", **labels)
+        statements_before = sample("http_request_db_statements_sum", **labels)
+        
+        for _ in range(2):
+            client.get(f"/api/sweets/{test_sweet.id}", headers=auth_headers_user)
+        
+        assert sample("http_requests_total", status="200", **labels) == before + 2
+        assert sample("http_request_db_seconds_count", **labels) == db_before + 2
+        assert sample("http_request_db_seconds_sum", **labels) > 0
+        assert sample("http_request_db_statements_sum", **labels) > statements_before
+        
+        response = client.get("/metrics")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/api/sweets/{sweet_id}"}' in response.text
+    
+    def test_unknown_paths_share_one_series(self, client, db_session):
+        """
+        TEST: Request two paths that match no route
+        EXPECT: Both counted as route="unmatched" with status 404
+        """
+        before = sample("http_requests_total", method="GET", route="unmatched", status="404")
+        
+        client.get("/no/such/path")
+        client.get("/another/missing/path")
+        
+        assert sample("http_requests_total", method="GET", route="unmatched", status="404") == before + 2
+    
+    def test_login_records_bcrypt_time(self, client, test_user):
+        """
+        TEST: Log in
+        EXPECT: One bcrypt verify observed
+        """
+        before = sample("password_hash_seconds_count", operation="verify")
+        
+        client.post("/api/auth/login", data={"username": "testuser@example.com", "password": "TestPassword123!"})
+        
+        assert sample("password_hash_seconds_count", operation="verify") == before + 1
+    
+    def test_inventory_counters(self, client, test_sweet, auth_headers_user, auth_headers_admin):
+        """
+        TEST: Purchase, restock, then ask for more than is in stock
+        EXPECT: Purchase, restock and rejection counters move by those amounts
+        """
+        purchases = sample("inventory_purchases_total")
+        sold = sample("inventory_units_sold_total")
+        restocked = sample("inventory_units_restocked_total")
+        rejected = sample("inventory_purchase_rejections_total", reason="insufficient_stock")
+        
+        client.post(f"/api/sweets/{test_sweet.id}/purchase", json={"quantity": 3}, headers=auth_headers_user)
+        client.post(f"/api/sweets/{test_sweet.id}/restock", json={"quantity": 5}, headers=auth_headers_admin)
+        client.post(f"/api/sweets/{test_sweet.id}/purchase", json={"quantity": 1000}, headers=auth_headers_user)
+        
+        assert sample("inventory_purchases_total") == purchases + 1
+        assert sample("inventory_units_sold_total") == sold + 3
+        assert sample("inventory_units_restocked_total") == restocked + 5
+        assert sample("inventory_purchase_rejections_total", reason="insufficient_stock") == rejected + 1
+
+
+@pytest.mark.integration
+class TestMultiprocessMetrics:
+    """Metrics aggregate across worker processes"""
+    
+    def test_scrape_sums_all_workers(self, tmp_path):
+        """
+        TEST: Two worker processes serve /health 3 and 4 times, a third scrapes
+        EXPECT: The scrape reports 7 requests
+        """
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{tmp_path / 'metrics.db'}",
+            "SECRET_KEY": "test-secret-key",
+            "ENVIRONMENT": "test",
+            "PROMETHEUS_MULTIPROC_DIR": str(tmp_path),
+        }
+        worker = (
+            "import sys\n"
+            "from fastapi.testclient import TestClient\n"
+            "from app.main import app\n"
+            "client = TestClient(app)\n"
+            "for _ in range(int(sys.argv[1])):\n"
+            "    client.get('/health')\n"
+        )
+        scrape = (
+            "from app.metrics import metrics_response\n"
+            "print(metrics_response().body.decode())\n"
+        )
+        for requests in (3, 4):
+            subprocess.run([sys.executable, "-c", worker, str(requests)], cwd=BACKEND_DIR, env=env, check=True, timeout=60)
+        
+        output = subprocess.run(
+            [sys.executable, "-c", scrape],
+            cwd=BACKEND_DIR, env=env, check=True, timeout=60, capture_output=True, text=True
+        ).stdout
+        
+        totals = {
+            metric_sample.labels["route"]: metric_sample.value
+            for family in text_string_to_metric_families(output)
+            for metric_sample in family.samples
+            if metric_sample.name == "http_requests_total"
+        }
+        assert totals["/health"] == 7
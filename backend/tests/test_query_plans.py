@@ -0,0 +1,322 @@
+"""
+Query plan tests for the catalog's hot queries, ledger reads and the
+reservation expiry sweep
+
+Each test drives a real endpoint, captures the SQL it sends for the
+table under test and runs EXPLAIN QUERY PLAN on it with the same
+parameters. A plan that falls back to a full table scan ("SCAN sweets"
+without an index) fails the test, as does a migration history that
+drifts from the models.
+"""
+import pytest
+from fastapi import status
+from sqlalchemy import event, insert, text
+from app.models import Sweet
+from tests.conftest import engine
+
+
+@pytest.fixture
+def catalog(db_session):
+    """A catalog with in-stock, sold-out and inactive sweets"""
+    db_session.execute(insert(Sweet), [
+        {
+            "name": f"Sweet {i}",
+            "category": ("chocolate", "gummy", "toffee")[i % 3],
+            "price": 0.5 + i % 20,
+            "quantity": i % 4,
+            "is_active": i % 10 != 0,
+        }
+        for i in range(300)
+    ])
+    db_session.commit()
+    
+    # SQLite breaks the cost tie between the partial indexes on id in
+    # favour of the newest one. create_all emits indexes in set order, so
+    # rebuild the in-stock index last, as migration 0003 does
+    in_stock_index = next(index for index in Sweet.__table__.indexes if index.name == "ix_sweets_in_stock")
+    in_stock_index.drop(db_session.connection())
+    in_stock_index.create(db_session.connection())
+    db_session.commit()
+
+
+def capture_plans(table: str):
+    """Record (statement, plan lines) for every statement touching a table"""
+    captured = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and f" {table}" in statement and not statement.startswith("EXPLAIN"):
+            captured.append((statement, parameters))
+    
+    event.listen(engine, "before_cursor_execute", capture)
+    
+    def plans():
+        event.remove(engine, "before_cursor_execute", capture)
+        with engine.connect() as conn:
+            return [
+                (statement, [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)])
+                for statement, parameters in captured
+            ]
+    
+    yield plans
+    if event.contains(engine, "before_cursor_execute", capture):
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+@pytest.fixture
+def sweets_plans():
+    yield from capture_plans("sweets")
+
+
+@pytest.fixture
+def movement_plans():
+    yield from capture_plans("inventory_movements")
+
+
+@pytest.fixture
+def reservation_plans():
+    yield from capture_plans("stock_reservations")
+
+
+def assert_indexed(plans, expected: str, table: str = "sweets"):
+    """No statement scans the whole table, and one uses the expected access path"""
+    assert plans, f"no statements on {table} were captured"
+    for statement, plan in plans:
+        assert f"SCAN {table}" not in plan, f"full table scan:\n{statement}\n{plan}"
+    assert any(expected in line for _, plan in plans for line in plan), \
+        f"{expected!r} not used:\n" + "\n".join(f"{statement}\n{plan}" for statement, plan in plans)
+
+
+@pytest.mark.integration
+class TestCatalogQueryPlans:
+    """Hot catalog queries must be answered from an index"""
+    
+    def test_list_active(self, client, auth_headers_user, catalog, sweets_plans):
+        """
+        TEST: Get all sweets
+        EXPECT: Walks the active-sweets partial index in ID order
+        """
+        client.get("/api/sweets", headers=auth_headers_user)
+        assert_indexed(sweets_plans(), "ix_sweets_active")
+    
+    def test_list_cursor_page(self, client, auth_headers_user, catalog, sweets_plans):
+        """
+        TEST: Get the page after a cursor
+        EXPECT: Seeks into the active-sweets index past the cursor
+        """
+        from app.pagination import encode_cursor
+        
+        client.get("/api/sweets", params={"cursor": encode_cursor(150)}, headers=auth_headers_user)
+        assert_indexed(sweets_plans(), "USING INDEX ix_sweets_active (id>?)")
+    
+    def test_changes_since_cursor(self, client, auth_headers_user, db_session, catalog, sweets_plans):
+        """
+        TEST: Sync the changes after a cursor
+        EXPECT: Seeks the (updated_at, id) index, already in result order
+        """
+        from app.pagination import encode_time_cursor
+        
+        sweet = db_session.get(Sweet, 150)
+        client.get(
+            "/api/sweets/changes",
+            params={"limit": 100, "since": encode_time_cursor(sweet.updated_at, sweet.id)},
+            headers=auth_headers_user
+        )
+        plans = sweets_plans()
+        assert_indexed(plans, "USING INDEX ix_sweets_updated")
+        assert not any("TEMP B-TREE" in line for _, plan in plans for line in plan)
+    
+    def test_list_in_stock(self, client, auth_headers_user, catalog, sweets_plans):
+        """
+        TEST: Get in-stock sweets only
+        EXPECT: Uses the in-stock partial index
+        """
+        client.get("/api/sweets", params={"in_stock_only": True}, headers=auth_headers_user)
+        assert_indexed(sweets_plans(), "ix_sweets_in_stock")
+    
+    def test_search_price_range(self, client, auth_headers_user, catalog, sweets_plans):
+        """
+        TEST: Search in-stock sweets by price range
+        EXPECT: Range seek on the in-stock price index
+        """
+        client.get("/api/sweets/search", params={"min_price": 3, "max_price": 4}, headers=auth_headers_user)
+        assert_indexed(sweets_plans(), "USING INDEX ix_sweets_in_stock_price (price>? AND price<?)")
+    
+    def test_search_by_name(self, client, auth_headers_user, catalog, sweets_plans):
+        """
+        TEST: Search sweets by name substring
+        EXPECT: Rows fetched by primary key from the search index matches
+        """
+        client.get("/api/sweets/search", params={"name": "Sweet 12"}, headers=auth_headers_user)
+        assert_indexed(sweets_plans(), "USING INTEGER PRIMARY KEY")
+    
+    def test_get_sweet(self, client, auth_headers_user, catalog, sweets_plans):
+        """
+        TEST: Get a sweet by ID
+        EXPECT: Primary key lookup
+        """
+        client.get("/api/sweets/5", headers=auth_headers_user)
+        assert_indexed(sweets_plans(), "USING INTEGER PRIMARY KEY")
+    
+    def test_purchase(self, client, auth_headers_user, catalog, sweets_plans):
+        """
+        TEST: Purchase a sweet
+        EXPECT: The conditional UPDATE finds the row by primary key
+        """
+        response = client.post("/api/sweets/3/purchase", json={"quantity": 1}, headers=auth_headers_user)
+        assert response.status_code == status.HTTP_200_OK
+        assert_indexed(sweets_plans(), "USING INTEGER PRIMARY KEY")
+    
+    def test_import_lookup(self, client, auth_headers_admin, catalog, sweets_plans):
+        """
+        TEST: Import rows for existing sweets
+        EXPECT: The natural-key lookup seeks the name/category index
+        """
+        response = client.post(
+            "/api/sweets/import",
+            content="name,category,price,quantity\nSweet 7,gummy,1.0,5\nSweet 8,toffee,1.0,5\n",
+            headers={**auth_headers_admin, "Content-Type": "text/csv"}
+        )
+        assert response.json()["updated"] == 2
+        assert_indexed(sweets_plans(), "INDEX ix_sweets_name_category (name=?)")
+
+
+@pytest.mark.integration
+class TestLedgerQueryPlans:
+    """Ledger reads must seek an index in (created_at, id) order"""
+    
+    @pytest.fixture
+    def movements(self, db_session, test_sweet):
+        from datetime import datetime, timedelta
+        from app.models import InventoryMovement, MovementKind
+        
+        start = datetime(2024, 3, 1)
+        db_session.execute(insert(InventoryMovement), [
+            {
+                "sweet_id": test_sweet.id if i % 10 == 0 else 1000 + i % 7,
+                "kind": MovementKind.PURCHASE,
+                "quantity": -1,
+                "quantity_after": 0,
+                "created_at": start + timedelta(minutes=i),
+            }
+            for i in range(300)
+        ])
+        db_session.commit()
+        return test_sweet
+    
+    def test_by_sweet(self, client, auth_headers_admin, movements, movement_plans):
+        """
+        TEST: Get one sweet's entries in a time range
+        EXPECT: Seeks the per-sweet index, already in result order
+        """
+        client.get(
+            f"/api/sweets/{movements.id}/movements",
+            params={"since": "2024-03-01T01:00:00"},
+            headers=auth_headers_admin
+        )
+        plans = movement_plans()
+        assert_indexed(plans, "ix_inventory_movements_sweet_created (sweet_id=? AND created_at>?)", "inventory_movements")
+        assert not any("TEMP B-TREE" in line for _, plan in plans for line in plan)
+    
+    def test_time_range_page(self, client, auth_headers_admin, movements, movement_plans):
+        """
+        TEST: Get the page after a cursor within a time range
+        EXPECT: Range seek on the time index, already in result order
+        """
+        from datetime import datetime
+        from app.pagination import encode_time_cursor
+        
+        client.get(
+            "/api/sweets/movements",
+            params={"until": "2024-03-01T04:00:00", "cursor": encode_time_cursor(datetime(2024, 3, 1, 2), 120)},
+            headers=auth_headers_admin
+        )
+        plans = movement_plans()
+        assert_indexed(plans, "ix_inventory_movements_created (created_at>? AND created_at<?)", "inventory_movements")
+        assert not any("TEMP B-TREE" in line for _, plan in plans for line in plan)
+
+
+@pytest.mark.integration
+class TestReservationQueryPlans:
+    """The reservation expiry sweep must seek the (status, expires_at) index"""
+    
+    @pytest.fixture
+    def reservations(self, db_session, test_user, test_sweet):
+        from datetime import datetime, timedelta, timezone
+        from app.models import ReservationStatus, StockReservation
+        
+        start = datetime(2024, 3, 1, tzinfo=timezone.utc)
+        db_session.execute(insert(StockReservation), [
+            {
+                "sweet_id": test_sweet.id,
+                "user_id": test_user.id,
+                "quantity": 1,
+                "status": ReservationStatus.HELD if i % 3 == 0 else ReservationStatus.CONFIRMED,
+                "expires_at": start + timedelta(minutes=i),
+            }
+            for i in range(300)
+        ])
+        db_session.commit()
+        return start
+    
+    def test_expiry_sweep(self, reservations, reservation_plans):
+        """
+        TEST: Sweep the due holds out of mostly closed and future reservations
+        EXPECT: Every statement on stock_reservations seeks an index
+        """
+        from datetime import timedelta
+        from app.reservations import reservation_expiry
+        
+        reservation_expiry.schedule(reservations)
+        assert reservation_expiry.run_due(reservations + timedelta(minutes=30)) == 11
+        assert_indexed(
+            reservation_plans(), "ix_stock_reservations_status_expires (status=? AND expires_at<?)", "stock_reservations"
+        )
+
+
+@pytest.mark.integration
+class TestMigrations:
+    """The migration history must build the schema the models describe"""
+    
+    def test_upgrade_matches_models_and_downgrades(self, tmp_path):
+        """
+        TEST: Upgrade an empty database to head, compare, then downgrade to base
+        EXPECT: No differences from Base.metadata; downgrade leaves no tables
+        """
+        from alembic import command
+        from alembic.autogenerate import compare_metadata
+        from alembic.config import Config
+        from alembic.migration import MigrationContext
+        from sqlalchemy import create_engine, inspect
+        from app.database import Base
+        
+        migrations_engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+        config = Config("alembic.ini")
+        config.attributes["configure_logger"] = False
+        
+        with migrations_engine.begin() as connection:
+            config.attributes["connection"] = connection
+            command.upgrade(config, "head")
+        
+        with migrations_engine.connect() as connection:
+            diffs = compare_metadata(MigrationContext.configure(connection), Base.metadata)
+            partial_indexes = {
+                row[0]: row[1] for row in connection.execute(
+                    text("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql LIKE '%WHERE%'")
+                )
+            }
+            triggers = set(connection.scalars(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")))
+        
+        # The FTS5 shadow tables are managed outside the metadata
+        diffs = [diff for diff in diffs if not (diff[0] == "remove_table" and diff[1].name.startswith("sweets_fts"))]
+        assert diffs == []
+        assert set(partial_indexes) == {
+            "ix_sweets_active", "ix_sweets_in_stock", "ix_sweets_in_stock_price", "ix_sweets_hot"
+        }
+        assert triggers == {"sweets_fts_insert", "sweets_fts_delete", "sweets_fts_update"}
+        
+        with migrations_engine.begin() as connection:
+            config.attributes["connection"] = connection
+            command.downgrade(config, "base")
+        
+        assert inspect(migrations_engine).get_table_names() == ["alembic_version"]
+        migrations_engine.dispose()
@@ -0,0 +1,99 @@
+"""
+Application startup tests
+
+Each test runs in a fresh interpreter, since the module under test is
+the import of app.main itself.
+"""
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(code: str, database_url: str, **env) -> dict:
+    """Run code in a fresh interpreter and return the JSON it prints"""
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR,
+        env={
+            **os.environ,
+            "DATABASE_URL": database_url,
+            "SECRET_KEY": "test-secret-key",
+            "ENVIRONMENT": "test",
+            **env,
+        },
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.integration
+class TestStartup:
+    """Importing the app is free of database work; the lifespan does it"""
+    
+    def test_import_does_not_touch_database(self, tmp_path):
+        """
+        TEST: Import app.main against a SQLite file that does not exist yet
+        EXPECT: No engine is built and the database file is never created
+        """
+        database = tmp_path / "startup.db"
+        report = run_python(
+            "import json\n"
+            "import app.main\n"
+            "from app.database import get_async_engine, get_engine\n"
+            "print(json.dumps({'engine': get_engine.built, 'async_engine': get_async_engine.built}))\n",
+            f"sqlite:///{database}",
+        )
+        
+        assert report == {"engine": False, "async_engine": False}
+        assert not database.exists()
+    
+    def test_lifespan_creates_schema(self, tmp_path):
+        """
+        TEST: Start the app and call /health
+        EXPECT: 200, and the lifespan created the tables
+        """
+        database = tmp_path / "startup.db"
+        report = run_python(
+            "import json\n"
+            "from fastapi.testclient import TestClient\n"
+            "from sqlalchemy import inspect\n"
+            "from app.main import app\n"
+            "from app.database import get_engine\n"
+            "with TestClient(app) as client:\n"
+            "    status = client.get('/health').status_code\n"
+            "    tables = sorted(inspect(get_engine()).get_table_names())\n"
+            "print(json.dumps({'status': status, 'tables': tables}))\n",
+            f"sqlite:///{database}",
+        )
+        
+        assert report["status"] == 200
+        assert {"users", "sweets"} <= set(report["tables"])
+    
+    def test_schema_creation_can_be_disabled(self, tmp_path):
+        """
+        TEST: Start the app with DB_CREATE_SCHEMA=false
+        EXPECT: /health answers and no tables are created
+        """
+        database = tmp_path / "startup.db"
+        report = run_python(
+            "import json\n"
+            "from fastapi.testclient import TestClient\n"
+            "from sqlalchemy import inspect\n"
+            "from app.main import app\n"
+            "from app.database import get_engine\n"
+            "with TestClient(app) as client:\n"
+            "    status = client.get('/health').status_code\n"
+            "    tables = inspect(get_engine()).get_table_names()\n"
+            "print(json.dumps({'status': status, 'tables': tables}))\n",
+            f"sqlite:///{database}",
+            DB_CREATE_SCHEMA="false",
+        )
+        
+        assert report == {"status": 200, "tables": []}
@@ -3,9 +3,44 @@ Tests for sweet management endpoints
 
 Following TDD principles: Red-Green-Refactor
 """
+import json
+import os
+import subprocess
+import sys
+import threading
 import pytest
 from fastapi import status
 
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A worker process: runs the app and answers one JSON request per stdin line
+WORKER = (
+    "import json, sys\n"
+    "from fastapi.testclient import TestClient\n"
+    "from app.main import app\n"
+    "with TestClient(app) as client:\n"
+    "    print('ready', flush=True)\n"
+    "    for line in sys.stdin:\n"
+    "        response = client.request(**json.loads(line))\n"
+    "        body = response.json() if response.content else None\n"
+    "        print(json.dumps({'status': response.status_code, 'etag': response.headers.get('etag'), 'body': body}), flush=True)\n"
+)
+
+
+def start_worker(env: dict) -> subprocess.Popen:
+    worker = subprocess.Popen(
+        [sys.executable, "-c", WORKER], cwd=BACKEND_DIR, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+    )
+    assert worker.stdout.readline().strip() == "ready"
+    return worker
+
+
+def call(worker: subprocess.Popen, method: str, url: str, **kwargs) -> dict:
+    """Send one request to a worker process and return its status, ETag and body"""
+    worker.stdin.write(json.dumps({"method": method, "url": url, **kwargs}) + "\n")
+    worker.stdin.flush()
+    return json.loads(worker.stdout.readline())
+
 
 @pytest.mark.sweets
 class TestCreateSweet:
@@ -175,6 +210,46 @@ class TestGetSweets:
         )
         
         assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_get_all_sweets_cursor_pagination(self, client, auth_headers_user, db_session):
+        """
+        TEST: Walk the catalog page by page with cursors
+        EXPECT: Every sweet exactly once, in ID order, with no cursor on the last page
+        """
+        from app.models import Sweet
+        
+        for i in range(5):
+            db_session.add(Sweet(name=f"Sweet {i}", category="candy", price=1.0, quantity=10))
+        db_session.commit()
+        
+        seen = []
+        cursor = None
+        for _ in range(5):
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/api/sweets", params=params, headers=auth_headers_user)
+            assert response.status_code == status.HTTP_200_OK
+            seen.extend(sweet["id"] for sweet in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+        
+        assert len(seen) == 5
+        assert seen == sorted(seen)
+    
+    def test_get_all_sweets_invalid_cursor(self, client, auth_headers_user):
+        """
+        TEST: List sweets with a malformed cursor
+        EXPECT: 400 Bad Request
+        """
+        response = client.get(
+            "/api/sweets",
+            params={"cursor": "not-a-cursor"},
+            headers=auth_headers_user
+        )
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
 
 
 @pytest.mark.sweets
@@ -245,6 +320,102 @@ class TestSearchSweets:
             assert 1.00 <= sweet["price"] <= 10.00
 
 
+@pytest.mark.sweets
+class TestSearchBackends:
+    """Test every search backend returns the same matches and stays in sync"""
+    
+    @pytest.fixture(params=["like", "fts5", "ngram"])
+    def search_backend(self, request, monkeypatch):
+        """Switch the configured search backend"""
+        from app.config import settings
+        from app.search import reset_search_backends
+        
+        monkeypatch.setattr(settings, "SEARCH_BACKEND", request.param)
+        reset_search_backends()
+        yield request.param
+        reset_search_backends()
+    
+    @pytest.fixture
+    def catalog(self, db_session):
+        """Create a small catalog to search"""
+        from app.models import Sweet
+        
+        for name, category in [
+            ("Milk Chocolate Bar", "chocolate"),
+            ("Dark Chocolate Bar", "chocolate"),
+            ("Gummy Bears", "gummy"),
+            ("Sour Gummy Worms", "gummy"),
+        ]:
+            db_session.add(Sweet(name=name, category=category, price=2.0, quantity=10))
+        db_session.commit()
+    
+    def search(self, client, headers, **params):
+        response = client.get("/api/sweets/search", params=params, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        return sorted(sweet["name"] for sweet in response.json())
+    
+    def test_substring_match(self, client, auth_headers_user, catalog, search_backend, db_session):
+        """
+        TEST: Search by a case-insensitive substring of name and category
+        EXPECT: The same matches from every backend
+        """
+        from app.search import get_search_backend
+        
+        assert get_search_backend(db_session).name == search_backend
+        
+        headers = auth_headers_user
+        assert self.search(client, headers, name="COLATE") == ["Dark Chocolate Bar", "Milk Chocolate Bar"]
+        assert self.search(client, headers, name="bear", category="gum") == ["Gummy Bears"]
+        assert self.search(client, headers, name="ar") == ["Dark Chocolate Bar", "Gummy Bears", "Milk Chocolate Bar"]
+        assert self.search(client, headers, name="toffee") == []
+    
+    def test_index_follows_writes(self, client, auth_headers_admin, catalog, search_backend):
+        """
+        TEST: Search after create, rename and delete
+        EXPECT: Results reflect every write
+        """
+        headers = auth_headers_admin
+        assert self.search(client, headers, name="worms") == ["Sour Gummy Worms"]
+        
+        created = client.post(
+            "/api/sweets",
+            json={"name": "Chocolate Worms", "category": "chocolate", "price": 1.5, "quantity": 5},
+            headers=headers
+        ).json()
+        assert self.search(client, headers, name="worms") == ["Chocolate Worms", "Sour Gummy Worms"]
+        
+        client.put(f"/api/sweets/{created['id']}", json={"name": "Chocolate Snails"}, headers=headers)
+        assert self.search(client, headers, name="worms") == ["Sour Gummy Worms"]
+        assert self.search(client, headers, name="snail") == ["Chocolate Snails"]
+        
+        client.delete(f"/api/sweets/{created['id']}", headers=headers)
+        assert self.search(client, headers, name="snail") == []
+        
+        client.post(f"/api/sweets/{created['id']}/restock", json={"quantity": 1}, headers=headers)
+        assert self.search(client, headers, name="snail") == ["Chocolate Snails"]
+    
+    def test_restock_reindexes_only_revived_sweets(
+        self, client, auth_headers_admin, test_sweet, search_backend, db_session, monkeypatch
+    ):
+        """
+        TEST: Restock an active sweet, then a deleted one
+        EXPECT: Only the restock that reactivates the sweet touches the search index
+        """
+        from app.search import get_search_backend
+        
+        indexed = []
+        backend = type(get_search_backend(db_session))
+        monkeypatch.setattr(backend, "index_sweet", lambda self, sweet: indexed.append(sweet.id))
+        url = f"/api/sweets/{test_sweet.id}"
+        
+        client.post(f"{url}/restock", json={"quantity": 1}, headers=auth_headers_admin)
+        assert indexed == []
+        
+        client.delete(url, headers=auth_headers_admin)
+        client.post(f"{url}/restock", json={"quantity": 1}, headers=auth_headers_admin)
+        assert indexed == [test_sweet.id]
+
+
 @pytest.mark.sweets
 class TestUpdateSweet:
     """Test update sweet endpoint"""
@@ -329,3 +500,869 @@ class TestDeleteSweet:
         )
         
         assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.sweets
+class TestBulkImport:
+    """Test bulk import endpoint"""
+    
+    def test_import_csv_creates_and_updates(self, client, auth_headers_admin, test_sweet):
+        """
+        TEST: Admin imports a CSV feed with one existing and one new sweet
+        EXPECT: 200 OK with the existing sweet updated and the new one created
+        """
+        feed = (
+            "name,category,price,quantity,description\n"
+            f"{test_sweet.name},{test_sweet.category},3.49,40,\n"
+            "Gummy Worms,gummy,2.49,150,Sour gummy worms\n"
+        )
+        
+        response = client.post(
+            "/api/sweets/import",
+            content=feed,
+            headers={**auth_headers_admin, "Content-Type": "text/csv"}
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["processed"] == 2
+        assert data["created"] == 1
+        assert data["updated"] == 1
+        assert data["failed"] == 0
+        
+        sweet = client.get(f"/api/sweets/{test_sweet.id}", headers=auth_headers_admin).json()
+        assert sweet["price"] == 3.49
+        assert sweet["quantity"] == 40
+    
+    def test_import_ndjson_reports_bad_rows(self, client, auth_headers_admin):
+        """
+        TEST: Import an NDJSON feed containing invalid rows
+        EXPECT: 200 OK, valid rows imported and each bad row reported
+        """
+        feed = "\n".join([
+            '{"name": "Lollipop", "category": "candy", "price": 0.99, "quantity": 300}',
+            '{"name": "Bad Price", "category": "candy", "price": -1, "quantity": 1}',
+            'not json',
+            '{"name": "Candy Cane", "category": "candy", "price": 1.49, "quantity": 120}',
+        ])
+        
+        response = client.post(
+            "/api/sweets/import?format=ndjson",
+            content=feed,
+            headers=auth_headers_admin
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["created"] == 2
+        assert data["failed"] == 2
+        assert [error["row"] for error in data["errors"]] == [2, 3]
+        assert "price" in data["errors"][0]["error"]
+    
+    def test_import_requires_format(self, client, auth_headers_admin):
+        """
+        TEST: Import without a recognizable format
+        EXPECT: 415 Unsupported Media Type
+        """
+        response = client.post(
+            "/api/sweets/import",
+            content="whatever",
+            headers={**auth_headers_admin, "Content-Type": "text/plain"}
+        )
+        
+        assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    
+    def test_import_as_user_forbidden(self, client, auth_headers_user):
+        """
+        TEST: Regular user tries to bulk import
+        EXPECT: 403 Forbidden
+        """
+        response = client.post(
+            "/api/sweets/import?format=csv",
+            content="name,category,price,quantity\n",
+            headers=auth_headers_user
+        )
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.fixture
+def async_client(tmp_path, monkeypatch):
+    """
+    Client whose requests get an AsyncSession (sqlite+aiosqlite), with admin headers
+    
+    The sync engine of run_blocking_db points at the same database file.
+    """
+    pytest.importorskip("aiosqlite")
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from app import database
+    from app.database import Base, get_db, is_async_url, sync_database_url
+    from app.main import app
+    from app.models import Sweet, User, UserRole
+    from app.search import reset_search_backends
+    from app.security import get_password_hash, user_cache
+    
+    url = f"sqlite+aiosqlite:///{tmp_path / 'async.db'}"
+    assert is_async_url(url)
+    
+    sync_engine = create_engine(sync_database_url(url))
+    Base.metadata.create_all(bind=sync_engine)
+    SyncSession = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+    with SyncSession() as db:
+        db.add_all([
+            User(
+                email="admin@example.com",
+                hashed_password=get_password_hash("AdminPassword123!"),
+                name="Admin User",
+                role=UserRole.ADMIN
+            ),
+            Sweet(name="Chocolate Bar", category="chocolate", price=2.99, quantity=10),
+            Sweet(name="Gummy Bears", category="gummy", price=1.99, quantity=5),
+        ])
+        db.commit()
+    
+    async_engine = create_async_engine(url)
+    AsyncTestingSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    
+    async def override_get_async_db():
+        async with AsyncTestingSession() as db:
+            yield db
+    
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_async_db)
+    monkeypatch.setattr(database, "get_session_factory", lambda: SyncSession)
+    reset_search_backends()
+    user_cache.clear()
+    
+    # One client context keeps a single event loop for the whole test
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/auth/login",
+            data={"username": "admin@example.com", "password": "AdminPassword123!"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        yield client, {"Authorization": f"Bearer {response.json()['access_token']}"}
+        
+        client.portal.call(async_engine.dispose)
+    
+    sync_engine.dispose()
+    reset_search_backends()
+    user_cache.clear()
+
+
+@pytest.mark.integration
+class TestAsyncDatabaseMode:
+    """Run the hot routes on an AsyncSession (sqlite+aiosqlite)"""
+    
+    def test_routes_on_async_session(self, async_client):
+        """
+        TEST: Log in, list, search, get, purchase and restock with an async driver
+        EXPECT: Same responses as the sync mode
+        """
+        client, headers = async_client
+        
+        response = client.get("/api/sweets", headers=headers)
+        assert [sweet["name"] for sweet in response.json()] == ["Chocolate Bar", "Gummy Bears"]
+        
+        response = client.get("/api/sweets/search", params={"name": "gummy"}, headers=headers)
+        assert [sweet["name"] for sweet in response.json()] == ["Gummy Bears"]
+        
+        chocolate_id = client.get("/api/sweets", headers=headers).json()[0]["id"]
+        assert client.get(f"/api/sweets/{chocolate_id}", headers=headers).json()["quantity"] == 10
+        
+        response = client.post(
+            f"/api/sweets/{chocolate_id}/purchase", json={"quantity": 4}, headers=headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["sweet"]["quantity"] == 6
+        
+        response = client.post(
+            f"/api/sweets/{chocolate_id}/purchase", json={"quantity": 7}, headers=headers
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        response = client.post(
+            f"/api/sweets/{chocolate_id}/restock", json={"quantity": 20}, headers=headers
+        )
+        assert response.json()["sweet"]["quantity"] == 26
+    
+    def test_cpu_heavy_work_leaves_event_loop(self, async_client, monkeypatch):
+        """
+        TEST: Bulk import a feed and build the ngram index with an async driver
+        EXPECT: The feed is parsed and the index built on a worker thread, not
+                the event loop; the import is committed and searchable
+        """
+        import asyncio
+        from app.config import settings
+        from app.routes import sweets as sweets_routes
+        from app.search import NGramSearchBackend, reset_search_backends
+        
+        client, headers = async_client
+        on_loop = []
+        
+        def record_thread():
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                on_loop.append(False)
+            else:
+                on_loop.append(True)
+        
+        read_rows, load = sweets_routes.read_rows, NGramSearchBackend._load
+        monkeypatch.setattr(sweets_routes, "read_rows", lambda *args: (record_thread(), read_rows(*args))[1])
+        monkeypatch.setattr(
+            NGramSearchBackend, "_load", lambda self, db: (self.loaded() or record_thread(), load(self, db))[1]
+        )
+        monkeypatch.setattr(settings, "SEARCH_BACKEND", "ngram")
+        reset_search_backends()
+        
+        response = client.post(
+            "/api/sweets/import",
+            content="name,category,price,quantity\nRoyal Fudge,fudge,4.5,20\n",
+            headers={**headers, "Content-Type": "text/csv"}
+        )
+        assert response.json()["created"] == 1
+        
+        response = client.get("/api/sweets/search", params={"name": "fudge"}, headers=headers)
+        assert [sweet["name"] for sweet in response.json()] == ["Royal Fudge"]
+        assert on_loop == [False, False]
+
+
+@pytest.mark.sweets
+class TestConditionalGet:
+    """Test ETag / If-None-Match handling on catalog reads"""
+    
+    def test_list_sends_etag_and_cache_control(self, client, auth_headers_user, test_sweet):
+        """
+        TEST: Get all sweets
+        EXPECT: Strong ETag and a revalidate-before-reuse Cache-Control
+        """
+        response = client.get("/api/sweets", headers=auth_headers_user)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["etag"].startswith('"')
+        assert response.headers["cache-control"] == "private, no-cache"
+    
+    @pytest.mark.parametrize("path", ["/api/sweets", "/api/sweets/search?name=choc", "/api/sweets/{id}"])
+    def test_matching_etag_returns_304_without_queries(self, client, auth_headers_user, test_sweet, path):
+        """
+        TEST: Repeat a catalog read with the ETag from the first response
+        EXPECT: 304 Not Modified with an empty body and no SQL issued
+        """
+        from sqlalchemy import event
+        from tests.conftest import engine
+        
+        path = path.format(id=test_sweet.id)
+        etag = client.get(path, headers=auth_headers_user).headers["etag"]
+        
+        statements = []
+        
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            response = client.get(path, headers={**auth_headers_user, "If-None-Match": etag})
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert statements == []
+    
+    def test_etag_changes_after_writes(self, client, auth_headers_user, auth_headers_admin, test_sweet):
+        """
+        TEST: Purchase, restock and update between two reads
+        EXPECT: Each write invalidates the previous ETag
+        """
+        def current_etag():
+            return client.get("/api/sweets", headers=auth_headers_user).headers["etag"]
+        
+        writes = [
+            lambda: client.post(f"/api/sweets/{test_sweet.id}/purchase", json={"quantity": 1}, headers=auth_headers_user),
+            lambda: client.post(f"/api/sweets/{test_sweet.id}/restock", json={"quantity": 1}, headers=auth_headers_admin),
+            lambda: client.put(f"/api/sweets/{test_sweet.id}", json={"price": 3.49}, headers=auth_headers_admin),
+        ]
+        
+        for write in writes:
+            etag = current_etag()
+            assert write().status_code == status.HTTP_200_OK
+            
+            response = client.get("/api/sweets", headers={**auth_headers_user, "If-None-Match": etag})
+            assert response.status_code == status.HTTP_200_OK
+            assert response.headers["etag"] != etag
+    
+    def test_failed_purchase_keeps_etag(self, client, auth_headers_user, test_sweet):
+        """
+        TEST: A rejected purchase between two reads
+        EXPECT: ETag unchanged, since nothing was committed
+        """
+        etag = client.get("/api/sweets", headers=auth_headers_user).headers["etag"]
+        
+        response = client.post(
+            f"/api/sweets/{test_sweet.id}/purchase", json={"quantity": 1000}, headers=auth_headers_user
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        response = client.get("/api/sweets", headers={**auth_headers_user, "If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.fixture(scope="class")
+def two_workers(tmp_path_factory):
+    """Two worker processes sharing one SQLite file and catalog version, plus admin headers"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from app.database import Base
+    from app.models import Sweet, User, UserRole
+    from app.security import get_password_hash
+    
+    tmp_path = tmp_path_factory.mktemp("workers")
+    database_url = f"sqlite:///{tmp_path / 'shop.db'}"
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(User(
+            email="admin@example.com",
+            hashed_password=get_password_hash("AdminPassword123!"),
+            name="Admin User",
+            role=UserRole.ADMIN,
+            is_active=True
+        ))
+        db.add(Sweet(name="Chocolate Bar", category="chocolate", price=2.99, quantity=100, is_active=True))
+        db.commit()
+    engine.dispose()
+    
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "SECRET_KEY": "test-secret-key",
+        "ENVIRONMENT": "test",
+        "SEARCH_BACKEND": "ngram",
+        "CATALOG_VERSION_BACKEND": "shared",
+        "CATALOG_VERSION_DIR": str(tmp_path),
+    }
+    workers = [start_worker(env) for _ in range(2)]
+    login = call(workers[0], "POST", "/api/auth/login", data={"username": "admin@example.com", "password": "AdminPassword123!"})
+    try:
+        yield workers, {"Authorization": f"Bearer {login['body']['access_token']}"}
+    finally:
+        for worker in workers:
+            worker.stdin.close()
+            worker.wait(timeout=60)
+
+
+@pytest.mark.integration
+class TestCatalogVersionAcrossWorkers:
+    """A write through one worker process invalidates what every other worker serves"""
+    
+    def test_shared_backend_counts_every_increment(self, tmp_path):
+        """
+        TEST: Two shared backends on one file, incremented from 8 threads
+        EXPECT: Both read the same epoch and exactly 800 increments
+        """
+        from app.catalog import SharedMemoryVersionBackend
+        
+        path = str(tmp_path / "catalog.version")
+        first, second = SharedMemoryVersionBackend(path), SharedMemoryVersionBackend(path)
+        
+        def bump():
+            for backend in (first, second) * 50:
+                backend.increment()
+        
+        threads = [threading.Thread(target=bump) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert first.epoch == second.epoch
+        assert first.read() == second.read() == 800
+    
+    def test_startup_starts_new_epoch(self, tmp_path, monkeypatch):
+        """
+        TEST: Restart the app on a shared version file that already holds a count
+        EXPECT: The counter carries on under a new epoch, so earlier ETags no longer match
+        """
+        from fastapi.testclient import TestClient
+        from app import catalog
+        from app.catalog import CatalogVersion, SharedMemoryVersionBackend
+        from app.main import app
+        
+        path = str(tmp_path / "catalog.version")
+        before = CatalogVersion(SharedMemoryVersionBackend(path))
+        before.bump()
+        etag = before.etag()
+        
+        monkeypatch.setattr(catalog, "catalog_version", CatalogVersion(SharedMemoryVersionBackend(path)))
+        monkeypatch.setattr("app.main.catalog_version", catalog.catalog_version)
+        with TestClient(app):
+            pass
+        
+        assert before.backend.read() == 1
+        assert before.etag() != etag
+        assert catalog.catalog_version.etag() == before.etag()
+    
+    def test_no_stale_catalog_after_write_on_other_worker(self, two_workers):
+        """
+        TEST: Worker B serves the catalog, worker A updates a price, B is
+              asked again with B's ETag
+        EXPECT: Both workers send the same ETag; afterwards B answers 200
+                with the new price instead of 304
+        """
+        (a, b), headers = two_workers
+        
+        before = call(b, "GET", "/api/sweets", headers=headers)
+        assert call(a, "GET", "/api/sweets", headers=headers)["etag"] == before["etag"]
+        sweet_id = before["body"][0]["id"]
+        
+        assert call(a, "PUT", f"/api/sweets/{sweet_id}", json={"price": 3.49}, headers=headers)["status"] == status.HTTP_200_OK
+        
+        after = call(b, "GET", "/api/sweets", headers={**headers, "If-None-Match": before["etag"]})
+        assert after["status"] == status.HTTP_200_OK
+        assert after["etag"] != before["etag"]
+        assert after["body"][0]["price"] == 3.49
+    
+    def test_search_finds_sweet_created_on_other_worker(self, two_workers):
+        """
+        TEST: Worker B builds its in-process search index, worker A creates
+              a matching sweet, B searches again
+        EXPECT: B's search returns the new sweet
+        """
+        (a, b), headers = two_workers
+        
+        assert call(b, "GET", "/api/sweets/search?name=fudge", headers=headers)["body"] == []
+        
+        created = call(a, "POST", "/api/sweets", json={
+            "name": "Royal Fudge", "category": "fudge", "price": 4.5, "quantity": 20
+        }, headers=headers)
+        assert created["status"] == status.HTTP_201_CREATED
+        
+        found = call(b, "GET", "/api/sweets/search?name=fudge", headers=headers)["body"]
+        assert [sweet["name"] for sweet in found] == ["Royal Fudge"]
+
+
+@pytest.mark.sweets
+class TestSweetSerialization:
+    """Test the fast JSON path used by list routes"""
+    
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_matches_response_model_output(self, monkeypatch, use_orjson):
+        """
+        TEST: Encode sweets with naive, UTC and offset timestamps
+        EXPECT: Same JSON as FastAPI's List[SweetResponse] serialization
+        """
+        import json
+        from datetime import datetime, timedelta, timezone
+        from typing import List
+        from fastapi.encoders import jsonable_encoder
+        from pydantic import TypeAdapter
+        from app import serialization
+        from app.models import Sweet
+        from app.schemas import SweetResponse
+        
+        if use_orjson:
+            pytest.importorskip("orjson")
+        else:
+            monkeypatch.setattr(serialization, "orjson", None)
+        
+        sweets = [
+            Sweet(id=1, name="Crème Brûlée Fudge", category="fudge", price=2.99, quantity=0,
+                  description=None, image_url=None, is_active=True, stock_slots=0,
+                  created_at=datetime(2024, 1, 2, 3, 4, 5, 678901)),
+            Sweet(id=2, name="Mint", category="candy", price=0.1, quantity=7,
+                  description="Cool", image_url="https://example.com/mint.png", is_active=True, stock_slots=4,
+                  created_at=datetime(2024, 1, 2, tzinfo=timezone.utc)),
+            Sweet(id=3, name="Yuzu", category="gummy", price=12.0, quantity=1,
+                  description="", image_url=None, is_active=False, stock_slots=0,
+                  created_at=datetime(2024, 1, 2, tzinfo=timezone(timedelta(hours=5, minutes=30)))),
+        ]
+        
+        adapter = TypeAdapter(List[SweetResponse])
+        expected = jsonable_encoder(adapter.validate_python(sweets, from_attributes=True))
+        
+        assert json.loads(serialization.encode_sweets(sweets)) == expected
+
+
+@pytest.mark.sweets
+class TestExportSweets:
+    """Test the streaming catalog export"""
+    
+    @pytest.fixture
+    def catalog(self, db_session):
+        from sqlalchemy import insert
+        from app.models import Sweet
+        
+        db_session.execute(insert(Sweet), [
+            {"name": f"Sweet {i}", "category": "candy", "price": 1.5, "quantity": i, "is_active": i != 3}
+            for i in range(250)
+        ])
+        db_session.commit()
+    
+    def test_export_ndjson(self, client, auth_headers_admin, catalog):
+        """
+        TEST: Export the catalog as NDJSON
+        EXPECT: Every active sweet in ID order, one JSON object per line
+        """
+        import json
+        
+        response = client.get("/api/sweets/export", params={"chunk_size": 100}, headers=auth_headers_admin)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        sweets = [json.loads(line) for line in response.content.splitlines()]
+        assert len(sweets) == 249
+        assert [sweet["id"] for sweet in sweets] == sorted(sweet["id"] for sweet in sweets)
+        assert "Sweet 3" not in {sweet["name"] for sweet in sweets}
+    
+    def test_export_yields_one_chunk_per_cursor_batch(self, db_session, catalog):
+        """
+        TEST: Iterate the export generator with chunk_size=100
+        EXPECT: Three chunks for 249 rows, and the session is closed afterwards
+        """
+        from app.export import stream_export
+        
+        chunks = list(stream_export(db_session, "ndjson", chunk_size=100))
+        
+        assert [chunk.count(b"\n") for chunk in chunks] == [100, 100, 49]
+        assert not db_session.in_transaction()
+    
+    def test_export_csv_round_trips_through_import(self, client, auth_headers_admin, catalog):
+        """
+        TEST: Export as CSV and feed the file back to the import endpoint
+        EXPECT: Header row plus one row per sweet; import updates them all
+        """
+        response = client.get("/api/sweets/export", params={"format": "csv"}, headers=auth_headers_admin)
+        
+        assert response.status_code == status.HTTP_200_OK
+        lines = response.text.splitlines()
+        assert lines[0] == "id,name,category,price,quantity,description,image_url,is_active,stock_slots,created_at,updated_at"
+        assert len(lines) == 250
+        
+        response = client.post(
+            "/api/sweets/import",
+            content=response.content,
+            headers={**auth_headers_admin, "Content-Type": "text/csv"}
+        )
+        assert response.json()["updated"] == 249
+        assert response.json()["failed"] == 0
+    
+    def test_export_as_user_forbidden(self, client, auth_headers_user):
+        """
+        TEST: Regular user requests an export
+        EXPECT: 403 Forbidden
+        """
+        response = client.get("/api/sweets/export", headers=auth_headers_user)
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.sweets
+class TestQueryBudgets:
+    """
+    Pin the number of SQL statements each endpoint runs
+    
+    Budgets count the route's own statements: the user cache and search
+    backend are warmed first, so get_current_user adds none. Every write
+    includes one upsert of the inventory statistics.
+    """
+    
+    @pytest.mark.parametrize("method, path, body, role, budget", [
+        ("get", "/api/sweets", None, "user", 1),
+        ("get", "/api/sweets/search?name=choc", None, "user", 1),
+        ("get", "/api/sweets/{id}", None, "user", 1),
+        ("post", "/api/sweets", {"name": "Toffee Block", "category": "toffee", "price": 1.5, "quantity": 5}, "admin", 3),
+        ("put", "/api/sweets/{id}", {"price": 3.49}, "admin", 4),
+        ("delete", "/api/sweets/{id}", None, "admin", 3),
+        ("post", "/api/sweets/{id}/purchase", {"quantity": 1}, "user", 1),
+        ("post", "/api/sweets/checkout", {"items": [{"sweet_id": "{id}", "quantity": 1}]}, "user", 1),
+        ("post", "/api/sweets/{id}/restock", {"quantity": 5}, "admin", 4),
+    ])
+    def test_endpoint_query_budget(
+        self, client, test_sweet, auth_headers_user, auth_headers_admin, assert_max_queries,
+        method, path, body, role, budget
+    ):
+        """
+        TEST: Call an endpoint once the user cache and search backend are warm
+        EXPECT: No more SQL statements than its budget
+        """
+        headers = auth_headers_admin if role == "admin" else auth_headers_user
+        client.get("/api/sweets/search?name=warm", headers=headers)
+        path = path.replace("{id}", str(test_sweet.id))
+        if body and "items" in body:
+            body = {"items": [{"sweet_id": test_sweet.id, "quantity": 1}]}
+        
+        with assert_max_queries(budget):
+            response = client.request(method, path, json=body, headers=headers)
+        
+        assert response.status_code < 300
+    
+    def test_query_stats_headers(self, client, test_sweet, auth_headers_user):
+        """
+        TEST: List sweets outside production
+        EXPECT: X-DB-Query-Count and X-DB-Time-Ms report the request's SQL
+        """
+        client.get("/api/auth/me", headers=auth_headers_user)
+        
+        response = client.get("/api/sweets", headers=auth_headers_user)
+        
+        assert response.headers["X-DB-Query-Count"] == "1"
+        assert float(response.headers["X-DB-Time-Ms"]) >= 0
+    
+    def test_repeated_statement_logged(self, db_session, caplog):
+        """
+        TEST: A handler runs the same query once per row
+        EXPECT: The middleware logs it as a possible N+1 query
+        """
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from sqlalchemy import select
+        from app.models import Sweet
+        from app.query_stats import QueryStatsMiddleware
+        
+        n_plus_one = FastAPI()
+        n_plus_one.add_middleware(QueryStatsMiddleware, expose_headers=True, repeat_threshold=3)
+        
+        @n_plus_one.get("/loop")
+        def loop():
+            for sweet_id in range(3):
+                db_session.execute(select(Sweet).where(Sweet.id == sweet_id)).first()
+            return {}
+        
+        with caplog.at_level("WARNING", logger="app.query_stats"):
+            response = TestClient(n_plus_one).get("/loop")
+        
+        assert response.headers["X-DB-Query-Count"] == "3"
+        assert "Possible N+1 query: GET /loop ran one statement 3 times" in caplog.text
+
+
+@pytest.mark.sweets
+class TestStockFeed:
+    """Test the server-sent stock change stream"""
+    
+    def test_stream_requires_token(self, client):
+        """
+        TEST: Open the stream without a token and with a bad one
+        EXPECT: 401 before any event is sent
+        """
+        assert client.get("/api/sweets/stream").status_code == status.HTTP_401_UNAUTHORIZED
+        response = client.get("/api/sweets/stream", params={"access_token": "not-a-jwt"})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    
+    async def test_writes_publish_coalesced_changes(
+        self, test_sweet, auth_headers_user, auth_headers_admin
+    ):
+        """
+        TEST: Purchase twice, restock, reprice and delete a sweet while a subscriber waits
+        EXPECT: One merged change carrying the final stock, price and status
+        """
+        import httpx
+        from app.main import app
+        from app.stock_feed import stock_feed
+        
+        subscription = stock_feed.subscribe()
+        try:
+            async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+                url = f"/api/sweets/{test_sweet.id}"
+                await client.post(f"{url}/purchase", json={"quantity": 3}, headers=auth_headers_user)
+                await client.post(f"{url}/purchase", json={"quantity": 2}, headers=auth_headers_user)
+                await client.post(f"{url}/restock", json={"quantity": 10}, headers=auth_headers_admin)
+                await client.put(url, json={"price": 3.49}, headers=auth_headers_admin)
+                await client.delete(url, headers=auth_headers_admin)
+            
+            reset, changes = await subscription.next(1)
+        finally:
+            subscription.close()
+        
+        assert not reset
+        assert changes == [{"id": test_sweet.id, "quantity": 105, "price": 3.49, "is_active": False}]
+    
+    async def test_reservations_and_imports_publish(self, test_sweet, auth_headers_user, auth_headers_admin):
+        """
+        TEST: Reserve, release, let a hold expire, then import an update and a new sweet
+        EXPECT: A change per step with the stock at that point; the new sweet resets the subscriber
+        """
+        from datetime import datetime, timedelta, timezone
+        import httpx
+        from app.main import app
+        from app.reservations import reservation_expiry
+        from app.stock_feed import stock_feed
+        
+        url = f"/api/sweets/{test_sweet.id}"
+        subscription = stock_feed.subscribe()
+        try:
+            async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+                hold = (await client.post(f"{url}/reserve", json={"quantity": 5}, headers=auth_headers_user)).json()
+                reserved = await subscription.next(1)
+                await client.post(f"/api/sweets/reservations/{hold['id']}/release", headers=auth_headers_user)
+                released = await subscription.next(1)
+                await client.post(f"{url}/reserve", json={"quantity": 4, "ttl_seconds": 60}, headers=auth_headers_user)
+                await subscription.next(1)
+                reservation_expiry.run_due(datetime.now(timezone.utc) + timedelta(seconds=61))
+                expired = await subscription.next(1)
+                
+                feed = f"name,category,price,quantity\n{test_sweet.name},{test_sweet.category},3.49,40\n"
+                headers = {**auth_headers_admin, "Content-Type": "text/csv"}
+                await client.post("/api/sweets/import", content=feed, headers=headers)
+                updated = await subscription.next(1)
+                await client.post("/api/sweets/import", content=feed + "Gummy Worms,gummy,2.49,150\n", headers=headers)
+                created = await subscription.next(1)
+        finally:
+            subscription.close()
+        
+        change = {"id": test_sweet.id, "price": test_sweet.price, "is_active": True}
+        assert reserved == (False, [{**change, "quantity": 95}])
+        assert released == (False, [{**change, "quantity": 100}])
+        assert expired == (False, [{**change, "quantity": 100}])
+        assert updated == (False, [{**change, "quantity": 40, "price": 3.49}])
+        assert created == (True, [])
+    
+    def test_inactive_user_cannot_subscribe(self, client, auth_headers_user, test_user, db_session):
+        """
+        TEST: Open the stream with a valid token after deactivating, then deleting, its user
+        EXPECT: 403 for the deactivated user, 401 once it is gone
+        """
+        test_user.is_active = False
+        db_session.commit()
+        
+        response = client.get("/api/sweets/stream", headers=auth_headers_user)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        
+        db_session.delete(test_user)
+        db_session.commit()
+        
+        response = client.get("/api/sweets/stream", headers=auth_headers_user)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_events_encode_without_orjson(self, monkeypatch, use_orjson):
+        """
+        TEST: Encode a stock event with and without orjson installed
+        EXPECT: The same compact bytes either way
+        """
+        from app import serialization
+        from app.stock_feed import sse_event
+        
+        if not use_orjson:
+            monkeypatch.setattr(serialization, "orjson", None)
+        
+        change = {"id": 1, "quantity": 95, "price": 2.5, "is_active": True}
+        assert sse_event("stock", [change]) == (
+            b'event: stock\ndata: [{"id":1,"quantity":95,"price":2.5,"is_active":true}]\n\n'
+        )
+    
+    async def test_slow_subscriber_is_reset(self):
+        """
+        TEST: Overflow a subscriber's buffer with distinct sweets
+        EXPECT: A reset instead of the dropped changes; later changes flow again
+        """
+        from app.stock_feed import StockFeed, sse_event, stream_changes
+        
+        feed = StockFeed(max_pending=2)
+        subscription = feed.subscribe()
+        feed.publish({"id": sweet_id, "quantity": 1} for sweet_id in (1, 2, 3))
+        events = stream_changes(subscription, coalesce_seconds=0, keepalive_seconds=1)
+        
+        assert await events.__anext__() == b"retry: 3000\n\n"
+        assert await events.__anext__() == sse_event("reset", {})
+        feed.publish([{"id": 4, "quantity": 0}])
+        assert await events.__anext__() == b'event: stock\ndata: [{"id":4,"quantity":0}]\n\n'
+        
+        await events.aclose()
+        feed.publish([{"id": 5, "quantity": 0}])
+        assert await subscription.next(0.01) == (False, [])
+
+
+@pytest.mark.sweets
+class TestDeltaSync:
+    """Test GET /api/sweets/changes"""
+    
+    @pytest.fixture
+    def three_sweets(self, db_session):
+        from app.models import Sweet
+        
+        sweets = [Sweet(name=f"Sync Sweet {i}", category="candy", price=1.0, quantity=10) for i in range(3)]
+        db_session.add_all(sweets)
+        db_session.commit()
+        return [sweet.id for sweet in sweets]
+    
+    def test_incremental_sync(self, client, auth_headers_user, auth_headers_admin, three_sweets, monkeypatch):
+        """
+        TEST: Sync everything, change two sweets, then sync from the returned cursor twice
+        EXPECT: Only the changed sweets, the deleted one inactive, then nothing
+        """
+        from app.config import settings
+        
+        monkeypatch.setattr(settings, "SYNC_SETTLE_SECONDS", 0)
+        first = client.get("/api/sweets/changes", headers=auth_headers_user)
+        purchased, _, deleted = three_sweets
+        client.post(f"/api/sweets/{purchased}/purchase", json={"quantity": 4}, headers=auth_headers_user)
+        client.delete(f"/api/sweets/{deleted}", headers=auth_headers_admin)
+        
+        second = client.get(
+            "/api/sweets/changes", params={"since": first.headers["X-Sync-Cursor"]}, headers=auth_headers_user
+        )
+        third = client.get(
+            "/api/sweets/changes", params={"since": second.headers["X-Sync-Cursor"]}, headers=auth_headers_user
+        )
+        
+        assert first.status_code == status.HTTP_200_OK
+        assert [sweet["id"] for sweet in first.json()] == three_sweets
+        assert "X-Next-Cursor" not in first.headers
+        assert [(sweet["id"], sweet["quantity"], sweet["is_active"]) for sweet in second.json()] == [
+            (purchased, 6, True), (deleted, 10, False)
+        ]
+        assert third.json() == []
+        assert third.headers["X-Sync-Cursor"] == second.headers["X-Sync-Cursor"]
+    
+    def test_hot_purchases_reach_sync(
+        self, client, auth_headers_user, auth_headers_admin, three_sweets, monkeypatch
+    ):
+        """
+        TEST: Put a sweet in hot mode, sync, then purchase twice, syncing after each purchase
+        EXPECT: Each sync carries the sweet with its live stock, the second although only the first purchase stamped it
+        """
+        from app.config import settings
+        
+        monkeypatch.setattr(settings, "SYNC_SETTLE_SECONDS", 0)
+        hot = three_sweets[0]
+        client.put(f"/api/sweets/{hot}/stock-slots", json={"slots": 2}, headers=auth_headers_admin)
+        cursor = client.get("/api/sweets/changes", headers=auth_headers_user).headers["X-Sync-Cursor"]
+        
+        synced = []
+        for quantity in (4, 1):
+            client.post(f"/api/sweets/{hot}/purchase", json={"quantity": quantity}, headers=auth_headers_user)
+            response = client.get("/api/sweets/changes", params={"since": cursor}, headers=auth_headers_user)
+            cursor = response.headers["X-Sync-Cursor"]
+            synced.append([(sweet["id"], sweet["quantity"]) for sweet in response.json()])
+        
+        assert synced == [[(hot, 6)], [(hot, 5)]]
+    
+    def test_pages_then_resends_settle_window(self, client, auth_headers_user, three_sweets):
+        """
+        TEST: Sync in pages of two while every change is younger than SYNC_SETTLE_SECONDS
+        EXPECT: X-Next-Cursor until the last page; the next sync sends the recent changes again
+        """
+        first = client.get("/api/sweets/changes", params={"limit": 2}, headers=auth_headers_user)
+        second = client.get(
+            "/api/sweets/changes", params={"limit": 2, "since": first.headers["X-Next-Cursor"]}, headers=auth_headers_user
+        )
+        again = client.get(
+            "/api/sweets/changes", params={"since": second.headers["X-Sync-Cursor"]}, headers=auth_headers_user
+        )
+        
+        assert [sweet["id"] for sweet in first.json() + second.json()] == three_sweets
+        assert "X-Next-Cursor" not in second.headers
+        assert [sweet["id"] for sweet in again.json()] == three_sweets
+    
+    def test_invalid_cursor(self, client, auth_headers_user):
+        """
+        TEST: Sync from a cursor that was not issued by the API
+        EXPECT: 400 Bad Request
+        """
+        response = client.get("/api/sweets/changes", params={"since": "not-a-cursor"}, headers=auth_headers_user)
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
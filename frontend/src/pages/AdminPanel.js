@@ -3,6 +3,7 @@ import { sweets as sweetsAPI } from '../services/api';
 
 function AdminPanel() {
   const [sweets, setSweets] = useState([]);
+  const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [showModal, setShowModal] = useState(false);
   const [editingSweet, setEditingSweet] = useState(null);
@@ -24,8 +25,12 @@ function AdminPanel() {
   const loadSweets = async () => {
     setLoading(true);
     try {
-      const response = await sweetsAPI.getAll({ in_stock_only: false });
+      const [response, statsResponse] = await Promise.all([
+        sweetsAPI.getAll({ in_stock_only: false }),
+        sweetsAPI.getStats(),
+      ]);
       setSweets(response.data);
+      setStats(statsResponse.data);
     } catch (error) {
       console.error('Failed to load sweets:', error);
       showNotification('Failed to load sweets', 'error');
@@ -181,22 +186,22 @@ function AdminPanel() {
           <div className="grid grid-cols-1 md:grid-cols-4 gap-4 mt-6">
             <div className="bg-gradient-to-br from-blue-50 to-blue-100 p-4 rounded-xl border-2 border-blue-200">
               <div className="text-3xl mb-2">📦</div>
-              <div className="text-2xl font-bold text-blue-700">{sweets.length}</div>
+              <div className="text-2xl font-bold text-blue-700">{stats ? stats.products : sweets.length}</div>
               <div className="text-sm text-blue-600 font-medium">Total Products</div>
             </div>
             <div className="bg-gradient-to-br from-green-50 to-green-100 p-4 rounded-xl border-2 border-green-200">
               <div className="text-3xl mb-2">✅</div>
-              <div className="text-2xl font-bold text-green-700">{sweets.filter(s => s.quantity > 0).length}</div>
+              <div className="text-2xl font-bold text-green-700">{stats ? stats.in_stock : sweets.filter(s => s.quantity > 0).length}</div>
               <div className="text-sm text-green-600 font-medium">In Stock</div>
             </div>
             <div className="bg-gradient-to-br from-red-50 to-red-100 p-4 rounded-xl border-2 border-red-200">
               <div className="text-3xl mb-2">❌</div>
-              <div className="text-2xl font-bold text-red-700">{sweets.filter(s => s.quantity === 0).length}</div>
+              <div className="text-2xl font-bold text-red-700">{stats ? stats.out_of_stock : sweets.filter(s => s.quantity === 0).length}</div>
               <div className="text-sm text-red-600 font-medium">Out of Stock</div>
             </div>
             <div className="bg-gradient-to-br from-yellow-50 to-yellow-100 p-4 rounded-xl border-2 border-yellow-200">
               <div className="text-3xl mb-2">⚠️</div>
-              <div className="text-2xl font-bold text-yellow-700">{sweets.filter(s => s.quantity > 0 && s.quantity <= 10).length}</div>
+              <div className="text-2xl font-bold text-yellow-700">{stats ? stats.low_stock : sweets.filter(s => s.quantity > 0 && s.quantity <= 10).length}</div>
               <div className="text-sm text-yellow-600 font-medium">Low Stock</div>
             </div>
           </div>
@@ -11,6 +11,7 @@ function Dashboard() {
   const [maxPrice, setMaxPrice] = useState('');
   const [inStockOnly, setInStockOnly] = useState(true);
   const [viewMode, setViewMode] = useState('grid');
+  const [streaming, setStreaming] = useState(false);
 
   const loadSweets = async () => {
     setLoading(true);
@@ -39,6 +40,25 @@ function Dashboard() {
     loadSweets();
   }, [inStockOnly]); // eslint-disable-line react-hooks/exhaustive-deps
 
+  // Apply stock and price changes pushed by the server instead of refetching
+  useEffect(() => {
+    const stream = sweetsAPI.openStockStream();
+    if (!stream) return undefined;
+
+    stream.onopen = () => setStreaming(true);
+    stream.onerror = () => setStreaming(false);
+    stream.addEventListener('stock', (event) => {
+      const changes = new Map(JSON.parse(event.data).map((change) => [change.id, change]));
+      setSweets((current) => current
+        .map((sweet) => (changes.has(sweet.id) ? { ...sweet, ...changes.get(sweet.id) } : sweet))
+        .filter((sweet) => sweet.is_active));
+    });
+    // The server dropped changes for us: start over from a full list
+    stream.addEventListener('reset', () => loadSweets());
+
+    return () => stream.close();
+  }, []); // eslint-disable-line react-hooks/exhaustive-deps
+
   const handleSearch = (e) => {
     e.preventDefault();
     loadSweets();
@@ -244,7 +264,7 @@ function Dashboard() {
               <SweetCard
                 key={sweet.id}
                 sweet={sweet}
-                onUpdate={loadSweets}
+                onUpdate={streaming ? undefined : loadSweets}
                 viewMode={viewMode}
                 isAdmin={false}
               />
@@ -65,6 +65,13 @@ export const sweets = {
   delete: (id) => api.delete(`/sweets/${id}`),
   purchase: (id, quantity) => api.post(`/sweets/${id}/purchase`, { quantity }),
   restock: (id, quantity) => api.post(`/sweets/${id}/restock`, { quantity }),
+  getStats: () => api.get('/sweets/stats'),
+  // EventSource cannot send headers, so the token goes in the query string
+  openStockStream: () => {
+    const token = localStorage.getItem('token');
+    if (!token || typeof EventSource === 'undefined') return null;
+    return new EventSource(`${API_URL}/sweets/stream?access_token=${encodeURIComponent(token)}`);
+  },
 };
 
 export default api;